@@ -0,0 +1,96 @@
+"""Benchmark the per-call overhead of a small DAG.
+
+A chain of 10 ExecNodes that do no work is called repeatedly.
+The DAG doesn't need an event loop, so it is executed by the thread-based scheduler,
+or inline in the calling thread when its max_concurrency is 1.
+It is compared against running the same plan with the asyncio scheduler (the previous implementation),
+which creates and closes an event loop on every call.
+
+Usage:
+    python scripts/benchmark_call_overhead.py [CALLS]
+"""
+import asyncio
+import functools
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from tawazi import DAG, Resource, dag, xn
+from tawazi._dag.helpers import async_execute, extend_results_with_args, sync_execute
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+REPEAT = 3
+
+
+@xn
+def inc(x: int) -> int:
+    return x + 1
+
+
+@xn(resource=Resource.main_thread)
+def inc_main_thread(x: int) -> int:
+    return x + 1
+
+
+@dag(max_concurrency=4)
+def chain(x: int) -> int:
+    for _ in range(10):
+        x = inc(x)
+    return x
+
+
+@dag
+def chain_sequential(x: int) -> int:
+    for _ in range(10):
+        x = inc(x)
+    return x
+
+
+@dag(max_concurrency=4)
+def chain_main_thread(x: int) -> int:
+    for _ in range(10):
+        x = inc_main_thread(x)
+    return x
+
+
+def timeit(func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            func()
+        best = min(best, (time.perf_counter() - start) / CALLS)
+    return best
+
+
+def run(pipeline: DAG[Any, Any], use_event_loop: bool) -> None:
+    kwargs: Dict[str, Any] = {
+        "exec_nodes": pipeline.exec_nodes,
+        "results": extend_results_with_args(pipeline.results, pipeline.input_uxns, 0),
+        "max_concurrency": pipeline.max_concurrency,
+        "plan": pipeline._get_call_plan(),
+        "thread_pool": pipeline._get_thread_pool(),
+        "process_pool": pipeline._process_pool,
+        "interpreter_pool": pipeline._interpreter_pool,
+    }
+    if use_event_loop:
+        asyncio.run(async_execute(**kwargs))
+    else:
+        sync_execute(**kwargs)
+
+
+def main(name: str, pipeline: DAG[Any, Any]) -> None:
+    assert pipeline(0) == 10
+    assert not pipeline._get_call_plan().needs_event_loop
+    for use_event_loop in (True, False):
+        duration = timeit(functools.partial(run, pipeline, use_event_loop))
+        scheduler = "asyncio" if use_event_loop else "threads/inline"
+        print(f"{name} with the {scheduler} scheduler: {duration * 1e6:.1f} us/call")
+    print(f"{name} through DAG.__call__: {timeit(lambda: pipeline(0)) * 1e6:.1f} us/call")
+    pipeline.close()
+
+
+if __name__ == "__main__":
+    main("10 threaded ExecNodes", chain)
+    main("10 main thread ExecNodes", chain_main_thread)
+    main("10 threaded ExecNodes with max_concurrency=1", chain_sequential)
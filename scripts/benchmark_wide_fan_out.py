@@ -0,0 +1,81 @@
+"""Benchmark the scheduling overhead of a DAG with a very wide fan-out.
+
+A root ExecNode is followed by `WIDTH` independent ExecNodes that all become ready at the same time.
+The ExecNodes do no work, so the measured time is the scheduling overhead of the DAG.
+
+The second part compares picking the most prioritized ready node with a linear scan
+(the previous implementation) against popping it from a heap (the current implementation).
+
+Usage:
+    python scripts/benchmark_wide_fan_out.py [WIDTH]
+"""
+import heapq
+import sys
+import time
+from typing import Any, Callable, List
+
+from tawazi import dag, xn
+
+WIDTH = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+REPEAT = 3
+
+
+@xn
+def root() -> int:
+    return 0
+
+
+@xn
+def leaf(x: int) -> int:
+    return x
+
+
+@xn
+def sink(*xs: int) -> int:
+    return len(xs)
+
+
+@dag(max_concurrency=4)
+def fan_out() -> int:
+    r = root()
+    return sink(*[leaf(r) for _ in range(WIDTH)])
+
+
+def timeit(func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def linear_scan(priorities: List[int]) -> None:
+    ready = set(range(len(priorities)))
+    while ready:
+        i = max(ready, key=lambda i: priorities[i])
+        ready.remove(i)
+
+
+def heap(priorities: List[int]) -> None:
+    ready = [(-p, i) for i, p in enumerate(priorities)]
+    heapq.heapify(ready)
+    while ready:
+        heapq.heappop(ready)
+
+
+if __name__ == "__main__":
+    assert fan_out() == WIDTH
+    duration = timeit(fan_out)
+    print(
+        f"fan-out of {WIDTH} ExecNodes: {duration * 1000:.1f} ms ({duration / WIDTH * 1e6:.1f} us/ExecNode)"
+    )
+
+    priorities = [(i * 7919) % 11 for i in range(WIDTH)]
+    print(
+        f"select {WIDTH} ready nodes with a linear scan: {timeit(lambda: linear_scan(priorities)) * 1000:.1f} ms"
+    )
+    print(
+        f"select {WIDTH} ready nodes with a heap: {timeit(lambda: heap(priorities)) * 1000:.1f} ms"
+    )
+    fan_out.close()
@@ -1,8 +1,10 @@
 """tawazi is a package that allows parallel execution of a set of functions written in Python."""
 
 # exposing useful objects / Classes
+from ._cancel import cancel_token
 from ._dag import DAG, AsyncDAG, AsyncDAGExecution, DAGExecution
 from ._decorators import dag, xn
+from ._memoize import register_hasher
 from ._object_helpers import and_, not_, or_
 from .config import cfg
 from .consts import Resource
@@ -21,4 +23,6 @@ __all__ = [
     "or_",
     "not_",
     "Resource",
+    "cancel_token",
+    "register_hasher",
 ]
@@ -0,0 +1,105 @@
+"""Module helper to signal the running ExecNodes that their execution failed (see `TAWAZI_FAIL_FAST`).
+
+Threads can't be interrupted: a long running ExecNode checks its token to stop early by itself.
+The token of an execution is held by a context variable, which follows the ExecNodes into the threads
+and the tasks they are executed in.
+"""
+import contextvars
+import functools
+import threading
+from typing import Any, Callable, Optional
+
+
+class CancelToken:
+    """Cancelled once the execution of the ExecNodes holding it failed.
+
+    >>> token = CancelToken()
+    >>> token.cancelled
+    False
+    >>> token.cancel()
+    >>> token.wait(0.1)
+    True
+    """
+
+    def __init__(self) -> None:
+        """Create a token that is not cancelled."""
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the execution was cancelled."""
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancel the execution."""
+        self._event.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the execution is cancelled, a cancellable replacement of `time.sleep`.
+
+        Args:
+            timeout (Optional[float]): the maximum number of seconds to wait. Defaults to None.
+
+        Returns:
+            bool: whether the execution is cancelled.
+        """
+        return self._event.wait(timeout)
+
+
+class _NeverCancelled(CancelToken):
+    def cancel(self) -> None:
+        pass
+
+
+# the token of the ExecNodes executed without TAWAZI_FAIL_FAST or outside of a DAG
+_NEVER = _NeverCancelled()
+_current: "contextvars.ContextVar[CancelToken]" = contextvars.ContextVar(
+    "tawazi_cancel_token", default=_NEVER
+)
+
+
+def cancel_token() -> CancelToken:
+    """Get the cancellation token of the execution running the calling ExecNode.
+
+    >>> cancel_token().cancelled
+    False
+
+    Returns:
+        CancelToken: the token of the execution, never cancelled if `TAWAZI_FAIL_FAST` is disabled.
+    """
+    return _current.get()
+
+
+def set_token(token: CancelToken) -> "contextvars.Token[CancelToken]":
+    """Make a token the cancellation token of the current context.
+
+    Args:
+        token (CancelToken): the token of the execution
+
+    Returns:
+        contextvars.Token[CancelToken]: restores the previous token once reset
+    """
+    return _current.set(token)
+
+
+def reset_token(previous: "contextvars.Token[CancelToken]") -> None:
+    """Restore the cancellation token replaced by `set_token`.
+
+    Args:
+        previous (contextvars.Token[CancelToken]): the value returned by `set_token`
+    """
+    _current.reset(previous)
+
+
+def bind_token(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Make a function see the cancellation token of the current context when it is called in another thread.
+
+    Args:
+        func (Callable[..., Any]): the function
+
+    Returns:
+        Callable[..., Any]: func itself if the current context has no token to propagate
+    """
+    if _current.get() is _NEVER:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
@@ -0,0 +1,220 @@
+"""Module helper to save the results of an execution as soon as they are computed and to resume it after a failure.
+
+Every result is pickled as soon as it is computed, then written to its own file of the checkpoint directory
+by a background thread. The file is written under a temporary name and renamed once complete:
+a crash never leaves a truncated result behind.
+"""
+import contextlib
+import os
+import pickle
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from loguru import logger
+
+from tawazi._dag.plan import ExecutionPlan
+from tawazi._spill import Spilled
+from tawazi.consts import Identifier
+from tawazi.errors import TawaziUsageError
+
+
+def _dump(path: Path, data: bytes) -> None:
+    tmp = path.parent / (path.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        # the temporary file might not even be created
+        with contextlib.suppress(FileNotFoundError):
+            tmp.unlink()
+        raise
+    os.replace(tmp, path)
+
+
+def _load(path: Path) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)  # noqa: S301
+
+
+class Checkpoint:
+    """The results of an execution saved in a directory.
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> checkpoint = Checkpoint(directory)
+    >>> checkpoint.start((1, 2))
+    >>> checkpoint.save("add", 3)
+    >>> checkpoint.close()
+    >>> Checkpoint(directory).load()
+    ((1, 2), {'add': 3})
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initialize the checkpoint, nothing is written until an execution starts.
+
+        Args:
+            directory (str): the directory of the checkpoint, created if it doesn't exist.
+        """
+        self.directory = Path(directory)
+        self._results_dir = self.directory / "results"
+        self._queue: "queue.SimpleQueue[Optional[Tuple[Path, bytes]]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    def start(self, args: Tuple[Any, ...]) -> None:
+        """Start checkpointing a new execution, the results of the previous one are removed.
+
+        Args:
+            args (Tuple[Any, ...]): the arguments of the execution, saved to resume it.
+        """
+        shutil.rmtree(self._results_dir, ignore_errors=True)
+        self._results_dir.mkdir(parents=True)
+        self._put(self.directory / "args.pkl", args)
+
+    def resume(self) -> Tuple[Tuple[Any, ...], Dict[Identifier, Any]]:
+        """Load the checkpoint of a previous execution and keep checkpointing its remaining results.
+
+        Returns:
+            Tuple[Tuple[Any, ...], Dict[Identifier, Any]]: look at `load`
+        """
+        args, results = self.load()
+        self._results_dir.mkdir(parents=True, exist_ok=True)
+        return args, results
+
+    def load(self) -> Tuple[Tuple[Any, ...], Dict[Identifier, Any]]:
+        """Load the arguments and the results saved by an execution.
+
+        Returns:
+            Tuple[Tuple[Any, ...], Dict[Identifier, Any]]: the arguments of the execution
+                and the results of the ExecNodes that finished.
+
+        Raises:
+            TawaziUsageError: if no execution was checkpointed in the directory
+        """
+        args_path = self.directory / "args.pkl"
+        if not args_path.exists():
+            raise TawaziUsageError(f"No execution was checkpointed in {self.directory}")
+        results = {
+            unquote(path.name[: -len(".pkl")]): _load(path)
+            for path in sorted(self._results_dir.glob("*.pkl"))
+        }
+        return _load(args_path), results
+
+    def save(self, id_: Identifier, value: Any) -> None:
+        """Save the result of an ExecNode, it is pickled right away and written in the background.
+
+        Pickling it before its successors run keeps them from changing what is saved by mutating it.
+
+        Args:
+            id_ (Identifier): the id of the ExecNode
+            value (Any): its result
+        """
+        self._put(self._results_dir / f"{quote(id_, safe='')}.pkl", value)
+
+    def close(self) -> None:
+        """Wait for the pending results to be written."""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _put(self, path: Path, value: Any) -> None:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # the ExecNode is executed again when the execution is resumed
+            logger.warning("Can't checkpoint {}: {}", path.name, e)
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write, name="checkpoint", daemon=True)
+            self._writer.start()
+        self._queue.put((path, data))
+
+    def _write(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                _dump(path, data)
+            except Exception as e:
+                logger.warning("Can't checkpoint {}: {}", path.name, e)
+
+
+class ResultsCheckpoint:
+    """Saves the result of every ExecNode of an execution as soon as it is done."""
+
+    def __init__(
+        self, checkpoint: Checkpoint, plan: ExecutionPlan, results: Dict[Identifier, Any]
+    ) -> None:
+        """Initialize the hook of the scheduler.
+
+        Args:
+            checkpoint (Checkpoint): the checkpoint of the execution
+            plan (ExecutionPlan): the executed plan
+            results (Dict[Identifier, Any]): the results of the execution
+        """
+        self.checkpoint = checkpoint
+        self.plan = plan
+        self.results = results
+        # the arguments, the setup results and the resumed results are not saved again
+        self.saved = {id_ for id_ in plan.ids if id_ in results}
+
+    def release(self, index: int) -> None:
+        """Save the result of a finished node, before it can be dropped.
+
+        Args:
+            index (int): the index of the finished node
+        """
+        id_ = self.plan.ids[index]
+        if id_ in self.results:
+            self._save(id_)
+
+    def save_finished(self) -> None:
+        """Save the results that were computed but not released, when the execution fails.
+
+        It happens to the ExecNodes fused with the one that failed and to those that finished at the same time.
+        """
+        for id_ in self.plan.ids:
+            if id_ in self.results and id_ not in self.saved:
+                self._save(id_)
+
+    def _save(self, id_: Identifier) -> None:
+        self.saved.add(id_)
+        value = self.results[id_]
+        if isinstance(value, Spilled):
+            # the spill files are removed at the end of the execution
+            value = value.load()
+        self.checkpoint.save(id_, value)
+
+
+@contextlib.contextmanager
+def checkpointing(
+    checkpoint: Optional[Checkpoint], plan: ExecutionPlan, results: Dict[Identifier, Any]
+) -> Iterator[Optional[ResultsCheckpoint]]:
+    """Save the results of an execution to a checkpoint, including those left behind when it fails.
+
+    Args:
+        checkpoint (Optional[Checkpoint]): the checkpoint of the execution, None to save nothing.
+        plan (ExecutionPlan): the executed plan
+        results (Dict[Identifier, Any]): the results of the execution
+
+    Yields:
+        Optional[ResultsCheckpoint]: the hook of the scheduler, None if there is no checkpoint.
+    """
+    if checkpoint is None:
+        yield None
+        return
+    saved = ResultsCheckpoint(checkpoint, plan, results)
+    try:
+        yield saved
+    except BaseException:
+        saved.save_finished()
+        raise
@@ -1,6 +1,6 @@
 import inspect
 import warnings
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from tawazi._helpers import StrictDict
 from tawazi.consts import RVDAG, P
@@ -37,7 +37,12 @@ def get_args_and_default_args(func: Callable[..., Any]) -> Tuple[List[str], Dict
 
 
 def make_dag(
-    _func: Callable[P, RVDAG], max_concurrency: int, is_async: bool
+    _func: Callable[P, RVDAG],
+    max_concurrency: int,
+    is_async: bool,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[DAG[P, RVDAG], AsyncDAG[P, RVDAG]]:
     """Make a DAG or AsyncDAG from the function that describes the DAG."""
     # 2. make ExecNodes corresponding to the arguments of the ExecNode
@@ -77,6 +82,9 @@ def make_dag(
             input_uxns=uxn_args,
             return_uxns=returned_usage_exec_nodes,
             max_concurrency=max_concurrency,
+            pools=pools or {},
+            timeout=timeout,
+            memory_budget=memory_budget,
         )
     return DAG(
         qualname=_func.__qualname__,
@@ -85,11 +93,19 @@ def make_dag(
         input_uxns=uxn_args,
         return_uxns=returned_usage_exec_nodes,
         max_concurrency=max_concurrency,
+        pools=pools or {},
+        timeout=timeout,
+        memory_budget=memory_budget,
     )
 
 
 def wrap_make_dag(
-    _func: Callable[P, RVDAG], max_concurrency: int, is_async: bool
+    _func: Callable[P, RVDAG],
+    max_concurrency: int,
+    is_async: bool,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[DAG[P, RVDAG], AsyncDAG[P, RVDAG]]:
     """Clean up before and after making the DAG."""
     # 1. node.exec_nodes contains all the ExecNodes that concern the DAG being built at the moment.
@@ -99,7 +115,7 @@ def wrap_make_dag(
     node.DAG_PREFIX = []
 
     try:
-        return make_dag(_func, max_concurrency, is_async)
+        return make_dag(_func, max_concurrency, is_async, pools, timeout, memory_budget)
     except NameError as e:
         if _func.__name__ in e.args[0]:
             warnings.warn("Recursion is not supported for DAGs", stacklevel=3)
@@ -114,11 +130,16 @@ def wrap_make_dag(
 
 
 def threadsafe_make_dag(
-    _func: Union[Callable[P, RVDAG]], max_concurrency: int, is_async: bool
+    _func: Union[Callable[P, RVDAG]],
+    max_concurrency: int,
+    is_async: bool,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[DAG[P, RVDAG], AsyncDAG[P, RVDAG]]:
     """Make DAG or AsyncDAG form the function that describes the DAG.
 
     Thread safe and cleans after itself.
     """
     with node.exec_nodes_lock:
-        return wrap_make_dag(_func, max_concurrency, is_async)
+        return wrap_make_dag(_func, max_concurrency, is_async, pools, timeout, memory_budget)
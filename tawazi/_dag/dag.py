@@ -1,33 +1,46 @@
 """module containing DAG and DAGExecution which are the containers that run ExecNodes in Tawazi."""
+import asyncio
 import json
 import pickle
 import warnings
-from collections import Counter
+import weakref
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from copy import deepcopy
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from itertools import chain
 from pathlib import Path
+from threading import Lock
+from types import TracebackType
 from typing import (
     Any,
+    AsyncIterator,
     Callable,
+    Deque,
     Dict,
     Generic,
     Iterable,
+    Iterator,
     List,
     NoReturn,
     Optional,
     Sequence,
     Set,
     Tuple,
+    Type,
     Union,
 )
 
 import networkx as nx
 import yaml
 from loguru import logger
+from typing_extensions import Self
 
 from tawazi import consts
+from tawazi._checkpoint import Checkpoint
 from tawazi._helpers import StrictDict, UniqueKeyLoader
+from tawazi._process import ProcessPool
+from tawazi._timeout_pool import TimeoutPool
 from tawazi.config import cfg
 from tawazi.consts import ARG_NAME_ACTIVATE, RVDAG, Identifier, P, Tag
 from tawazi.errors import TawaziTypeError, TawaziUsageError
@@ -36,7 +49,14 @@ from tawazi.node.node import LazyExecNode, make_active, make_axn_id
 from tawazi.profile import Profile
 
 from .digraph import DiGraphEx
-from .helpers import async_execute, extend_results_with_args, get_return_values, sync_execute
+from .helpers import (
+    SharedSlots,
+    async_execute,
+    extend_results_with_args,
+    get_return_values,
+    sync_execute,
+)
+from .plan import ExecutionPlan
 
 
 def construct_subdag_arg_uxns(
@@ -66,6 +86,109 @@ def detect_duplicates(expanded_config: List[Tuple[Identifier, Any]]) -> None:
         raise ValueError(f"trying to set two configs for nodes {duplicates}.")
 
 
+def next_done(pending: Deque["Future[Any]"], ordered: bool) -> Any:
+    """Wait for the result of the next execution of `DAG.map`.
+
+    Args:
+        pending: the futures of the executions in flight, in the order of their inputs
+        ordered: take the oldest execution, otherwise the first one to finish
+
+    Returns:
+        the result of the execution, which is removed from pending
+    """
+    if ordered:
+        future = pending.popleft()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = next(f for f in pending if f in done)
+        pending.remove(future)
+    return future.result()
+
+
+async def anext_done(pending: Deque["asyncio.Future[Any]"], ordered: bool) -> Any:
+    """Wait for the result of the next execution of `AsyncDAG.map`.
+
+    Args:
+        pending: the tasks of the executions in flight, in the order of their inputs
+        ordered: take the oldest execution, otherwise the first one to finish
+
+    Returns:
+        the result of the execution, which is removed from pending
+    """
+    if ordered:
+        task = pending.popleft()
+    else:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        task = next(t for t in pending if t in done)
+        pending.remove(task)
+    return await task
+
+
+def _validate_max_concurrency(max_concurrency: Any) -> None:
+    """Check that the maximum concurrency of the DAG is a positive int."""
+    if not isinstance(max_concurrency, int):
+        raise ValueError("max_concurrency must be an int")
+    if max_concurrency < 1:
+        raise ValueError("Invalid maximum number of threads! Must be a positive integer")
+
+
+def _validate_timeout(timeout: Any) -> None:
+    """Check that the timeout of the DAG is a positive number of seconds or None."""
+    if timeout is not None and (
+        isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0
+    ):
+        raise ValueError(f"timeout must be a positive number or None, provided {timeout!r}")
+
+
+def _validate_memory_budget(memory_budget: Any) -> None:
+    """Check that the memory budget of the DAG is a positive number of bytes or None."""
+    if memory_budget is not None and (
+        isinstance(memory_budget, bool) or not isinstance(memory_budget, int) or memory_budget <= 0
+    ):
+        raise ValueError(
+            f"memory_budget must be a positive int or None, provided {memory_budget!r}"
+        )
+
+
+def _validate_pools(pools: Dict[str, Any], exec_nodes: Dict[Identifier, ExecNode]) -> None:
+    """Check the capacities of the pools and that every ExecNode can fit in its pool.
+
+    Raises:
+        ValueError: if a capacity is invalid, a pool is unknown or a cost is bigger than its pool's capacity.
+    """
+    for name, capacity in pools.items():
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError(
+                f"capacity of pool {name} must be a positive int, provided {capacity!r}"
+            )
+    for xn in exec_nodes.values():
+        if xn.pool is None:
+            continue
+        if xn.pool not in pools:
+            raise ValueError(
+                f"ExecNode {xn.id} uses the pool {xn.pool} which is not declared in the DAG's pools {pools}"
+            )
+        if xn.cost > pools[xn.pool]:
+            raise ValueError(
+                f"ExecNode {xn.id} costs {xn.cost} which is more than the capacity "
+                f"{pools[xn.pool]} of the pool {xn.pool}"
+            )
+
+
+def _uses_durations() -> bool:
+    """Whether the durations of the ExecNodes are used to prioritize them or to size the batches."""
+    return cfg.TAWAZI_CRITICAL_PATH or cfg.TAWAZI_BATCH_SIZE > 1
+
+
+def _shutdown_pools(
+    process_pool: ProcessPool, interpreter_pool: ProcessPool, timeout_pool: TimeoutPool
+) -> None:
+    """Shut down the pools of a DAG that was garbage collected, without waiting for its running ExecNodes."""
+    process_pool.shutdown(wait=False)
+    interpreter_pool.shutdown(wait=False)
+    timeout_pool.shutdown()
+
+
 @dataclass
 class BaseDAG(Generic[P, RVDAG]):
     """Data Structure containing ExecNodes with interdependencies.
@@ -76,6 +199,7 @@ class BaseDAG(Generic[P, RVDAG]):
         * Parallelization constraint of each ExecNode (is_sequential attribute)
         * Priority of each ExecNode (priority attribute)
         * Specific Resource per ExecNode (resource attribute)
+        * Capacity of the pool of each ExecNode (pool and cost attributes)
     This Class has two flavors:
         * DAG: for synchronous execution
         * AsyncDAG: for asynchronous execution
@@ -85,6 +209,15 @@ class BaseDAG(Generic[P, RVDAG]):
         input_uxns: all the input UsageExecNodes
         return_uxns: the return UsageExecNodes of various types: None, a single value, tuple, list, dict.
         max_concurrency: the maximal number of threads running in parallel
+        pools: the capacity of every named pool, e.g. `{"cpu": 4, "io": 64}`.
+            An ExecNode with a pool only starts when the ExecNodes of the same pool that are running
+            leave enough capacity for its cost. `max_concurrency` still limits the total.
+        timeout: the maximum number of seconds of every execution, a TawaziTimeoutError is raised once it is over.
+        memory_budget: the maximum number of bytes taken by the results of an execution.
+            The oldest large results are spilled to disk once it is exceeded (see `MemoryBudget`).
+        thread_pool: the pool of threads used to run the ExecNodes.
+            If None is provided, the DAG creates its own pool on the first execution and reuses it afterward.
+            A provided pool is shared with the caller, who is responsible for shutting it down.
     """
 
     qualname: str
@@ -93,25 +226,252 @@ class BaseDAG(Generic[P, RVDAG]):
     input_uxns: List[UsageExecNode]
     return_uxns: ReturnUXNsType
     max_concurrency: int = 1
+    pools: Dict[str, int] = field(default_factory=dict)
+    timeout: Optional[float] = None
+    memory_budget: Optional[int] = None
+    thread_pool: Optional[ThreadPoolExecutor] = None
     graph_ids: DiGraphEx = field(init=False)
+    # mean duration in seconds of every ExecNode, used to prioritize them when TAWAZI_CRITICAL_PATH is enabled
+    # and to size the batches when TAWAZI_BATCH_SIZE is bigger than 1
+    durations: Dict[Identifier, float] = field(init=False, default_factory=dict)
 
     def __post_init__(self) -> None:
+        # the DAG only shuts down the pool it creates itself
+        self._owns_thread_pool = self.thread_pool is None
+        self._thread_pool_lock = Lock()
+        # shut down the owned pools when the DAG is dropped without being closed
+        self._thread_pool_finalizer: Optional[weakref.finalize] = None
+        self._pools_finalizer: Optional[weakref.finalize] = None
+        # plans compiled for DAG.__call__ depending on whether debug nodes run, whether the ExecNodes
+        # are prioritized by their durations or not, whether results are released and whether ExecNodes are batched
+        self._call_plans: Dict[Tuple[bool, bool, bool, bool], ExecutionPlan] = {}
+        # number of durations averaged for every ExecNode and the durations used by the call plans
+        self._duration_counts: Dict[Identifier, int] = {}
+        self._ranked_durations: Dict[Identifier, float] = {}
+
         self.graph_ids = DiGraphEx.from_exec_nodes(
             input_nodes=self.input_uxns, exec_nodes=self.exec_nodes
         )
 
         # verification
-        if not isinstance(self.max_concurrency, int):
-            raise ValueError("max_concurrency must be an int")
-        if self.max_concurrency < 1:
-            raise ValueError("Invalid maximum number of threads! Must be a positive integer")
+        _validate_max_concurrency(self.max_concurrency)
         self._max_concurrency = self.max_concurrency
+        self._make_pools()
+
+        _validate_timeout(self.timeout)
 
         if not isinstance(self.results, StrictDict):
             raise ValueError("results must be a StrictDict")
         if not isinstance(self.exec_nodes, StrictDict):
             raise ValueError("exec_nodes must be a StrictDict")
 
+        _validate_pools(self.pools, self.exec_nodes)
+        _validate_memory_budget(self.memory_budget)
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        """Get the pool of threads of the DAG, creating it on first use.
+
+        Returns:
+            ThreadPoolExecutor: the long-lived pool shared by all the executions of this DAG.
+        """
+        if self.thread_pool is None:
+            with self._thread_pool_lock:
+                # another thread might have created the pool while waiting for the lock
+                if self.thread_pool is None:
+                    self.thread_pool = ThreadPoolExecutor(
+                        max_workers=self.max_concurrency, thread_name_prefix=self.qualname
+                    )
+                    self._thread_pool_finalizer = weakref.finalize(
+                        self, self.thread_pool.shutdown, wait=False
+                    )
+        return self.thread_pool
+
+    def _make_pools(self) -> None:
+        """Create the pools of processes, sub-interpreters and threads of the ExecNodes with a timeout.
+
+        The worker processes are only started when an ExecNode with Resource.process runs,
+        and the threads when an ExecNode with a timeout runs.
+        """
+        if self._pools_finalizer is not None:
+            self._pools_finalizer.detach()
+        self._process_pool = ProcessPool(max_workers=self.max_concurrency)
+        self._interpreter_pool = ProcessPool(
+            max_workers=self.max_concurrency, sub_interpreters=True
+        )
+        self._timeout_pool = TimeoutPool(
+            max_workers=self.max_concurrency + cfg.TAWAZI_TIMED_OUT_THREADS,
+            name=f"{self.qualname}_timeout",
+        )
+        self._pools_finalizer = weakref.finalize(
+            self, _shutdown_pools, self._process_pool, self._interpreter_pool, self._timeout_pool
+        )
+
+    def _max_in_flight(self, max_in_flight: Optional[int]) -> int:
+        """Validate the number of executions run at the same time by `map`.
+
+        Args:
+            max_in_flight (Optional[int]): the value provided to `map`
+
+        Returns:
+            int: the number of executions, `max_concurrency` if None is provided.
+
+        Raises:
+            ValueError: if max_in_flight is not a positive int or None
+        """
+        if max_in_flight is None:
+            return self.max_concurrency
+        if (
+            isinstance(max_in_flight, bool)
+            or not isinstance(max_in_flight, int)
+            or max_in_flight < 1
+        ):
+            raise ValueError(
+                f"max_in_flight must be a positive int or None, provided {max_in_flight!r}"
+            )
+        return max_in_flight
+
+    def _setup_done(self) -> bool:
+        """Whether all the setup ExecNodes of the DAG were executed."""
+        return all(xn.executed(self.results) for xn in self.exec_nodes.values() if xn.setup)
+
+    def _get_call_plan(self) -> ExecutionPlan:
+        """Get the compiled plan of the whole DAG, compiling it on first use.
+
+        Returns:
+            ExecutionPlan: the plan executed when calling the DAG.
+        """
+        key = (
+            cfg.RUN_DEBUG_NODES,
+            cfg.TAWAZI_CRITICAL_PATH,
+            cfg.TAWAZI_RELEASE_RESULTS,
+            cfg.TAWAZI_BATCH_SIZE > 1,
+        )
+        plan = self._call_plans.get(key)
+        if plan is None:
+            graph = self.graph_ids.extend_graph_with_debug_nodes(self.graph_ids, cfg)
+            durations = self._plan_durations()
+            plan = ExecutionPlan.from_graph(
+                graph,
+                self.exec_nodes,
+                durations,
+                self._retained_ids(),
+                rank=cfg.TAWAZI_CRITICAL_PATH,
+            )
+            self._ranked_durations = durations or {}
+            self._call_plans[key] = plan
+        return plan
+
+    def _plan_durations(self) -> Optional[Dict[Identifier, float]]:
+        """Get the durations used to prioritize the ExecNodes of a new plan and to size its batches.
+
+        Returns:
+            Optional[Dict[Identifier, float]]: a copy of the durations if `TAWAZI_CRITICAL_PATH` is enabled
+                or if `TAWAZI_BATCH_SIZE` is bigger than 1, None otherwise.
+        """
+        if not _uses_durations():
+            return None
+        return dict(self.durations)
+
+    def _retained_ids(self) -> Optional[Set[Identifier]]:
+        """Get the ExecNodes whose results are used after the execution.
+
+        Returns:
+            Optional[Set[Identifier]]: the ids of the returned ExecNodes if `TAWAZI_RELEASE_RESULTS` is enabled,
+                None otherwise.
+        """
+        if not cfg.TAWAZI_RELEASE_RESULTS:
+            return None
+        if self.return_uxns is None:
+            return set()
+        if isinstance(self.return_uxns, UsageExecNode):
+            return {self.return_uxns.id}
+        if isinstance(self.return_uxns, dict):
+            return {uxn.id for uxn in self.return_uxns.values()}
+        return {uxn.id for uxn in self.return_uxns}
+
+    def _record_durations(self, profiles: Dict[Identifier, Profile]) -> None:
+        """Accumulate the measured durations of the ExecNodes when they are used by the plans (see `_plan_durations`).
+
+        The call plans are compiled again once a duration moved away from the one they were compiled with.
+
+        Args:
+            profiles (Dict[Identifier, Profile]): the profiles of an execution
+        """
+        if not _uses_durations():
+            return
+        changed = False
+        for id_, profile in profiles.items():
+            if not profile.active:
+                continue
+            # mean of the last executions, the durations keep following the ExecNodes that slow down or speed up
+            count = min(self._duration_counts.get(id_, 0) + 1, 10)
+            self._duration_counts[id_] = count
+            previous = self.durations.get(id_, profile.abs_exec_time)
+            duration = previous + (profile.abs_exec_time - previous) / count
+            self.durations[id_] = duration
+
+            ranked = self._ranked_durations.get(id_)
+            # ignore the jitter of the ExecNodes that take less than a millisecond
+            if ranked is None or abs(duration - ranked) > max(0.1 * ranked, 1e-3):
+                changed = True
+        if changed:
+            self._call_plans = {}
+
+    def close(self) -> None:
+        """Shut down the pools of threads, processes and sub-interpreters owned by the DAG.
+
+        Waits for the running ExecNodes to finish, except the threaded ones with a timeout which might never return.
+        A pool provided by the caller is left untouched.
+        The DAG can still be executed afterward, in which case new pools are created.
+        """
+        with self._thread_pool_lock:
+            if self._owns_thread_pool and self.thread_pool is not None:
+                self.thread_pool.shutdown(wait=True)
+                self.thread_pool = None
+                if self._thread_pool_finalizer is not None:
+                    self._thread_pool_finalizer.detach()
+                    self._thread_pool_finalizer = None
+        self._process_pool.shutdown(wait=True)
+        self._interpreter_pool.shutdown(wait=True)
+        # an ExecNode that timed out might never return
+        self._timeout_pool.shutdown()
+
+    def __enter__(self) -> Self:
+        """Use the DAG as a context manager that closes it on exit.
+
+        Returns:
+            BaseDAG: self
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        """Close the DAG even if an error was raised."""
+        self.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle the DAG without its pools and lock which can't be pickled."""
+        state = self.__dict__.copy()
+        state["thread_pool"] = None
+        state["_owns_thread_pool"] = True
+        del state["_thread_pool_lock"]
+        del state["_process_pool"]
+        del state["_interpreter_pool"]
+        del state["_timeout_pool"]
+        state["_thread_pool_finalizer"] = None
+        state["_pools_finalizer"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore the DAG, new pools will be created on first use."""
+        self.__dict__.update(state)
+        self._thread_pool_lock = Lock()
+        self._make_pools()
+
     def draw(
         self, *, include_args: bool = False, filename: Optional[str] = None, view: bool = True
     ) -> None:
@@ -404,6 +764,12 @@ class BaseDAG(Generic[P, RVDAG]):
         )
 
         # 7. return the composed DAG/AsyncDAG
+        defaults: Dict[str, Any] = {
+            "pools": self.pools,
+            "timeout": self.timeout,
+            "memory_budget": self.memory_budget,
+        }
+        kwargs = {**defaults, **kwargs}
         if is_async is False or (is_async is None and isinstance(self, DAG)):
             return DAG(
                 qualname=qualname,
@@ -515,25 +881,59 @@ class BaseDAG(Generic[P, RVDAG]):
         Args:
             config (Dict[str, Any]): the dictionary containing the config
                 example: {"nodes": {"a": {"priority": 3, "is_sequential": True}}, "max_concurrency": 3}
+                The capacities of the pools can be changed too: {"pools": {"db": 4}}
+                and the durations of the nodes in seconds can be declared: {"durations": {"a": 0.5}}
+                as well as the timeout of the executions in seconds: {"timeout": 10}
+                and the memory budget of the executions in bytes: {"memory_budget": 2**30}
 
         Raises:
             ValueError: if two nodes are configured by the provided config (which is ambiguous)
+                or if a value of the config is invalid, the DAG is left unchanged in that case.
         """
+        # the whole config is validated before the DAG is changed
+        exec_nodes: Dict[Identifier, ExecNode] = {}
         if "nodes" in config:
             expanded_config = self._expand_config(config["nodes"])
             detect_duplicates(expanded_config)
             for node_id, conf_node in expanded_config:
-                node = self.get_node_by_id(node_id)
-                values = node._conf_to_values(conf_node)
-                self.exec_nodes.force_set(node_id, type(node)(**values))
+                exec_nodes[node_id] = self.get_node_by_id(node_id)._reconfigure(conf_node)
+
+        max_concurrency = config.get("max_concurrency", self.max_concurrency)
+        _validate_max_concurrency(max_concurrency)
+        pools = {**self.pools, **config.get("pools", {})}
+        _validate_pools(pools, {**self.exec_nodes, **exec_nodes})
+        timeout = config.get("timeout", self.timeout)
+        _validate_timeout(timeout)
+        memory_budget = config.get("memory_budget", self.memory_budget)
+        _validate_memory_budget(memory_budget)
+        durations = [
+            (node_id, float(duration))
+            for node_id, duration in self._expand_config(config.get("durations", {}))
+        ]
+
+        for node_id, exec_node in exec_nodes.items():
+            self.exec_nodes.force_set(node_id, exec_node)
 
         if "max_concurrency" in config:
-            self.max_concurrency = config["max_concurrency"]
+            self.max_concurrency = max_concurrency
+            # the pools owned by the DAG are resized on next use
+            self.close()
+            self._make_pools()
+
+        self.pools = pools
+        self.timeout = timeout
+        self.memory_budget = memory_budget
+
+        for node_id, duration in durations:
+            self.durations[node_id] = duration
+            # the declared duration counts as a single measurement
+            self._duration_counts[node_id] = 1
 
         # we might have changed the priority of some nodes we need to recompute the DiGraph
         self.graph_ids = DiGraphEx.from_exec_nodes(
             input_nodes=self.input_uxns, exec_nodes=self.exec_nodes
         )
+        self._call_plans = {}
 
     def config_from_yaml(self, config_path: str) -> None:
         """Allows reconfiguring the parameters of the nodes from a YAML file.
@@ -570,6 +970,7 @@ class DAG(BaseDAG[P, RVDAG]):
         cache_deps_of: Optional[Sequence[Alias]] = None,
         cache_in: str = "",
         from_cache: str = "",
+        checkpoint_dir: str = "",
     ) -> "DAGExecution[P, RVDAG]":
         """Generates a DAGExecution for the DAG.
 
@@ -580,6 +981,7 @@ class DAG(BaseDAG[P, RVDAG]):
             cache_deps_of: which nodes to cache the dependencies of
             cache_in: the path to the file where to cache
             from_cache: the cache
+            checkpoint_dir: the directory where the results are saved as soon as they are computed
 
         Returns:
             the DAGExecution object associated with the dag
@@ -592,6 +994,7 @@ class DAG(BaseDAG[P, RVDAG]):
             cache_deps_of=cache_deps_of,
             cache_in=cache_in,
             from_cache=from_cache,
+            checkpoint_dir=checkpoint_dir,
         )
 
     def setup(
@@ -624,12 +1027,26 @@ class DAG(BaseDAG[P, RVDAG]):
             exec_nodes=self.exec_nodes,
             results=self.results,
             max_concurrency=self.max_concurrency,
-            graph=graph,
+            plan=ExecutionPlan.from_graph(
+                graph, self.exec_nodes, self._plan_durations(), rank=cfg.TAWAZI_CRITICAL_PATH
+            ),
+            thread_pool=self._get_thread_pool(),
+            process_pool=self._process_pool,
+            interpreter_pool=self._interpreter_pool,
+            timeout_pool=self._timeout_pool,
+            pools=self.pools,
+            timeout=self.timeout,
+            memory_budget=self.memory_budget,
         )
 
     # TODO: discuss whether we want to expose it or not
     def run_subgraph(
-        self, subgraph: DiGraphEx, results: Optional[StrictDict[Identifier, Any]], *args: P.args
+        self,
+        plan: ExecutionPlan,
+        results: Optional[StrictDict[Identifier, Any]],
+        *args: P.args,
+        checkpoint: Optional[Checkpoint] = None,
+        shared_slots: Optional[SharedSlots] = None,
     ) -> Tuple[
         StrictDict[Identifier, ExecNode],
         StrictDict[Identifier, Any],
@@ -638,9 +1055,11 @@ class DAG(BaseDAG[P, RVDAG]):
         """Run a subgraph of the original graph (might be the same graph).
 
         Args:
-            subgraph: the subgraph to run
+            plan: the compiled plan of the subgraph to run
             results: the results provided from the dag (containing setup) or coming from a modified DAG (from DAGExecution)
             *args: the args to pass to the graph
+            checkpoint: the checkpoint the results are saved to. Defaults to None.
+            shared_slots: the running slots shared with the other executions of `map`. Defaults to None.
 
         Returns:
             a mapping between the execnodes and there identifiers
@@ -654,9 +1073,20 @@ class DAG(BaseDAG[P, RVDAG]):
             exec_nodes=self.exec_nodes,
             results=results,
             max_concurrency=self.max_concurrency,
-            graph=subgraph,
+            plan=plan,
+            thread_pool=self._get_thread_pool(),
+            process_pool=self._process_pool,
+            interpreter_pool=self._interpreter_pool,
+            timeout_pool=self._timeout_pool,
+            pools=self.pools,
+            timeout=self.timeout,
+            memory_budget=self.memory_budget,
+            checkpoint=checkpoint,
+            shared_slots=shared_slots,
         )
 
+        self._record_durations(profiles)
+
         # set DAG.results to the obtained value from setup ExecNodes
         for node_id, result in results.items():
             xn = self.exec_nodes[node_id]
@@ -749,7 +1179,7 @@ class DAG(BaseDAG[P, RVDAG]):
                     )
                     continue
 
-                values = asdict(exec_node)
+                values = exec_node._init_values()
                 values["id_"] = new_id
 
                 values["args"] = [
@@ -798,10 +1228,62 @@ class DAG(BaseDAG[P, RVDAG]):
             finally:
                 node.DAG_PREFIX.pop()
 
-        graph = self.graph_ids.extend_graph_with_debug_nodes(self.graph_ids, cfg)
-        _, results, _ = self.run_subgraph(graph, None, *args)
+        _, results, _ = self.run_subgraph(self._get_call_plan(), None, *args)
         return get_return_values(self.return_uxns, results)  # type: ignore[return-value]
 
+    def map(
+        self, *iterables: Iterable[Any], max_in_flight: Optional[int] = None, ordered: bool = True
+    ) -> Iterator[RVDAG]:
+        """Execute the DAG once per input, several executions running at the same time.
+
+        Like the builtin `map`, the n-th execution receives the n-th item of every iterable
+        and the iterables are consumed lazily.
+        The executions share the pools of the DAG: the ExecNodes of an execution fill the slots left idle by the others.
+        `max_concurrency` holds across all the executions and a sequential ExecNode runs alone among all of them.
+        The setup ExecNodes are executed once, before the first execution.
+
+        Args:
+            *iterables (Iterable[Any]): the arguments of the executions
+            max_in_flight (Optional[int]): the maximum number of executions running at the same time.
+                Defaults to None (`max_concurrency`).
+            ordered (bool): yield the results in the order of the inputs, otherwise as soon as they are available.
+                Defaults to True.
+
+        Returns:
+            Iterator[RVDAG]: the return values of the executions. The error of a failed execution is raised
+                in place of its return value, the executions that didn't start yet are cancelled.
+        """
+        return self._map(zip(*iterables), self._max_in_flight(max_in_flight), ordered)
+
+    def _map(
+        self, inputs: Iterator[Tuple[Any, ...]], max_in_flight: int, ordered: bool
+    ) -> Iterator[RVDAG]:
+        if not self._setup_done():
+            self.setup()
+        plan = self._get_call_plan()
+        # max_concurrency and the sequential ExecNodes hold across all the executions
+        slots = SharedSlots(self.max_concurrency)
+
+        def run(args: Tuple[Any, ...]) -> RVDAG:
+            _, results, _ = self.run_subgraph(plan, None, *args, shared_slots=slots)
+            return get_return_values(self.return_uxns, results)  # type: ignore[return-value]
+
+        # these threads only drive the schedulers of the executions, the ExecNodes run in the pools of the DAG
+        with ThreadPoolExecutor(
+            max_in_flight, thread_name_prefix=f"{self.qualname}-map"
+        ) as drivers:
+            pending: Deque["Future[RVDAG]"] = deque()
+            try:
+                for args in inputs:
+                    if len(pending) == max_in_flight:
+                        yield next_done(pending, ordered)
+                    pending.append(drivers.submit(run, args))
+                while pending:
+                    yield next_done(pending, ordered)
+            finally:
+                for future in pending:
+                    future.cancel()
+
 
 @dataclass
 class AsyncDAG(BaseDAG[P, RVDAG]):
@@ -813,6 +1295,7 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
         cache_deps_of: Optional[Sequence[Alias]] = None,
         cache_in: str = "",
         from_cache: str = "",
+        checkpoint_dir: str = "",
     ) -> "AsyncDAGExecution[P, RVDAG]":
         """Generates a AsyncDAGExecution for the current AsyncDAG.
 
@@ -823,6 +1306,7 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
             cache_deps_of: which nodes to cache the dependencies of
             cache_in: the path to the file where to cache
             from_cache: the cache
+            checkpoint_dir: the directory where the results are saved as soon as they are computed
 
         Returns:
             the DAGExecution object associated with the dag
@@ -835,6 +1319,7 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
             cache_deps_of=cache_deps_of,
             cache_in=cache_in,
             from_cache=from_cache,
+            checkpoint_dir=checkpoint_dir,
         )
 
     async def setup(
@@ -867,13 +1352,27 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
             exec_nodes=self.exec_nodes,
             results=self.results,
             max_concurrency=self.max_concurrency,
-            graph=graph,
+            plan=ExecutionPlan.from_graph(
+                graph, self.exec_nodes, self._plan_durations(), rank=cfg.TAWAZI_CRITICAL_PATH
+            ),
+            thread_pool=self._get_thread_pool(),
+            process_pool=self._process_pool,
+            interpreter_pool=self._interpreter_pool,
+            timeout_pool=self._timeout_pool,
+            pools=self.pools,
+            timeout=self.timeout,
+            memory_budget=self.memory_budget,
         )
         return
 
     # TODO: refactor this with previous method
     async def run_subgraph(
-        self, subgraph: DiGraphEx, results: Optional[StrictDict[Identifier, Any]], *args: P.args
+        self,
+        plan: ExecutionPlan,
+        results: Optional[StrictDict[Identifier, Any]],
+        *args: P.args,
+        checkpoint: Optional[Checkpoint] = None,
+        shared_slots: Optional[SharedSlots] = None,
     ) -> Tuple[
         StrictDict[Identifier, ExecNode],
         StrictDict[Identifier, Any],
@@ -882,9 +1381,11 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
         """Run a subgraph of the original graph (might be the same graph).
 
         Args:
-            subgraph: the subgraph to run
+            plan: the compiled plan of the subgraph to run
             results: the results provided from the dag (containing setup) or coming from a modified DAG (from DAGExecution)
             *args: the args to pass to the graph
+            checkpoint: the checkpoint the results are saved to. Defaults to None.
+            shared_slots: the running slots shared with the other executions of `map`. Defaults to None.
 
         Returns:
             a mapping between the execnodes and there identifiers
@@ -898,9 +1399,20 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
             exec_nodes=self.exec_nodes,
             results=results,
             max_concurrency=self.max_concurrency,
-            graph=subgraph,
+            plan=plan,
+            thread_pool=self._get_thread_pool(),
+            process_pool=self._process_pool,
+            interpreter_pool=self._interpreter_pool,
+            timeout_pool=self._timeout_pool,
+            pools=self.pools,
+            timeout=self.timeout,
+            memory_budget=self.memory_budget,
+            checkpoint=checkpoint,
+            shared_slots=shared_slots,
         )
 
+        self._record_durations(profiles)
+
         # set DAG.results to the obtained value from setup ExecNodes
         for node_id, result in results.items():
             xn = self.exec_nodes[node_id]
@@ -933,10 +1445,54 @@ class AsyncDAG(BaseDAG[P, RVDAG]):
         if kwargs:
             raise TawaziUsageError(f"currently DAG does not support keyword arguments: {kwargs}")
 
-        graph = self.graph_ids.extend_graph_with_debug_nodes(self.graph_ids, cfg)
-        _, results, _ = await self.run_subgraph(graph, None, *args)
+        _, results, _ = await self.run_subgraph(self._get_call_plan(), None, *args)
         return get_return_values(self.return_uxns, results)  # type: ignore[return-value]
 
+    def map(
+        self, *iterables: Iterable[Any], max_in_flight: Optional[int] = None, ordered: bool = True
+    ) -> AsyncIterator[RVDAG]:
+        """Execute the AsyncDAG once per input, several executions running at the same time on the event loop.
+
+        Look at `DAG.map` for more information.
+
+        Args:
+            *iterables (Iterable[Any]): the arguments of the executions
+            max_in_flight (Optional[int]): the maximum number of executions running at the same time.
+                Defaults to None (`max_concurrency`).
+            ordered (bool): yield the results in the order of the inputs, otherwise as soon as they are available.
+                Defaults to True.
+
+        Returns:
+            AsyncIterator[RVDAG]: the return values of the executions. The error of a failed execution is raised
+                in place of its return value, the executions still running are cancelled.
+        """
+        return self._amap(zip(*iterables), self._max_in_flight(max_in_flight), ordered)
+
+    async def _amap(
+        self, inputs: Iterator[Tuple[Any, ...]], max_in_flight: int, ordered: bool
+    ) -> AsyncIterator[RVDAG]:
+        if not self._setup_done():
+            await self.setup()
+        plan = self._get_call_plan()
+        # max_concurrency and the sequential ExecNodes hold across all the executions
+        slots = SharedSlots(self.max_concurrency)
+
+        async def run(args: Tuple[Any, ...]) -> RVDAG:
+            _, results, _ = await self.run_subgraph(plan, None, *args, shared_slots=slots)
+            return get_return_values(self.return_uxns, results)  # type: ignore[return-value]
+
+        pending: Deque["asyncio.Future[RVDAG]"] = deque()
+        try:
+            for args in inputs:
+                if len(pending) == max_in_flight:
+                    yield await anext_done(pending, ordered)
+                pending.append(asyncio.ensure_future(run(args)))
+            while pending:
+                yield await anext_done(pending, ordered)
+        finally:
+            for task in pending:
+                task.cancel()
+
 
 @dataclass
 class BaseDAGExecution(Generic[P, RVDAG]):
@@ -962,6 +1518,10 @@ class BaseDAGExecution(Generic[P, RVDAG]):
             the path to the file where the execution should be loaded from.
             The path should end in `.pkl`.
             Will skip loading from cache if `from_cache` is Falsy.
+        checkpoint_dir (str):
+            the directory where the result of every ExecNode is saved as soon as it is computed,
+            to `resume` the execution if it fails.
+            Will skip checkpointing if `checkpoint_dir` is Falsy.
     """
 
     dag: BaseDAG[P, RVDAG]
@@ -974,6 +1534,7 @@ class BaseDAGExecution(Generic[P, RVDAG]):
     cache_deps_of: Optional[Sequence[Alias]] = None
     cache_in: str = ""
     from_cache: str = ""
+    checkpoint_dir: str = ""
 
     xn_dict: Dict[Identifier, ExecNode] = field(init=False, default_factory=dict)
     executed: bool = False
@@ -1016,6 +1577,13 @@ class BaseDAGExecution(Generic[P, RVDAG]):
 
         # add debug nodes
         self.graph = graph.extend_graph_with_debug_nodes(self.dag.graph_ids, cfg)
+        self.plan = ExecutionPlan.from_graph(
+            self.graph,
+            self.dag.exec_nodes,
+            self.dag._plan_durations(),
+            self.dag._retained_ids(),
+            rank=cfg.TAWAZI_CRITICAL_PATH,
+        )
 
     @property
     def results(self) -> StrictDict[Identifier, Any]:
@@ -1065,6 +1633,26 @@ class BaseDAGExecution(Generic[P, RVDAG]):
             for node in self.cached_nodes:
                 self.results = cached_results[node.id]
 
+    def _start_checkpoint(self, args: Tuple[Any, ...]) -> Optional[Checkpoint]:
+        if not self.checkpoint_dir:
+            return None
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        checkpoint.start(args)
+        return checkpoint
+
+    def _resume_checkpoint(self) -> Tuple[Tuple[Any, ...], StrictDict[Identifier, Any], Checkpoint]:
+        if not self.checkpoint_dir:
+            raise TawaziUsageError("Only a DAGExecution with a checkpoint_dir can be resumed.")
+        checkpoint = Checkpoint(self.checkpoint_dir)
+        args, saved = checkpoint.resume()
+        results = StrictDict(self.results)
+        for id_, result in saved.items():
+            # the saved results of ExecNodes outside of this subgraph are ignored
+            if id_ in self.plan.indices and id_ not in results:
+                results[id_] = result
+        logger.debug("Resuming the execution with the results of {}", list(saved))
+        return args, results, checkpoint
+
     def _post_call(self) -> RVDAG:
         # mark as executed. Important for the next step
         self.executed = True
@@ -1104,11 +1692,38 @@ class DAGExecution(BaseDAGExecution[P, RVDAG]):
             RVDAG: the return value of the DAG's Execution
         """
         self._pre_call()
+        return self._execute(self.results, args, self._start_checkpoint(args))
+
+    def resume(self) -> RVDAG:
+        """Resume the execution saved in `checkpoint_dir` by a previous DAGExecution that failed or crashed.
+
+        The ExecNodes whose results were saved are not executed again and the saved arguments are reused.
 
+        Raises:
+            TawaziUsageError: if the DAGExecution has already been executed or if nothing was checkpointed.
+
+        Returns:
+            RVDAG: the return value of the DAG's Execution
+        """
+        self._pre_call()
+        args, results, checkpoint = self._resume_checkpoint()
+        return self._execute(results, args, checkpoint)
+
+    def _execute(
+        self,
+        results: StrictDict[Identifier, Any],
+        args: Tuple[Any, ...],
+        checkpoint: Optional[Checkpoint],
+    ) -> RVDAG:
         # 2. Execute the scheduler
-        self.xn_dict, self.results, self.profiles = self.dag.run_subgraph(
-            self.graph, self.results, *args
-        )
+        try:
+            self.xn_dict, self.results, self.profiles = self.dag.run_subgraph(
+                self.plan, results, *args, checkpoint=checkpoint
+            )
+        finally:
+            # the results of the ExecNodes that finished are saved even if the execution failed
+            if checkpoint is not None:
+                checkpoint.close()
 
         return self._post_call()
 
@@ -1139,10 +1754,37 @@ class AsyncDAGExecution(BaseDAGExecution[P, RVDAG]):
             RVDAG: the return value of the DAG's Execution
         """
         self._pre_call()
+        return await self._execute(self.results, args, self._start_checkpoint(args))
+
+    async def resume(self) -> RVDAG:
+        """Resume the execution saved in `checkpoint_dir` by a previous AsyncDAGExecution that failed or crashed.
+
+        Look at `DAGExecution.resume` for more information.
+
+        Raises:
+            TawaziUsageError: if the AsyncDAGExecution has already been executed or if nothing was checkpointed.
+
+        Returns:
+            RVDAG: the return value of the DAG's Execution
+        """
+        self._pre_call()
+        args, results, checkpoint = self._resume_checkpoint()
+        return await self._execute(results, args, checkpoint)
 
+    async def _execute(
+        self,
+        results: StrictDict[Identifier, Any],
+        args: Tuple[Any, ...],
+        checkpoint: Optional[Checkpoint],
+    ) -> RVDAG:
         # 2. Execute the scheduler
-        self.xn_dict, self.results, self.profiles = await self.dag.run_subgraph(
-            self.graph, self.results, *args
-        )
+        try:
+            self.xn_dict, self.results, self.profiles = await self.dag.run_subgraph(
+                self.plan, results, *args, checkpoint=checkpoint
+            )
+        finally:
+            # the results of the ExecNodes that finished are saved even if the execution failed
+            if checkpoint is not None:
+                checkpoint.close()
 
         return self._post_call()
@@ -291,8 +291,8 @@ class DiGraphEx(nx.DiGraph):
         else:
             nodes_to_include = list(set(self.nodes) - set(self.debug_nodes))
 
-        # TODO: optimize this part by avoiding the copy of the graph which costing 40ms for findoc currently
-        #  it can be done by reconstructing the graph instead of destroying it in the scheduler
+        # NOTE: the copy of the graph is costly (40ms for findoc),
+        #  this is why the result is compiled once into an ExecutionPlan and reused by the scheduler.
         # networkx typing problem
         new_graph = original_graph.subgraph(nodes_to_include).copy()
         new_graph.tag = self.tag
@@ -1,21 +1,55 @@
+import abc
 import asyncio
+import contextlib
 import contextvars
 import functools
-from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
-from copy import copy
-from typing import Any, Callable, Dict, List, Set, Tuple, TypeVar
+import heapq
+import pickle
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from loguru import logger
 
-from tawazi._dag.digraph import DiGraphEx
+from tawazi._cancel import CancelToken, bind_token, reset_token, set_token
+from tawazi._checkpoint import Checkpoint, ResultsCheckpoint, checkpointing
+from tawazi._dag.plan import ExecutionPlan, PlanState, ResultsRelease, fusable
 from tawazi._helpers import StrictDict
-from tawazi.consts import Identifier, Resource, RVTypes
-from tawazi.errors import TawaziTypeError
+from tawazi._process import (
+    SUB_INTERPRETERS_AVAILABLE,
+    ProcessPool,
+    SetupResult,
+    SharedResult,
+    dump_payload,
+    make_target,
+)
+from tawazi._spill import MemoryBudget, SpillStore
+from tawazi._timeout_pool import TimeoutPool
+from tawazi.config import cfg
+from tawazi.consts import Identifier, NoVal, Resource, RVTypes
+from tawazi.errors import TawaziError, TawaziTimeoutError, TawaziTypeError
 from tawazi.node import ExecNode, ReturnUXNsType, UsageExecNode
 from tawazi.profile import Profile
 
-K = TypeVar("K")
-V = TypeVar("V")
+if TYPE_CHECKING:
+    from tawazi._shared_memory import SharedMemoryTransport, SharedPayload
+
+AnyFuture = Union["Future[Any]", "asyncio.Future[Any]"]
 
 
 def _xn_active_in_call(xn: ExecNode, results: Dict[Identifier, Any]) -> bool:
@@ -30,155 +64,619 @@ def _xn_active_in_call(xn: ExecNode, results: Dict[Identifier, Any]) -> bool:
     """
     if xn.active is None:
         return True
-    return bool(results[xn.active.id])
+    # the result of the activating ExecNode might be spilled to disk
+    return bool(xn.active.result(results))
+
+
+class SharedSlots:
+    """Running slots shared by the executions of `DAG.map`, so that `max_concurrency` holds across all of them.
+
+    Every running task of an execution holds a slot until its scheduler collects its end.
+    A sequential ExecNode holds all the slots: it runs alone among all the executions.
+    The executions that didn't get their slots are served first come, first served: once one of them waits,
+    the slots are not given to the others before it, so a sequential ExecNode is not starved by busy executions.
+    The first one is woken up once enough slots are given back.
+
+    >>> slots = SharedSlots(2)
+    >>> def first() -> None: ...
+    >>> def second() -> None: print("second woken up")
+    >>> slots.acquire(1, first), slots.acquire(2, second)
+    (True, False)
+    >>> slots.acquire(1, first)  # second waits before it
+    False
+    >>> slots.release(1)
+    second woken up
+    >>> slots.acquire(2, second), slots.acquire(1, first)
+    (True, False)
+    """
 
+    def __init__(self, capacity: int) -> None:
+        """Make all the slots free.
+
+        Args:
+            capacity: the number of slots
+        """
+        self.capacity = capacity
+        self.free = capacity
+        self._lock = threading.Lock()
+        # the number of slots and the wake up callback of the executions waiting for slots, in arrival order
+        self._waiting: List[Tuple[int, Callable[[], None]]] = []
+
+    def acquire(self, slots: int, wake: Callable[[], None]) -> bool:
+        """Take slots if enough of them are free and no other execution waits for slots before this one.
+
+        Args:
+            slots: the number of slots
+            wake: identifies the execution, called once it is its turn and enough slots are free.
+
+        Returns:
+            whether the slots were taken, otherwise the execution waits in line for them.
+        """
+        with self._lock:
+            position = self._position(wake)
+            # another execution waits for slots before this one
+            ahead = position > 0 or (position == -1 and bool(self._waiting))
+            if ahead or self.free < slots:
+                # the execution might need another number of slots than when it started waiting
+                if position == -1:
+                    self._waiting.append((slots, wake))
+                else:
+                    self._waiting[position] = (slots, wake)
+                return False
+            self.free -= slots
+            if position == 0:
+                self._waiting.pop(0)
+            first = self._first_served()
+        if first is not None:
+            first()
+        return True
 
-def copy_non_setup_xns(x_nodes: StrictDict[str, ExecNode]) -> StrictDict[str, ExecNode]:
-    """Deep copy all ExecNodes except setup ExecNodes because they are shared throughout the DAG instance.
+    def release(self, slots: int) -> None:
+        """Give slots back and wake up the first waiting execution if enough slots are free for it.
+
+        Args:
+            slots: the number of slots
+        """
+        with self._lock:
+            self.free += slots
+            first = self._first_served()
+        if first is not None:
+            first()
+
+    def leave(self, wake: Callable[[], None]) -> None:
+        """Stop waiting for slots, when the execution ends.
+
+        Args:
+            wake: identifies the execution
+        """
+        with self._lock:
+            position = self._position(wake)
+            if position == -1:
+                return
+            self._waiting.pop(position)
+            first = self._first_served() if position == 0 else None
+        if first is not None:
+            first()
+
+    def _position(self, wake: Callable[[], None]) -> int:
+        # the bound methods of the same completion queue are equal
+        for position, (_, waiting) in enumerate(self._waiting):
+            if waiting == wake:
+                return position
+        return -1
+
+    def _first_served(self) -> Optional[Callable[[], None]]:
+        if self._waiting and self.free >= self._waiting[0][0]:
+            return self._waiting[0][1]
+        return None
 
-    Args:
-        x_nodes: Dict[str, ExecNode] x_nodes to be deep copied
 
-    Returns:
-        Dict[str, ExecNode] copy of x_nodes
-    """
-    x_nodes_copy: StrictDict[str, ExecNode] = StrictDict()
-    for id_, x_nd in x_nodes.items():
-        # if execnode is a setup node, it shouldn't be copied
-        if x_nd.setup:
-            x_nodes_copy[id_] = x_nd
-        else:
-            # no need to deepcopy. we only need to know if self.result is NoVal or not (TODO: fix this COmment)
-            x_nodes_copy[id_] = copy(x_nd)
-    return x_nodes_copy
-
-
-class BiDict(Dict[K, V]):
-    """A bidirectional dictionary that raises an error if two keys are mapped to the same value.
-
-    >>> b = BiDict({1: 'one', 2: 'two'})
-    >>> b[1]
-    'one'
-    >>> b.inverse['one']
-    1
-    >>> b[3] = 'three'
-    >>> b.inverse['three']
-    3
-    >>> b[3] = 'threeeee'
-    >>> b.inverse['threeeee']
-    3
-    >>> b[4] = 'one'
-    Traceback (most recent call last):
-    ...
-    ValueError: Value one is already in the BiDict
-    >>> del b[1]
-    >>> assert 1 not in b
-    >>> b[4] = 'one'
-    >>> b.inverse['one']
-    4
-    >>> BiDict({1: 2, 3: 2})
-    Traceback (most recent call last):
-    ...
-    ValueError: Value 2 is already in the BiDict
+class _Completions(abc.ABC):
+    """Bookkeeping of the running tasks shared by the completion queues."""
+
+    def __init__(self) -> None:
+        # number of running tasks, a task might execute several ExecNodes (see execute_batch)
+        self.running = 0
+        # the ExecNodes that timed out: their futures are ignored when they finish
+        self.abandoned: Set[int] = set()
+        # the asyncio futures of the running ExecNodes, cancelled if the execution stops
+        self.tasks: Dict[int, "asyncio.Future[Any]"] = {}
+        # the concurrent futures of the running ExecNodes, only tracked in fail-fast mode (see `cancel_on_failure`)
+        self.futures: Optional[Dict[int, "Future[Any]"]] = None
+        # the slots shared with the other executions of `DAG.map` (see `sharing_slots`), the number of slots held
+        # by this execution, whether they are held by a sequential ExecNode and whether it waits for slots
+        self.shared: Optional[SharedSlots] = None
+        self.held = 0
+        self.exclusive = False
+        self.waiting = False
+
+    @abc.abstractmethod
+    def wake(self) -> None:
+        """Wake up the scheduler waiting on the queue, from any thread."""
+
+    def reserve(self, xn: ExecNode) -> bool:
+        """Take the shared slots needed to run an ExecNode, a sequential ExecNode takes all of them.
+
+        Args:
+            xn: the ExecNode about to run
+
+        Returns:
+            whether the ExecNode can run, always True if the slots are not shared.
+                Otherwise the scheduler is woken up once slots are given back.
+        """
+        if self.shared is None:
+            return True
+        slots = self.shared.capacity if xn.is_sequential else 1
+        self.waiting = not self.shared.acquire(slots, self.wake)
+        if self.waiting:
+            return False
+        self.held += slots
+        self.exclusive = xn.is_sequential
+        return True
+
+    def give_back(self) -> None:
+        """Give back the shared slots that are not held by a running task."""
+        if self.shared is None or (self.exclusive and self.running):
+            return
+        self.exclusive = False
+        if self.held > self.running:
+            self.shared.release(self.held - self.running)
+            self.held = self.running
+
+    def abandon(self, index: int) -> None:
+        """Stop waiting for a running ExecNode that timed out, its running slot is freed right away.
+
+        Args:
+            index: the index of the ExecNode in the plan
+        """
+        self.running -= 1
+        self.abandoned.add(index)
+        self.tasks.pop(index, None)
+        self.give_back()
+
+    def cancel(self) -> None:
+        """Cancel the running coroutines and "async-thread" ExecNodes."""
+        for task in self.tasks.values():
+            task.cancel()
+
+    def cancel_all(self) -> int:
+        """Cancel the running coroutines and the ExecNodes of the pools that didn't start yet.
+
+        Returns:
+            the number of ExecNodes that won't run
+        """
+        self.cancel()
+        if not self.futures:
+            return 0
+        return sum(future.cancel() for future in self.futures.values())
+
+    def _collect(
+        self, finished: List[Optional[Tuple[int, AnyFuture, bool]]]
+    ) -> List[Tuple[int, AnyFuture]]:
+        collected = []
+        for item in finished:
+            # None is posted to wake up the scheduler when a deadline is over or when shared slots are given back
+            if item is None:
+                continue
+            index, future, slot = item
+            if self.abandoned and index in self.abandoned:
+                self.abandoned.discard(index)
+                continue
+            self.running -= slot
+            collected.append((index, future))
+        if self.tasks:
+            for index, _ in collected:
+                self.tasks.pop(index, None)
+        if self.futures:
+            for index, _ in collected:
+                self.futures.pop(index, None)
+        self.give_back()
+        return collected
+
+
+class CompletionQueue(_Completions):
+    """Queue to which every running ExecNode posts its future as soon as it finishes.
+
+    The scheduler waits on this single queue whatever the resource of the running ExecNodes is,
+    so the successors of a finished ExecNode are released without waiting for another kind of future.
+    Futures of the ThreadPoolExecutor finish in a worker thread: they post through the event loop
+    in a thread safe manner. asyncio futures finish in the event loop and post directly.
     """
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self.inverse: Dict[V, K] = {}
-        for key, value in self.items():
-            if value in self.inverse:
-                raise ValueError(f"Value {value} is already in the BiDict")
-            self.inverse[value] = key
-
-    def __setitem__(self, key: K, value: V) -> None:
-        if key in self:
-            del self.inverse[self[key]]
-        # check for errors before setting the value
-        if value in self.inverse:
-            raise ValueError(f"Value {value} is already in the BiDict")
-        super().__setitem__(key, value)
-        self.inverse[value] = key
-
-    def __delitem__(self, key: K) -> None:
-        del self.inverse[self[key]]
-        super().__delitem__(key)
-
-
-# TODO: refactor these functions by re-using the common parts
-def wait_for_finished_nodes(
-    return_when: str,
-    graph: DiGraphEx,
-    futures: BiDict[Identifier, "Future[Any]"],
-    done: Set["Future[Any]"],
-    running: Set["Future[Any]"],
-    runnable_xns_ids: Set[Identifier],
-) -> Tuple[Set["Future[Any]"], Set["Future[Any]"], Set[Identifier]]:
-    """Wait for the finished futures before pruning them from the graph.
+    def __init__(self) -> None:
+        """Create a completion queue bound to the running event loop."""
+        super().__init__()
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Optional[Tuple[int, AnyFuture, bool]]]" = asyncio.Queue()
+
+    def wake(self) -> None:
+        """Wake up the scheduler waiting on the queue, from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+        except RuntimeError:
+            logger.debug("Event loop closed before the shared slots were given back")
+
+    def _post_threadsafe(self, index: int, slot: bool, future: "Future[Any]") -> None:
+        # the loop might already be closed if the execution stopped because of another ExecNode's error
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (index, future, slot))
+        except RuntimeError:
+            logger.debug("Event loop closed before ExecNode {} finished", index)
+
+    def add_concurrent(self, index: int, future: "Future[Any]", slot: bool = True) -> None:
+        """Watch a future of the ThreadPoolExecutor.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            future: the future of the ExecNode's execution
+            slot: whether the end of this future ends a running task. Defaults to True.
+                Only the last ExecNode of a batch ends its task.
+        """
+        self.running += slot
+        if self.futures is not None:
+            self.futures[index] = future
+        future.add_done_callback(functools.partial(self._post_threadsafe, index, slot))
+
+    def add_async(self, index: int, future: "asyncio.Future[Any]") -> None:
+        """Watch an asyncio future.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            future: the future of the ExecNode's execution
+        """
+        self.running += 1
+        self.tasks[index] = future
+        future.add_done_callback(lambda f: self.queue.put_nowait((index, f, True)))
+
+    async def get(self, timeout: Optional[float] = None) -> List[Tuple[int, AnyFuture]]:
+        """Wait for at least one future to finish.
+
+        Args:
+            timeout: the maximum number of seconds to wait. Defaults to None.
+
+        Returns:
+            the indices and the futures of all the ExecNodes that finished, empty if the timeout is over.
+        """
+        timer = None
+        if timeout is not None:
+            timer = self.loop.call_later(timeout, self.queue.put_nowait, None)
+        finished = [await self.queue.get()]
+        if timer is not None:
+            timer.cancel()
+        while not self.queue.empty():
+            finished.append(self.queue.get_nowait())
+        return self._collect(finished)
+
+
+class ThreadCompletionQueue(_Completions):
+    """Thread safe queue to which every running ExecNode posts its future as soon as it finishes.
+
+    Used instead of CompletionQueue when the execution doesn't need an event loop:
+    the scheduler blocks on it in the calling thread.
+    """
 
-    Args:
-        return_when: condition for thread return
-        graph: the directed graph
-        futures: the futures to id map and reverse map
-        done: the set of finished futures
-        running: the running threads
-        runnable_xns_ids: the exec nodes that are available to be run
+    def __init__(self) -> None:
+        """Create an empty completion queue."""
+        super().__init__()
+        self.queue: "queue.SimpleQueue[Optional[Tuple[int, Future[Any], bool]]]" = (
+            queue.SimpleQueue()
+        )
 
-    Returns:
-        finisehd futures, running futures and runnable nodes
+    def wake(self) -> None:
+        """Wake up the scheduler waiting on the queue, from any thread."""
+        self.queue.put(None)
+
+    def add_concurrent(self, index: int, future: "Future[Any]", slot: bool = True) -> None:
+        """Watch a concurrent future.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            future: the future of the ExecNode's execution
+            slot: whether the end of this future ends a running task. Defaults to True.
+                Only the last ExecNode of a batch ends its task.
+        """
+        self.running += slot
+        if self.futures is not None:
+            self.futures[index] = future
+        future.add_done_callback(lambda f: self.queue.put((index, f, slot)))
+
+    def get(self, timeout: Optional[float] = None) -> List[Tuple[int, "Future[Any]"]]:
+        """Block until at least one future finishes.
+
+        Args:
+            timeout: the maximum number of seconds to wait. Defaults to None.
+
+        Returns:
+            the indices and the futures of all the ExecNodes that finished, empty if the timeout is over.
+        """
+        try:
+            finished = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while not self.queue.empty():
+            finished.append(self.queue.get_nowait())
+        return self._collect(finished)  # type: ignore[arg-type,return-value]
+
+
+class PoolTokens:
+    """Capacity left in the named pools of the DAG during a single execution.
+
+    A running ExecNode holds `cost` tokens of its pool until it finishes.
+    A ready ExecNode whose pool doesn't have enough tokens left is parked
+    until an ExecNode of the same pool gives its tokens back.
     """
-    if len(running) == 0:
-        return done, running, runnable_xns_ids
-    done_, running = wait(running, return_when=return_when)
-    done = done.union(done_)
-
-    # 1. among the finished futures:
-    #   1. checks for exceptions
-    #   2. and remove them from the graph
-    for done_future in done_:
-        future_id = futures.inverse[done_future]
-        _ = futures[future_id].result()  # raise exception by calling the future
-        logger.debug("Remove ExecNode {} from the graph", future_id)
-        runnable_xns_ids |= graph.remove_root_node(future_id)
-
-    return done, running, runnable_xns_ids
-
-
-async def wait_for_finished_nodes_async(
-    return_when: str,
-    graph: DiGraphEx,
-    futures: BiDict[Identifier, "asyncio.Future[Any]"],
-    done: Set["asyncio.Future[Any]"],
-    running: Set["asyncio.Future[Any]"],
-    runnable_xns_ids: Set[Identifier],
-) -> Tuple[Set["asyncio.Future[Any]"], Set["asyncio.Future[Any]"], Set[Identifier]]:
-    """Wait for the finished futures before pruning them from the graph.
 
-    Args:
-        return_when: condition for thread return
-        graph: the directed graph
-        futures: the futures to id map and reverse map
-        done: the set of finished futures
-        running: the running async-threads
-        runnable_xns_ids: the exec nodes that are available to be run
+    def __init__(self, pools: Dict[str, int]) -> None:
+        """Fill every pool with as many tokens as its capacity.
+
+        Args:
+            pools: the capacity of every pool
+        """
+        self.available = dict(pools)
+        # the pool and the cost of every running ExecNode holding tokens
+        self.held: Dict[int, Tuple[str, int]] = {}
+        self.parked: Dict[str, List[int]] = {name: [] for name in pools}
+
+    def acquire(self, index: int, xn: ExecNode) -> bool:
+        """Take the tokens needed to run an ExecNode, if its pool has enough of them left.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            xn: the ExecNode
+
+        Returns:
+            whether the ExecNode can run, always True if it has no pool.
+        """
+        if xn.pool is None:
+            return True
+        if self.available[xn.pool] < xn.cost:
+            return False
+        self.available[xn.pool] -= xn.cost
+        self.held[index] = (xn.pool, xn.cost)
+        return True
 
-    Returns:
-        finisehd futures, running futures and runnable nodes
+    def park(self, index: int, xn: ExecNode) -> None:
+        """Put aside a ready ExecNode until its pool gets tokens back.
+
+        Args:
+            index: the index of the ExecNode in the plan, it is already popped from the ready nodes.
+            xn: the ExecNode
+        """
+        logger.debug("Pool {} is full, {} waits for one of its ExecNodes to finish", xn.pool, xn.id)
+        self.parked[xn.pool].append(index)  # type: ignore[index]
+
+    def release(self, index: int, state: PlanState) -> None:
+        """Give back the tokens of a finished ExecNode and make the ExecNodes parked on its pool ready again.
+
+        Args:
+            index: the index of the finished ExecNode in the plan
+            state: the state of the execution of the plan
+        """
+        if not self.held or index not in self.held:
+            return
+        pool, cost = self.held.pop(index)
+        self.available[pool] += cost
+        for parked in self.parked[pool]:
+            state.push(parked)
+        self.parked[pool] = []
+
+
+class Deadlines:
+    """Deadlines of a single execution: the one of the whole execution and the ones of the running ExecNodes."""
+
+    def __init__(
+        self,
+        timeout: Optional[float],
+        exec_nodes: Dict[Identifier, ExecNode],
+        results: StrictDict[Identifier, Any],
+    ) -> None:
+        """Start the clock of the execution.
+
+        Args:
+            timeout: the maximum number of seconds of the execution, None for no limit.
+            exec_nodes: dictionary identifying ExecNodes
+            results: the results of the execution, the fallbacks of the ExecNodes that time out are written in it.
+        """
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.exec_nodes = exec_nodes
+        self.results = results
+        # the deadline and the future of every running ExecNode with a timeout
+        self.running: Dict[int, Tuple[float, AnyFuture]] = {}
+
+    def __bool__(self) -> bool:
+        """Whether a deadline must be watched."""
+        return self.deadline is not None or bool(self.running)
+
+    def start(self, index: int, xn: ExecNode, future: AnyFuture) -> None:
+        """Start the clock of a submitted ExecNode if it has a timeout.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            xn: the ExecNode
+            future: the future of its execution
+        """
+        if xn.timeout is not None:
+            self.running[index] = (time.monotonic() + xn.timeout, future)
+
+    def next_timeout(self) -> Optional[float]:
+        """Number of seconds until the next deadline, None if there is none."""
+        deadlines = [deadline for deadline, _ in self.running.values()]
+        if self.deadline is not None:
+            deadlines.append(self.deadline)
+        if not deadlines:
+            return None
+        return max(min(deadlines) - time.monotonic(), 0.0)
+
+    def expire(
+        self, state: PlanState, completions: _Completions, tokens: Optional[PoolTokens] = None
+    ) -> None:
+        """Handle the deadlines that are over.
+
+        An ExecNode that timed out is cancelled if it didn't start yet or if it is a coroutine
+        (a thread or a process can't be interrupted), its successors are released right away with its fallback.
+
+        Args:
+            state: the state of the execution of the plan
+            completions: the queue the running ExecNodes post to
+            tokens: the capacity of the pools, the tokens of the ExecNodes that timed out are given back.
+
+        Raises:
+            TawaziTimeoutError: if the execution or an ExecNode without fallback timed out.
+        """
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            completions.cancel()
+            raise TawaziTimeoutError(
+                f"The execution of the DAG didn't finish in time, "
+                f"{completions.running} ExecNodes were still running"
+            )
+        for index, (deadline, future) in list(self.running.items()):
+            # the finished ExecNodes are released by the scheduler
+            if now < deadline or future.done():
+                continue
+            del self.running[index]
+            future.cancel()
+            xn = self.exec_nodes[state.plan.ids[index]]
+            if xn.fallback is NoVal:
+                completions.cancel()
+                raise TawaziTimeoutError(
+                    f"ExecNode {xn.id} didn't finish within its timeout of {xn.timeout} seconds"
+                )
+            logger.debug("{} timed out, its successors are executed with its fallback", xn.id)
+            completions.abandon(index)
+            # the fallback wins over a result written in the meantime
+            self.results.force_set(xn.id, xn.fallback)
+            if tokens is not None:
+                tokens.release(index, state)
+            state.release(index)
+
+
+class Retries:
+    """ExecNodes of a single execution that failed and wait to be executed again.
+
+    A failed ExecNode is not released: it waits for its backoff delay without blocking the scheduler,
+    then it is made ready again and takes a running slot like any other ready ExecNode.
     """
-    if len(running) == 0:
-        return done, running, runnable_xns_ids
-    done_, running = await asyncio.wait(running, return_when=return_when)
-    done = done.union(done_)
 
-    # 1. among the finished futures:
-    #   1. checks for exceptions
-    #   2. and remove them from the graph
-    for done_future in done_:
-        future_id = futures.inverse[done_future]
-        _ = futures[future_id].result()  # raise exception by calling the future
-        logger.debug("Remove ExecNode {} from the graph", future_id)
-        runnable_xns_ids |= graph.remove_root_node(future_id)
+    def __init__(
+        self,
+        plan: ExecutionPlan,
+        exec_nodes: Dict[Identifier, ExecNode],
+        profiles: Dict[Identifier, Profile],
+    ) -> None:
+        """Start without any failed ExecNode.
+
+        Args:
+            plan: the executed plan
+            exec_nodes: dictionary identifying ExecNodes
+            profiles: the profiles of the execution, the profiles of the failed attempts are kept in them.
+        """
+        self.plan = plan
+        self.exec_nodes = exec_nodes
+        self.profiles = profiles
+        # number of failed attempts and profiles of the ExecNodes that were retried
+        self.attempts: Dict[int, List[Profile]] = {}
+        # heap of the ExecNodes waiting for their retry, ordered by the time they become ready
+        self.waiting: List[Tuple[float, int]] = []
+
+    def __bool__(self) -> bool:
+        """Whether some ExecNodes wait for their retry."""
+        return bool(self.waiting)
+
+    def retry(self, index: int, future: AnyFuture) -> bool:
+        """Schedule a finished ExecNode to be executed again if it failed and has retries left.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            future: the future of its execution
+
+        Returns:
+            whether the ExecNode will be executed again, it must not be released in that case.
+        """
+        if future.cancelled():
+            return False
+        error = future.exception()
+        if error is None:
+            if self.attempts and index in self.attempts:
+                self._record(index)
+            return False
+        xn = self.exec_nodes[self.plan.ids[index]]
+        failed = self.attempts.setdefault(index, [])
+        # the error of the function is wrapped when the call location of the ExecNode is known
+        if isinstance(error, TawaziError) and isinstance(error.__cause__, Exception):
+            error = error.__cause__
+        if len(failed) >= xn.retries or not isinstance(error, xn.retry_on):
+            self._record(index)
+            return False
+        # the next attempt writes its own profile
+        failed.append(self.profiles.pop(xn.id, Profile(cfg.TAWAZI_PROFILE_ALL_NODES)))
+        delay = random.uniform(0, xn.backoff * 2 ** (len(failed) - 1))  # noqa: S311
+        logger.debug("{} failed with {!r}, retry {} in {:.3f}s", xn.id, error, len(failed), delay)
+        heapq.heappush(self.waiting, (time.monotonic() + delay, index))
+        return True
+
+    def _record(self, index: int) -> None:
+        failed = self.attempts.pop(index)
+        profile = self.profiles.get(self.plan.ids[index])
+        if profile is not None:
+            profile.failed_attempts = failed
+
+    def next_timeout(self) -> Optional[float]:
+        """Number of seconds until the next retry, None if there is none."""
+        if not self.waiting:
+            return None
+        return max(self.waiting[0][0] - time.monotonic(), 0.0)
 
-    return done, running, runnable_xns_ids
+    def due(self, state: PlanState) -> None:
+        """Make the ExecNodes whose backoff delay is over ready again.
+
+        Args:
+            state: the state of the execution of the plan
+        """
+        now = time.monotonic()
+        while self.waiting and self.waiting[0][0] <= now:
+            state.push(heapq.heappop(self.waiting)[1])
+
+
+async def wait_for_finished_nodes(scheduler: "Scheduler", completions: CompletionQueue) -> None:
+    """Wait for at least one running ExecNode to finish before releasing its successors.
+
+    The event loop keeps running while waiting.
+
+    Args:
+        scheduler: the steps of the execution
+        completions: the queue to which the running ExecNodes post their futures
+    """
+    timeout = scheduler.next_timeout()
+    if completions.running == 0 and not completions.waiting:
+        if not scheduler.retries:
+            return
+        # nothing can finish before the next retry
+        await asyncio.sleep(timeout)  # type: ignore[arg-type]
+        finished = []
+    else:
+        finished = await completions.get(timeout)
+    scheduler.finish(finished)
+
+
+def wait_for_finished_nodes_sync(
+    scheduler: "Scheduler", completions: ThreadCompletionQueue
+) -> None:
+    """Block until at least one running ExecNode finishes before releasing its successors.
+
+    Args:
+        scheduler: the steps of the execution
+        completions: the queue to which the running ExecNodes post their futures
+    """
+    timeout = scheduler.next_timeout()
+    if completions.running == 0 and not completions.waiting:
+        if not scheduler.retries:
+            return
+        time.sleep(timeout)  # type: ignore[arg-type]
+        finished = []
+    else:
+        finished = completions.get(timeout)
+    scheduler.finish(finished)
 
 
 async def to_thread_in_executor(
@@ -205,31 +703,864 @@ async def to_thread_in_executor(
     return await loop.run_in_executor(executor, func_call)
 
 
+def submit_to_process(
+    xn: ExecNode,
+    process_pool: ProcessPool,
+    exec_nodes: Dict[Identifier, ExecNode],
+    results: Dict[Identifier, Any],
+    profiles: Dict[Identifier, Profile],
+    transport: Optional["SharedMemoryTransport"] = None,
+) -> "Future[Any]":
+    """Execute an ExecNode in a worker process.
+
+    The arguments are resolved and pickled in the calling thread.
+    The results of the setup ExecNodes are not pickled with them: they are sent once to the worker processes.
+
+    Args:
+        xn: the ExecNode to execute
+        process_pool: the pool of processes
+        exec_nodes: dictionary identifying ExecNodes
+        results: the results of the execution, the result of xn is written in it
+        profiles: the profiles of the execution, the profile of xn is written in it
+        transport: if provided, the large buffers of the arguments and of the result are exchanged through shared memory.
+            The results that already live in shared memory are received by the worker process as views.
+
+    Returns:
+        a future that is done once the result and the profile of xn are written
+    """
+    setup_results: Dict[Identifier, Any] = {}
+    # payloads referenced until the end of the execution of xn
+    used_payloads: List["SharedPayload"] = []
+
+    def release_payloads() -> None:
+        if transport is not None:
+            for used_payload in used_payloads:
+                transport.release(used_payload)
+
+    def get_value(uxn: UsageExecNode) -> Any:
+        if exec_nodes[uxn.id].setup:
+            setup_results[uxn.id] = results[uxn.id]
+            return SetupResult(uxn)
+        shared_payload = None if transport is None else transport.payload_of(uxn.id)
+        if shared_payload is not None:
+            transport.acquire(shared_payload)  # type: ignore[union-attr]
+            used_payloads.append(shared_payload)
+            return SharedResult(uxn, shared_payload)
+        return uxn.result(results)
+
+    try:
+        args, kwargs = xn.resolve_args(get_value)
+        target = make_target(xn.id, xn.exec_function)
+        payload = dump_payload(xn.id, target, args, kwargs, transport)
+    except BaseException:
+        release_payloads()
+        raise
+    if transport is not None:
+        used_payloads.append(payload)  # type: ignore[arg-type]
+
+    future: "Future[Any]" = Future()
+
+    def write_result(process_future: "Future[Any]") -> None:
+        if future.cancelled():
+            # xn timed out, its result is not used anymore
+            release_payloads()
+            return
+        try:
+            try:
+                result_payload, profile = process_future.result()
+                if isinstance(result_payload, bytes):
+                    result = pickle.loads(result_payload)  # noqa: S301
+                else:
+                    result = transport.load(xn.id, result_payload)  # type: ignore[union-attr]
+            except Exception as e:
+                xn.raise_execution_error(e)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        finally:
+            release_payloads()
+        profiles[xn.id] = profile
+        results[xn.id] = result
+        future.set_result(result)
+
+    min_bytes = None if transport is None else transport.min_bytes
+    process_pool.submit(payload, setup_results, min_bytes).add_done_callback(write_result)
+    logger.debug("Submitted ExecNode {} to the ProcessPool", xn.id)
+    return future
+
+
 ################
 # The scheduler!
 ################
+@contextlib.contextmanager
+def execution_pools(
+    max_concurrency: int,
+    results: StrictDict[Identifier, Any],
+    thread_pool: Optional[ThreadPoolExecutor] = None,
+    process_pool: Optional[ProcessPool] = None,
+    interpreter_pool: Optional[ProcessPool] = None,
+    timeout_pool: Optional[TimeoutPool] = None,
+) -> Iterator[
+    Tuple[
+        ThreadPoolExecutor,
+        ProcessPool,
+        ProcessPool,
+        TimeoutPool,
+        Optional["SharedMemoryTransport"],
+        SpillStore,
+    ]
+]:
+    """Provide the pools used by a single execution, creating temporary ones for those not provided.
+
+    Args:
+        max_concurrency: the maximum number of workers of the temporary pools
+        results: the results of the execution, copied out of shared memory and loaded back from the spill files
+            when the execution ends
+        thread_pool: look at `async_execute`
+        process_pool: look at `async_execute`
+        interpreter_pool: look at `async_execute`
+        timeout_pool: look at `async_execute`
+
+    Yields:
+        the pool of threads, of processes, of sub-interpreters, of threads for the ExecNodes with a timeout,
+        the shared memory transport if it is enabled and the store of the results spilled to disk
+    """
+    # a temporary pool is only created if the caller didn't provide one
+    executor = thread_pool
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    processes = process_pool
+    if processes is None:
+        # no worker process is started unless an ExecNode needs it
+        processes = ProcessPool(max_workers=max_concurrency)
+    interpreters = interpreter_pool
+    if interpreters is None:
+        interpreters = ProcessPool(max_workers=max_concurrency, sub_interpreters=True)
+    timeouts = timeout_pool
+    if timeouts is None:
+        timeouts = TimeoutPool(max_workers=max_concurrency + cfg.TAWAZI_TIMED_OUT_THREADS)
+    transport = None
+    if cfg.TAWAZI_SHARED_MEMORY:
+        from tawazi._shared_memory import SharedMemoryTransport
+
+        transport = SharedMemoryTransport(cfg.TAWAZI_SHARED_MEMORY_MIN_BYTES)
+
+    store = SpillStore()
+
+    try:
+        yield executor, processes, interpreters, timeouts, transport, store
+    finally:
+        # shut down the temporary pool even if an ExecNode raised, otherwise its threads leak
+        if thread_pool is None:
+            executor.shutdown(wait=True)
+        if process_pool is None:
+            processes.shutdown(wait=True)
+        if interpreter_pool is None:
+            interpreters.shutdown(wait=True)
+        if timeout_pool is None:
+            timeouts.shutdown()
+        # the results must not be views over shared memory segments after the execution
+        if transport is not None:
+            transport.close(results)
+        store.close(results)
+
+
+@contextlib.contextmanager
+def cancel_on_failure(
+    completions: Optional[_Completions], profiles: Dict[Identifier, Profile]
+) -> Iterator[None]:
+    """Stop the rest of an execution as soon as it fails when `TAWAZI_FAIL_FAST` is enabled.
+
+    The ExecNodes that didn't start yet are cancelled and the running ones are signaled through the token
+    returned by `tawazi.cancel_token()`: threads and processes can't be interrupted.
+    The error is raised with the profiles of the ExecNodes executed so far in its `profiles` attribute.
+
+    Args:
+        completions: the queue the running ExecNodes post to, it tracks their futures in fail-fast mode.
+            None if the ExecNodes are executed inline.
+        profiles: the profiles of the execution
+    """
+    if not cfg.TAWAZI_FAIL_FAST:
+        yield
+        return
+    token = CancelToken()
+    previous = set_token(token)
+    if completions is not None:
+        completions.futures = {}
+    try:
+        yield
+    except Exception as e:
+        token.cancel()
+        if completions is not None:
+            logger.debug("Execution failed, {} ExecNodes are cancelled", completions.cancel_all())
+        e.profiles = dict(profiles)  # type: ignore[attr-defined]
+        raise
+    finally:
+        reset_token(previous)
+
+
+@contextlib.contextmanager
+def sharing_slots(completions: _Completions, shared: Optional[SharedSlots]) -> Iterator[None]:
+    """Share the running slots of an execution with the other executions of `DAG.map`.
+
+    The slots still held when the execution ends, because it failed for example, are given back
+    and the execution doesn't wait in line for slots anymore.
+
+    Args:
+        completions: the queue the running ExecNodes post to, it holds the slots of the execution.
+        shared: the slots shared by the executions, None if the execution doesn't share its slots.
+    """
+    completions.shared = shared
+    try:
+        yield
+    finally:
+        if shared is not None:
+            shared.leave(completions.wake)
+            if completions.held:
+                shared.release(completions.held)
+                completions.held = 0
+
+
+def execute_chain(
+    chain: List[ExecNode], results: Dict[Identifier, Any], profiles: Dict[Identifier, Profile]
+) -> None:
+    """Execute fused ExecNodes back to back, each one records its own result and profile.
+
+    Args:
+        chain: the ExecNodes in execution order, each one is the only successor of the previous one.
+        results: the results of the execution
+        profiles: the profiles of the execution
+    """
+    chain[0].execute(results=results, profiles=profiles)
+    for xn in chain[1:]:
+        # the activation of a fused ExecNode can only depend on the previous ExecNodes
+        if _xn_active_in_call(xn, results):
+            xn.execute(results=results, profiles=profiles)
+        else:
+            logger.debug("Prune {} from the graph", xn.id)
+            results[xn.id] = None
+
+
+def take_batch(
+    state: PlanState,
+    head: ExecNode,
+    exec_nodes: Dict[Identifier, ExecNode],
+    results: Dict[Identifier, Any],
+    free_slots: int,
+) -> List[int]:
+    """Take the ready ExecNodes to execute in the same task as head when `TAWAZI_BATCH_SIZE` is bigger than 1.
+
+    The most prioritized ready ExecNodes are taken as long as they are active and could be fused (see `fusable`),
+    and as long as the known durations of the batch add up to less than `TAWAZI_BATCH_TARGET_MS`.
+    The batch is kept small enough for the ready ExecNodes to be spread over all the free slots.
+
+    Args:
+        state: the state of the execution of the plan, head is already popped from it
+        head: the ExecNode about to be submitted
+        exec_nodes: dictionary identifying ExecNodes
+        results: the results of the execution
+        free_slots: the number of tasks that can still be submitted, including head's
+
+    Returns:
+        the indices of the ExecNodes to execute after head, they are popped from the ready nodes.
+    """
+    if cfg.TAWAZI_BATCH_SIZE <= 1 or not fusable(head):
+        return []
+    # ceil of the number of ready ExecNodes per free slot
+    size = min(cfg.TAWAZI_BATCH_SIZE, -(-(len(state) + 1) // free_slots)) - 1
+    plan = state.plan
+    # the ExecNodes without a known duration don't count against the target
+    budget = cfg.TAWAZI_BATCH_TARGET_MS / 1000 - max(_duration(plan, plan.indices[head.id]), 0.0)
+    if budget < 0:
+        return []
+    batch: List[int] = []
+    while state and len(batch) < size:
+        index = state.peek()
+        xn = exec_nodes[plan.ids[index]]
+        # the ExecNodes that would be fused with their successor are submitted on their own
+        fused = plan.fused_next[index] if plan.fused_next else -1
+        duration = _duration(plan, index)
+        if (
+            not fusable(xn)
+            or not _xn_active_in_call(xn, results)
+            or (fused != -1 and state.counters[fused] == 1)
+            or duration > budget
+        ):
+            break
+        budget -= max(duration, 0.0)
+        batch.append(state.pop())
+    return batch
+
+
+def _duration(plan: ExecutionPlan, index: int) -> float:
+    return plan.durations[index] if plan.durations else -1.0
+
+
+def execute_batch(
+    batch: List[ExecNode],
+    futures: List["Future[Any]"],
+    results: Dict[Identifier, Any],
+    profiles: Dict[Identifier, Profile],
+) -> None:
+    """Execute independent ExecNodes one after the other, each one is published as soon as it finishes.
+
+    Args:
+        batch: the ExecNodes to execute
+        futures: the future of every ExecNode, its result is set right after the ExecNode finishes
+        results: the results of the execution
+        profiles: the profiles of the execution
+    """
+    for xn, future in zip(batch, futures):
+        # the rest of the batch is cancelled when the execution fails fast
+        if not future.set_running_or_notify_cancel():
+            continue
+        # every ExecNode gets its own outcome, a failure doesn't prevent the independent ExecNodes from running
+        try:
+            result = xn.execute(results=results, profiles=profiles)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+
+def submit_batch(
+    batch: List[int],
+    executor: ThreadPoolExecutor,
+    completions: Union[CompletionQueue, ThreadCompletionQueue],
+    plan: ExecutionPlan,
+    exec_nodes: Dict[Identifier, ExecNode],
+    results: Dict[Identifier, Any],
+    profiles: Dict[Identifier, Profile],
+) -> None:
+    """Submit several threaded ExecNodes as a single task of the ThreadPoolExecutor.
+
+    Args:
+        batch: the indices of the ExecNodes in the plan
+        executor: the pool of threads
+        completions: the queue the ExecNodes of the batch post to, the batch takes a single running slot.
+        plan: the executed plan
+        exec_nodes: dictionary identifying ExecNodes
+        results: the results of the execution
+        profiles: the profiles of the execution
+    """
+    futures: List["Future[Any]"] = [Future() for _ in batch]
+    for i, (index, future) in enumerate(zip(batch, futures)):
+        completions.add_concurrent(index, future, slot=i == len(batch) - 1)
+    xns = [exec_nodes[plan.ids[index]] for index in batch]
+    logger.debug("Submitting batch of ExecNodes {}", [xn.id for xn in xns])
+    executor.submit(bind_token(execute_batch), xns, futures, results, profiles)
+
+
+def submit_exec_node(
+    xn: ExecNode,
+    executor: ThreadPoolExecutor,
+    processes: ProcessPool,
+    interpreters: ProcessPool,
+    timeouts: TimeoutPool,
+    transport: Optional["SharedMemoryTransport"],
+    exec_nodes: Dict[Identifier, ExecNode],
+    results: Dict[Identifier, Any],
+    profiles: Dict[Identifier, Profile],
+    fused: Optional[List[ExecNode]] = None,
+) -> Optional["Future[Any]"]:
+    """Submit an ExecNode that doesn't need an event loop to its resource.
+
+    Args:
+        xn: the ExecNode to execute
+        executor: the pool of threads
+        processes: the pool of processes
+        interpreters: the pool of sub-interpreters
+        timeouts: the pool of threads of the threaded ExecNodes with a timeout
+        transport: the shared memory transport used with the pool of processes
+        exec_nodes: dictionary identifying ExecNodes
+        results: the results of the execution
+        profiles: the profiles of the execution
+        fused: the threaded ExecNodes to execute right after xn in the same thread. Defaults to None.
+
+    Returns:
+        the future of the execution, None if the ExecNode was executed in the calling thread.
+    """
+    if xn.resource == Resource.thread:
+        if xn.timeout is not None:
+            # a thread that times out can't be interrupted, it must not keep a worker of the pool busy
+            return timeouts.submit(bind_token(xn.execute), results=results, profiles=profiles)
+        if fused:
+            logger.debug("Submitting {} fused with {}", xn.id, [f.id for f in fused])
+            return executor.submit(bind_token(execute_chain), [xn, *fused], results, profiles)
+        return executor.submit(bind_token(xn.execute), results=results, profiles=profiles)
+    if xn.resource == Resource.process:
+        return submit_to_process(xn, processes, exec_nodes, results, profiles, transport)
+    if xn.resource == Resource.sub_interpreter:
+        # the buffers can't be shared with sub-interpreters through shared memory
+        pool = interpreters if SUB_INTERPRETERS_AVAILABLE else processes
+        return submit_to_process(xn, pool, exec_nodes, results, profiles)
+
+    # a single execution will be launched and will end.
+    # it doesn't count as an additional thread that is running.
+    logger.debug("Executing {} in main thread", xn.id)
+    xn.execute(results=results, profiles=profiles)
+    return None
+
+
+# returned by `Scheduler.take` when the loop must wait for a running ExecNode to finish
+WAIT = -1
+
+
+class Scheduler:
+    """Steps of a single execution shared by the scheduling loops of `sync_execute` and `async_execute`.
+
+    Both loops take the ready ExecNodes with `take`, submit them with `submit`
+    and release the successors of the finished ones with `finish`.
+    Only the way they wait for the running ExecNodes is their own.
+    """
+
+    def __init__(
+        self,
+        exec_nodes: StrictDict[Identifier, ExecNode],
+        results: StrictDict[Identifier, Any],
+        profiles: StrictDict[Identifier, Profile],
+        state: PlanState,
+        completions: Union[CompletionQueue, ThreadCompletionQueue],
+        max_concurrency: int,
+        pools: Optional[Dict[str, int]],
+        timeout: Optional[float],
+    ) -> None:
+        """Start the clock of the execution, the pools of workers are provided by `start`.
+
+        Args:
+            exec_nodes: dictionary identifying ExecNodes
+            results: the results of the execution
+            profiles: the profiles of the execution
+            state: the state of the execution of the plan
+            completions: the queue to which the running ExecNodes post their futures
+            max_concurrency: the maximum number of running tasks
+            pools: look at `async_execute`
+            timeout: look at `async_execute`
+        """
+        self.exec_nodes = exec_nodes
+        self.results = results
+        self.profiles = profiles
+        self.state = state
+        self.plan = state.plan
+        self.completions = completions
+        self.max_concurrency = max_concurrency
+        # the ExecNodes with a pool take tokens from it while they run
+        self.tokens = PoolTokens(pools or {})
+        # the ExecNodes with a timeout and the whole execution are stopped once their deadline is over
+        self.deadlines = Deadlines(timeout, exec_nodes, results)
+        self.retries = Retries(self.plan, exec_nodes, profiles) if self.plan.has_retries else None
+
+    def start(
+        self,
+        workers: Tuple[
+            ThreadPoolExecutor,
+            ProcessPool,
+            ProcessPool,
+            TimeoutPool,
+            Optional["SharedMemoryTransport"],
+            SpillStore,
+        ],
+        saved: Optional[ResultsCheckpoint],
+        memory_budget: Optional[int],
+    ) -> None:
+        """Provide the pools of the execution and set up the release of the results.
+
+        Args:
+            workers: the pools provided by `execution_pools`
+            saved: the checkpoint the results are saved to as soon as they are computed, None if there is none.
+            memory_budget: look at `async_execute`
+        """
+        (
+            self.executor,
+            self.processes,
+            self.interpreters,
+            self.timeouts,
+            self.transport,
+            store,
+        ) = workers
+        self.state.checkpoint = saved
+        # the results that are not used anymore are dropped as soon as possible
+        if self.plan.consumers:
+            self.state.results_release = ResultsRelease(self.plan, self.results, self.transport)
+        # the oldest results are spilled to disk when they exceed the memory budget of the execution
+        if memory_budget is not None:
+            self.state.memory = MemoryBudget(
+                memory_budget, self.plan, self.exec_nodes, self.results, store, self.transport
+            )
+
+    def must_wait(self) -> bool:
+        """Make the failed ExecNodes whose backoff delay is over ready again and check if the loop must wait.
+
+        The loop must not submit any task before a running one ends (that might make a more prioritized
+        ExecNode ready) if the maximum concurrency is reached or if no ExecNode is ready.
+
+        Returns:
+            whether the loop must wait for a running ExecNode to finish
+        """
+        if self.retries:
+            self.retries.due(self.state)
+        if self.completions.running == self.max_concurrency or not self.state:
+            logger.debug("Waiting for one of {} ExecNodes to finish", self.completions.running)
+            return True
+        return False
+
+    def take(self) -> Optional[int]:
+        """Take the most prioritized ready ExecNode if it can run now.
+
+        It is pruned if it is not active, parked if its pool is full or if it doesn't fit in the memory budget.
+
+        Returns:
+            its index in the plan if it must be submitted. None if the loop must go on without submitting it,
+                WAIT if the loop must wait for a running ExecNode to finish first.
+        """
+        state = self.state
+        completions = self.completions
+        if not state:
+            logger.debug("No runnable Nodes available")
+            return None
+
+        # the ExecNode stays in the ready heap until it is sure to be executed
+        index = state.peek()
+        xn = self.exec_nodes[self.plan.ids[index]]
+        logger.info("{} will run!", xn.id)
+
+        # a more prioritized ExecNode might be ready once the running ExecNode finishes
+        if xn.is_sequential and completions.running != 0:
+            logger.debug(
+                "{} must not run in parallel. Wait for the end of one of {} running ExecNodes",
+                xn.id,
+                completions.running,
+            )
+            return WAIT
+
+        # the executions of `DAG.map` share their running slots
+        if not completions.reserve(xn):
+            logger.debug("The other executions of the DAG take all the slots, {} waits", xn.id)
+            return WAIT
+
+        state.pop()
+
+        # if the ExecNode is the starting point of a subgraph, the whole subgraph is skipped
+        if not _xn_active_in_call(xn, self.results):
+            logger.debug("Prune {} from the graph", xn.id)
+            self.results[xn.id] = None
+            state.release(index)
+            completions.give_back()
+            return None
+
+        # wait for the running ExecNodes to give their memory back if it can't fit in the budget
+        if state.memory is not None and not state.memory.admit(index, xn):
+            state.memory.park(index, xn)
+            completions.give_back()
+            return None
+
+        # wait for an ExecNode of its pool to finish if the pool is full
+        if not self.tokens.acquire(index, xn):
+            if state.memory is not None:
+                state.memory.cancel(index, state)
+            self.tokens.park(index, xn)
+            completions.give_back()
+            return None
+        return index
+
+    def submit(self, index: int, xn: ExecNode) -> None:
+        """Submit an ExecNode that doesn't need an event loop, possibly fused or batched with other ExecNodes.
+
+        Args:
+            index: the index of the ExecNode in the plan
+            xn: the ExecNode
+        """
+        state = self.state
+        completions = self.completions
+        fused = state.take_chain(index)
+        batch = (
+            []
+            if fused
+            else take_batch(
+                state, xn, self.exec_nodes, self.results, self.max_concurrency - completions.running
+            )
+        )
+        if batch:
+            submit_batch(
+                [index, *batch],
+                self.executor,
+                completions,
+                self.plan,
+                self.exec_nodes,
+                self.results,
+                self.profiles,
+            )
+            return
+
+        future = submit_exec_node(
+            xn,
+            self.executor,
+            self.processes,
+            self.interpreters,
+            self.timeouts,
+            self.transport,
+            self.exec_nodes,
+            self.results,
+            self.profiles,
+            [self.exec_nodes[self.plan.ids[i]] for i in fused],
+        )
+        if future is None:
+            logger.debug("Release successors of ExecNode {}", xn.id)
+            self.tokens.release(index, state)
+            state.release(index)
+            completions.give_back()
+        else:
+            completions.add_concurrent(index, future)
+            self.deadlines.start(index, xn, future)
+
+    def next_timeout(self) -> Optional[float]:
+        """Number of seconds until the next deadline or retry, None if there is none."""
+        timeouts = [
+            timeout
+            for timeout in (
+                self.deadlines.next_timeout() if self.deadlines else None,
+                self.retries.next_timeout() if self.retries else None,
+            )
+            if timeout is not None
+        ]
+        return min(timeouts) if timeouts else None
+
+    def finish(self, finished: Sequence[Tuple[int, AnyFuture]]) -> None:
+        """Release the successors of the finished ExecNodes and handle the retries and the deadlines.
+
+        Args:
+            finished: the indices and the futures of the ExecNodes that finished
+
+        Raises:
+            TawaziTimeoutError: look at `Deadlines.expire`
+        """
+        state = self.state
+        # among the finished futures:
+        #   1. check for exceptions, the failed ExecNodes with retries left are executed again later
+        #   2. and release their successors
+        for index, future in finished:
+            if self.deadlines:
+                self.deadlines.running.pop(index, None)
+            self.tokens.release(index, state)
+            if self.retries is not None and self.retries.retry(index, future):
+                continue
+            _ = future.result()  # raise exception by calling the future
+            logger.debug("Release successors of ExecNode {}", state.plan.ids[index])
+            state.release(index)
+
+        if self.retries:
+            self.retries.due(state)
+        if self.deadlines:
+            self.deadlines.expire(state, self.completions, self.tokens)
+
+
+def inline_execute(
+    exec_nodes: StrictDict[Identifier, ExecNode],
+    results: StrictDict[Identifier, Any],
+    plan: ExecutionPlan,
+    thread_pool: Optional[ThreadPoolExecutor] = None,
+    process_pool: Optional[ProcessPool] = None,
+    interpreter_pool: Optional[ProcessPool] = None,
+    timeout_pool: Optional[TimeoutPool] = None,
+    memory_budget: Optional[int] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Tuple[
+    StrictDict[Identifier, ExecNode], StrictDict[Identifier, Any], StrictDict[Identifier, Profile]
+]:
+    """Execute the ExecNodes one after the other in the calling thread.
+
+    Used when `max_concurrency` is 1: no thread pool, future or queue is involved,
+    except for the ExecNodes that must run in a process or a sub-interpreter.
+    The ExecNodes run in the same order as with the concurrent schedulers.
+
+    Args:
+        exec_nodes: dictionary identifying ExecNodes.
+        results: dictionary containing results of setup and constants
+        plan: the compiled plan of the graph to be executed
+        thread_pool: look at `async_execute`, it is not used to run the ExecNodes.
+        process_pool: look at `async_execute`
+        interpreter_pool: look at `async_execute`
+        timeout_pool: look at `async_execute`
+        memory_budget: look at `async_execute`
+        checkpoint: look at `async_execute`
+
+    Returns:
+        exec_nodes: dictionary with keys the name of the function and value the result after the execution
+    """
+    results = StrictDict(results)
+    profiles: StrictDict[Identifier, Profile] = StrictDict()
+    exec_nodes = StrictDict(exec_nodes)
+    order = plan.sequential_order(results)
+
+    with execution_pools(1, results, thread_pool, process_pool, interpreter_pool, timeout_pool) as (
+        executor,
+        processes,
+        interpreters,
+        timeouts,
+        transport,
+        store,
+    ), cancel_on_failure(None, profiles), checkpointing(checkpoint, plan, results) as saved:
+        results_release = ResultsRelease(plan, results, transport) if plan.consumers else None
+        memory = (
+            None
+            if memory_budget is None
+            else MemoryBudget(memory_budget, plan, exec_nodes, results, store, transport)
+        )
+        for index in order:
+            xn = exec_nodes[plan.ids[index]]
+            if not _xn_active_in_call(xn, results):
+                logger.debug("Prune {} from the graph", xn.id)
+                results[xn.id] = None
+            elif xn.resource in (Resource.process, Resource.sub_interpreter):
+                future = submit_exec_node(
+                    xn,
+                    executor,
+                    processes,
+                    interpreters,
+                    timeouts,
+                    transport,
+                    exec_nodes,
+                    results,
+                    profiles,
+                )
+                future.result()  # type: ignore[union-attr]
+            else:
+                logger.debug("Executing {} inline", xn.id)
+                xn.execute(results=results, profiles=profiles)
+            if saved is not None:
+                saved.release(index)
+            if results_release is not None:
+                results_release.release(index)
+            if memory is not None:
+                memory.release(index)
+
+    return exec_nodes, results, profiles
+
+
 def sync_execute(
     exec_nodes: StrictDict[Identifier, ExecNode],
     results: StrictDict[Identifier, Any],
     max_concurrency: int,
-    graph: DiGraphEx,
+    plan: ExecutionPlan,
+    thread_pool: Optional[ThreadPoolExecutor] = None,
+    process_pool: Optional[ProcessPool] = None,
+    interpreter_pool: Optional[ProcessPool] = None,
+    timeout_pool: Optional[TimeoutPool] = None,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    shared_slots: Optional[SharedSlots] = None,
 ) -> Tuple[
     StrictDict[Identifier, ExecNode], StrictDict[Identifier, Any], StrictDict[Identifier, Profile]
 ]:
-    """Look at the execute function for more information."""
-    return asyncio.run(
-        async_execute(
-            exec_nodes=exec_nodes, results=results, max_concurrency=max_concurrency, graph=graph
+    """Execute the DAG without an event loop unless one of its ExecNodes needs it.
+
+    Look at the async_execute function for more information.
+    The ExecNodes are only waited for by the calling thread, which makes this scheduler cheaper per call
+    and usable from code that already runs an event loop.
+    With a `max_concurrency` of 1, the ExecNodes are executed inline by `inline_execute`:
+    the capacity of the pools is then never exceeded. Unless there are timeouts to watch, ExecNodes to retry
+    or slots shared with other executions.
+    """
+    if plan.needs_event_loop:
+        return asyncio.run(
+            async_execute(
+                exec_nodes=exec_nodes,
+                results=results,
+                max_concurrency=max_concurrency,
+                plan=plan,
+                thread_pool=thread_pool,
+                process_pool=process_pool,
+                interpreter_pool=interpreter_pool,
+                timeout_pool=timeout_pool,
+                pools=pools,
+                timeout=timeout,
+                memory_budget=memory_budget,
+                checkpoint=checkpoint,
+                shared_slots=shared_slots,
+            )
+        )
+
+    if (
+        max_concurrency == 1
+        and timeout is None
+        and not plan.has_timeouts
+        and not plan.has_retries
+        and shared_slots is None
+    ):
+        return inline_execute(
+            exec_nodes,
+            results,
+            plan,
+            thread_pool,
+            process_pool,
+            interpreter_pool,
+            timeout_pool,
+            memory_budget,
+            checkpoint,
         )
+
+    results = StrictDict(results)
+    profiles: StrictDict[Identifier, Profile] = StrictDict()
+    exec_nodes = StrictDict(exec_nodes)
+    completions = ThreadCompletionQueue()
+    scheduler = Scheduler(
+        exec_nodes,
+        results,
+        profiles,
+        plan.start(results),
+        completions,
+        max_concurrency,
+        pools,
+        timeout,
     )
 
+    with execution_pools(
+        max_concurrency, results, thread_pool, process_pool, interpreter_pool, timeout_pool
+    ) as workers, cancel_on_failure(completions, profiles), sharing_slots(
+        completions, shared_slots
+    ), checkpointing(
+        checkpoint, plan, results
+    ) as saved:
+        scheduler.start(workers, saved, memory_budget)
+        # the steps are the same as in async_execute
+        while scheduler.state.remaining:
+            if scheduler.must_wait():
+                wait_for_finished_nodes_sync(scheduler, completions)
+
+            index = scheduler.take()
+            if index == WAIT:
+                wait_for_finished_nodes_sync(scheduler, completions)
+                continue
+            if index is None:
+                continue
+
+            xn = exec_nodes[plan.ids[index]]
+            scheduler.submit(index, xn)
+
+            if xn.is_sequential:
+                logger.debug("Wait for all Futures to finish because {} is sequential.", xn.id)
+                wait_for_finished_nodes_sync(scheduler, completions)
+
+    return exec_nodes, results, profiles
+
 
 async def async_execute(
     *,
     exec_nodes: StrictDict[Identifier, ExecNode],
     results: StrictDict[Identifier, Any],
     max_concurrency: int,
-    graph: DiGraphEx,
+    plan: ExecutionPlan,
+    thread_pool: Optional[ThreadPoolExecutor] = None,
+    process_pool: Optional[ProcessPool] = None,
+    interpreter_pool: Optional[ProcessPool] = None,
+    timeout_pool: Optional[TimeoutPool] = None,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    shared_slots: Optional[SharedSlots] = None,
 ) -> Tuple[
     StrictDict[Identifier, ExecNode], StrictDict[Identifier, Any], StrictDict[Identifier, Profile]
 ]:
@@ -241,148 +1572,128 @@ async def async_execute(
         exec_nodes: dictionary identifying ExecNodes.
         results: dictionary containing results of setup and constants
         max_concurrency: maximum number of threads to be used for the execution.
-        graph: the graph ids to be executed
+        plan: the compiled plan of the graph to be executed
+        thread_pool: the pool in which the threaded ExecNodes are run.
+            It is left running after the execution so that it can be reused by the next one.
+            If None is provided, a pool is created for this execution only and shut down afterward.
+        process_pool: the pool in which the ExecNodes with `Resource.process` are run.
+            Similarly to thread_pool, a temporary pool is used if None is provided.
+        interpreter_pool: the pool in which the ExecNodes with `Resource.sub_interpreter` are run.
+            Similarly to thread_pool, a temporary pool is used if None is provided.
+            Before python 3.14, these ExecNodes are run in the process_pool instead.
+        timeout_pool: the pool in which the threaded ExecNodes with a timeout are run,
+            an ExecNode that timed out keeps its thread of this pool until it returns.
+            Similarly to thread_pool, a temporary pool is used if None is provided.
+        pools: the capacity of the named pools, an ExecNode with a pool only runs
+            if the ExecNodes of its pool that are running leave enough capacity for its cost. Defaults to None.
+        timeout: the maximum number of seconds of the execution. Defaults to None.
+        memory_budget: the number of bytes the results of the execution can take in memory.
+            Beyond it, the oldest results are spilled to disk and loaded back when they are used.
+            Defaults to None (no budget).
+        checkpoint: the checkpoint the result of every ExecNode is saved to as soon as it is done.
+            Defaults to None.
+        shared_slots: the running slots shared with the other executions of `DAG.map`. Defaults to None.
 
     Returns:
         exec_nodes: dictionary with keys the name of the function and value the result after the execution
     """
     # 0.1 copy results because it will be modified here
-    results = copy(results)
+    results = StrictDict(results)
     profiles: StrictDict[Identifier, Profile] = StrictDict()
 
-    # TODO: remove copy of ExecNodes when profiling and is_active are stored outside of ExecNode
-    exec_nodes = copy_non_setup_xns(exec_nodes)
+    # ExecNodes are immutable, only the mapping is copied for the caller
+    exec_nodes = StrictDict(exec_nodes)
 
-    # 0.2 prune the graph from the ArgExecNodes and setup ExecNodes that are already executed
-    # so that they don't get executed in the ThreadPool
-    graph.remove_nodes_from([id_ for id_ in graph if id_ in results])
-
-    # 0.3 create variables related to futures
-    conc_futures: BiDict[Identifier, "Future[Any]"] = BiDict()
-    conc_done: Set["Future[Any]"] = set()
-    conc_running: Set["Future[Any]"] = set()
-
-    async_futures: BiDict[Identifier, "asyncio.Future[Any]"] = BiDict()
-    async_done: Set["asyncio.Future[Any]"] = set()
-    async_running: Set["asyncio.Future[Any]"] = set()
-
-    def running_threads() -> int:
-        return len(conc_running) + len(async_running)
-
-    # 0.4 get the candidates root nodes that can be executed
-    # runnable_nodes_ids will be empty if all root nodes are running
-    runnable_xns_ids = graph.root_nodes
-
-    # avoid having a lot of indentations
-    executor = ThreadPoolExecutor(max_workers=max_concurrency)
-    executor.__enter__()
-
-    while len(graph):
-        # Attempt to run **A SINGLE** root node.
-
-        # 6. block scheduler execution if no root node can be executed.
-        #    this can occur in two cases:
-        #       1. if maximum thread pool concurrency is reached
-        #       2. if no runnable node exists (i.e. all root nodes are being executed)
-        #    in both cases: block until a node finishes
-        #       => a new root node will be available
-        # must wait and not submit any workers before a worker ends
-        # (that might create a new more prioritized node) to be executed
-        if running_threads() == max_concurrency or len(runnable_xns_ids) == 0:
-            # 1st block and wait for async threads to finish.
-            #  prefer giving the hand to the event loop
-            logger.debug(
-                "Waiting for ExecNodes threaded async {} to finish. Finished running {}",
-                async_running,
-                async_done,
-            )
-            async_done, async_running, runnable_xns_ids = await wait_for_finished_nodes_async(
-                FIRST_COMPLETED, graph, async_futures, async_done, async_running, runnable_xns_ids
-            )
-            logger.debug(
-                "Waiting for ExecNodes threaded {} to finish. Finished running {}",
-                conc_running,
-                conc_done,
-            )
-            conc_done, conc_running, runnable_xns_ids = wait_for_finished_nodes(
-                FIRST_COMPLETED, graph, conc_futures, conc_done, conc_running, runnable_xns_ids
-            )
-
-        # 3. if no runnable node exist, go to step 6 (wait for a node to finish)
-        #   (This **might** create a new root node)
-        if len(runnable_xns_ids) == 0:
-            logger.debug("No runnable Nodes available")
-            continue
-
-        # 4.1 choose the most prioritized node to run
-        highest_priority_id = max(runnable_xns_ids, key=lambda id_: graph.compound_priority[id_])
-        xn = exec_nodes[highest_priority_id]
-
-        logger.info("{} will run!", xn.id)
+    # 0.2 every running ExecNode posts its future to this queue when it finishes, whatever its resource
+    completions = CompletionQueue()
 
-        # 4.2 if the current node must be run sequentially, wait for a running node to finish.
-        # in that case we must prune the graph to re-check whether a new root node
-        # (maybe with a higher priority) has been created => continue the loop
-        # Note: This step might run a number of times in the while loop
-        #       before the exec_node gets submitted
-        if xn.is_sequential and running_threads() != 0:
-            logger.debug(
-                "{} must not run in parallel. Wait for the end of a node in {}", xn.id, conc_running
-            )
-            async_done, async_running, runnable_xns_ids = await wait_for_finished_nodes_async(
-                FIRST_COMPLETED, graph, async_futures, async_done, async_running, runnable_xns_ids
-            )
-            conc_done, conc_running, runnable_xns_ids = wait_for_finished_nodes(
-                FIRST_COMPLETED, graph, conc_futures, conc_done, conc_running, runnable_xns_ids
-            )
-            continue
-
-        # xn will definitely be executed
-        runnable_xns_ids.remove(xn.id)
-
-        # 5.1 dynamic execution of a node
-        if not _xn_active_in_call(xn, results):
-            logger.debug("Prune {} from the graph", xn.id)
-            results[xn.id] = None
-            runnable_xns_ids |= graph.remove_root_node(xn.id)
-            # if node is starting point of a subgraph, the whole subgraph should be skipped
-            # by assigning None to all nodes in the subgraph
-            continue
-
-        # 5.2 submit the exec node to the executor
-        if xn.resource == Resource.thread:
-            exec_future_sync = executor.submit(xn.execute, results=results, profiles=profiles)
-            conc_running.add(exec_future_sync)
-            conc_futures[xn.id] = exec_future_sync
-        elif xn.resource == Resource.async_thread:
-            exec_future_async = asyncio.ensure_future(
-                to_thread_in_executor(xn.execute, executor, results=results, profiles=profiles)
-            )
-            logger.debug("Submitted ExecNode {} to the ThreadPool in async mode", xn.id)
-            async_running.add(exec_future_async)
-            async_futures[xn.id] = exec_future_async
-        else:
-            # a single execution will be launched and will end.
-            # it doesn't count as an additional thread that is running.
-            logger.debug("Executing {} in main thread", xn.id)
-            xn.execute(results=results, profiles=profiles)
-
-            logger.debug("Remove ExecNode {} from the graph", xn.id)
-            runnable_xns_ids |= graph.remove_root_node(xn.id)
-
-        # 5.3 wait for the sequential node to finish
-        # This code is executed only if this node is being executed purely by itself
-        if xn.is_sequential:
-            logger.debug("Wait for all Futures to finish because {} is sequential.", xn.id)
-            # ALL_COMPLETED is equivalent to FIRST_COMPLETED because there is only a single future running!
-            async_done, async_running, runnable_xns_ids = await wait_for_finished_nodes_async(
-                ALL_COMPLETED, graph, async_futures, async_done, async_running, runnable_xns_ids
-            )
-            conc_done, conc_running, runnable_xns_ids = wait_for_finished_nodes(
-                ALL_COMPLETED, graph, conc_futures, conc_done, conc_running, runnable_xns_ids
-            )
+    # 0.3 the ArgExecNodes and setup ExecNodes that are already executed are considered done
+    # so that they don't get executed in the ThreadPool
+    scheduler = Scheduler(
+        exec_nodes,
+        results,
+        profiles,
+        plan.start(results),
+        completions,
+        max_concurrency,
+        pools,
+        timeout,
+    )
 
-    executor.__exit__(None, None, None)
+    with execution_pools(
+        max_concurrency, results, thread_pool, process_pool, interpreter_pool, timeout_pool
+    ) as workers, cancel_on_failure(completions, profiles), sharing_slots(
+        completions, shared_slots
+    ), checkpointing(
+        checkpoint, plan, results
+    ) as saved:
+        # 0.4 the results are saved as soon as they are computed to resume the execution if it fails,
+        # released once they aren't used anymore and spilled to disk beyond the memory budget
+        scheduler.start(workers, saved, memory_budget)
+
+        while scheduler.state.remaining:
+            # Attempt to run **A SINGLE** root node.
+
+            # 1. block scheduler execution if no root node can be executed.
+            #    this can occur in two cases:
+            #       1. if maximum thread pool concurrency is reached
+            #       2. if no runnable node exists (i.e. all root nodes are being executed)
+            #    in both cases: block until a node finishes
+            #       => a new root node will be available
+            if scheduler.must_wait():
+                await wait_for_finished_nodes(scheduler, completions)
+
+            # 2. choose the most prioritized node to run.
+            #    if it must run sequentially or if the other executions of `AsyncDAG.map` take all the slots,
+            #    wait for a running node to finish and re-check whether a new root node
+            #    (maybe with a higher priority) has been created => continue the loop
+            #    Note: This step might run a number of times in the while loop
+            #          before the exec_node gets submitted
+            index = scheduler.take()
+            if index == WAIT:
+                await wait_for_finished_nodes(scheduler, completions)
+                continue
+            # no runnable node, or it was pruned or parked
+            if index is None:
+                continue
+
+            # 3. submit the exec node
+            xn = exec_nodes[plan.ids[index]]
+            if xn.is_coroutine:
+                # coroutines are awaited on the event loop: they don't take a thread
+                # but they still count in max_concurrency
+                exec_future_coroutine = asyncio.ensure_future(
+                    xn.aexecute(results=results, profiles=profiles)
+                )
+                logger.debug("Scheduled coroutine ExecNode {} on the event loop", xn.id)
+                completions.add_async(index, exec_future_coroutine)
+                scheduler.deadlines.start(index, xn, exec_future_coroutine)
+            elif xn.resource == Resource.async_thread:
+                exec_future_async = (
+                    asyncio.ensure_future(
+                        to_thread_in_executor(
+                            xn.execute, scheduler.executor, results=results, profiles=profiles
+                        )
+                    )
+                    if xn.timeout is None
+                    else asyncio.wrap_future(
+                        scheduler.timeouts.submit(
+                            bind_token(xn.execute), results=results, profiles=profiles
+                        )
+                    )
+                )
+                logger.debug("Submitted ExecNode {} to the ThreadPool in async mode", xn.id)
+                completions.add_async(index, exec_future_async)
+                scheduler.deadlines.start(index, xn, exec_future_async)
+            else:
+                scheduler.submit(index, xn)
+
+            # 4. wait for the sequential node to finish
+            # This code is executed only if this node is being executed purely by itself
+            if xn.is_sequential:
+                logger.debug("Wait for all Futures to finish because {} is sequential.", xn.id)
+                # there is at most a single future running!
+                await wait_for_finished_nodes(scheduler, completions)
 
     return exec_nodes, results, profiles
 
@@ -433,7 +1744,7 @@ def extend_results_with_args(
         TypeError: If called with an invalid number of arguments
     """
     # copy results in order to avoid modifying the original dict
-    results = copy(results)
+    results = StrictDict(results)
     # 2. parse the input arguments of the pipeline
     # 2.1 default valued arguments can be skipped and not provided!
     # note: if not enough arguments are provided then the code will fail
@@ -0,0 +1,450 @@
+"""Module containing the compiled execution plan used by the scheduler."""
+import heapq
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AbstractSet, Any, Dict, List, Mapping, Optional, Tuple
+
+from tawazi.consts import Identifier, Resource
+
+from .digraph import DiGraphEx
+
+if TYPE_CHECKING:
+    from tawazi._checkpoint import ResultsCheckpoint
+    from tawazi._shared_memory import SharedMemoryTransport
+    from tawazi._spill import MemoryBudget
+    from tawazi.node import ExecNode
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """Compact, integer-indexed representation of the graph that the scheduler runs.
+
+    The plan is compiled once per subgraph and shared by all the executions of this subgraph.
+    Nodes are indexed in topological order and their successors are stored in CSR format:
+    the successors of the node `i` are `successors[successors_ptr[i]:successors_ptr[i + 1]]`.
+    An execution only copies `in_degrees` and decrements the copy instead of mutating a graph.
+
+    Args:
+        ids (List[Identifier]): the ids of the ExecNodes, the index in this list is the node's index.
+        indices (Dict[Identifier, int]): the index of every ExecNode id.
+        successors_ptr (List[int]): offsets of the successors of every node in `successors`.
+        successors (List[int]): the concatenated successors of all the nodes.
+        in_degrees (List[int]): the number of predecessors of every node.
+        priorities (List[float]): the priority of every node: its compound priority
+            or its upward rank when the plan is compiled with durations.
+        needs_event_loop (bool): whether some ExecNodes must run in an event loop
+            (coroutine functions or `Resource.async_thread`).
+        fused_next (List[int]): for every node, its single successor that can run right after it
+            in the same thread (see `PlanState.take_chain`), -1 if there is none.
+        has_timeouts (bool): whether some ExecNodes have a timeout.
+        has_retries (bool): whether some ExecNodes are executed again when they fail.
+        consumers (List[int]): for every node, the number of successors that use its result,
+            negative if its result is kept until the end of the execution.
+            Empty if the results are not released during the execution (see `ResultsRelease`).
+        predecessors_ptr (List[int]): offsets of the predecessors of every node in `predecessors`,
+            only compiled with `consumers`.
+        predecessors (List[int]): the concatenated predecessors of all the nodes.
+        durations (List[float]): the duration in seconds of every node, negative if it is unknown.
+            Empty if the plan is compiled without durations, used to size the batches (see `take_batch`).
+    """
+
+    ids: List[Identifier]
+    indices: Dict[Identifier, int]
+    successors_ptr: List[int]
+    successors: List[int]
+    in_degrees: List[int]
+    priorities: List[float]
+    needs_event_loop: bool = False
+    fused_next: List[int] = field(default_factory=list)
+    has_timeouts: bool = False
+    has_retries: bool = False
+    consumers: List[int] = field(default_factory=list)
+    predecessors_ptr: List[int] = field(default_factory=list)
+    predecessors: List[int] = field(default_factory=list)
+    durations: List[float] = field(default_factory=list)
+    # orders of sequential executions, by the indices of the nodes done before the execution starts
+    _sequential_orders: Dict[Tuple[int, ...], List[int]] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: DiGraphEx,
+        exec_nodes: Optional[Mapping[Identifier, "ExecNode"]] = None,
+        durations: Optional[Mapping[Identifier, float]] = None,
+        retained: Optional[AbstractSet[Identifier]] = None,
+        rank: bool = True,
+    ) -> "ExecutionPlan":
+        """Compile a graph into an ExecutionPlan.
+
+        Args:
+            graph (DiGraphEx): the graph to compile
+            exec_nodes (Optional[Mapping[Identifier, ExecNode]]): the ExecNodes of the graph,
+                used to know whether the plan needs an event loop and which nodes can be fused.
+                Defaults to None.
+            durations (Optional[Mapping[Identifier, float]]): the durations of the ExecNodes in seconds.
+                If some are provided, the nodes are prioritized by their upward rank (see `upward_ranks`)
+                instead of their compound priority, unless rank is False. Defaults to None.
+            retained (Optional[AbstractSet[Identifier]]): the ExecNodes whose results are used after the execution.
+                If provided, the results of the other ExecNodes are released as soon as their successors are done,
+                except the ones of setup ExecNodes and of ExecNodes with `retain=True`. Defaults to None.
+            rank (bool): whether to prioritize the nodes by their upward rank when durations are provided.
+                Defaults to True.
+
+        Returns:
+            ExecutionPlan: the compiled plan
+        """
+        ids: List[Identifier] = graph.topologically_sorted
+        indices = {id_: i for i, id_ in enumerate(ids)}
+
+        successors_ptr = [0]
+        successors: List[int] = []
+        for id_ in ids:
+            successors.extend(indices[succ_id] for succ_id in graph.successors(id_))
+            successors_ptr.append(len(successors))
+
+        consumers: List[int] = []
+        predecessors_ptr = []
+        predecessors: List[int] = []
+        if retained is not None:
+            predecessors_ptr.append(0)
+            for i, id_ in enumerate(ids):
+                predecessors.extend(indices[pred_id] for pred_id in graph.predecessors(id_))
+                predecessors_ptr.append(len(predecessors))
+                xn = None if exec_nodes is None else exec_nodes[id_]
+                if id_ in retained or (xn is not None and (xn.setup or xn.retain)):
+                    consumers.append(-len(ids) - 1)
+                else:
+                    consumers.append(successors_ptr[i + 1] - successors_ptr[i])
+
+        # a threaded node whose only successor is also threaded can run it right after itself
+        fused_next = [-1] * len(ids)
+        if exec_nodes is not None:
+            for i, id_ in enumerate(ids):
+                if successors_ptr[i + 1] - successors_ptr[i] != 1:
+                    continue
+                # a released result would be kept until the end of the whole chain
+                if consumers and consumers[i] >= 0:
+                    continue
+                succ = successors[successors_ptr[i]]
+                if fusable(exec_nodes[id_]) and fusable(exec_nodes[ids[succ]]):
+                    fused_next[i] = succ
+
+        priorities: List[float] = [graph.compound_priority[id_] for id_ in ids]
+        if durations and rank:
+            priorities = upward_ranks(ids, successors_ptr, successors, durations)
+
+        return cls(
+            ids=ids,
+            indices=indices,
+            successors_ptr=successors_ptr,
+            successors=successors,
+            in_degrees=[graph.in_degree(id_) for id_ in ids],
+            priorities=priorities,
+            needs_event_loop=exec_nodes is not None
+            and any(
+                exec_nodes[id_].is_coroutine or exec_nodes[id_].resource == Resource.async_thread
+                for id_ in ids
+            ),
+            fused_next=fused_next,
+            has_timeouts=exec_nodes is not None
+            and any(exec_nodes[id_].timeout is not None for id_ in ids),
+            has_retries=exec_nodes is not None and any(exec_nodes[id_].retries for id_ in ids),
+            consumers=consumers,
+            predecessors_ptr=predecessors_ptr,
+            predecessors=predecessors,
+            durations=[durations.get(id_, -1.0) for id_ in ids] if durations else [],
+        )
+
+    def __len__(self) -> int:
+        """Number of ExecNodes in the plan."""
+        return len(self.ids)
+
+    def start(self, results: Dict[Identifier, Any]) -> "PlanState":
+        """Make the state of a new execution of this plan.
+
+        Args:
+            results (Dict[Identifier, Any]): results available before the execution starts.
+                The corresponding ExecNodes (ArgExecNodes, constants, executed setup ExecNodes, etc.)
+                are considered done and won't be scheduled.
+
+        Returns:
+            PlanState: the state of the new execution.
+        """
+        return PlanState(self, results)
+
+    def sequential_order(self, results: Dict[Identifier, Any]) -> List[int]:
+        """Order in which the nodes are executed when they are executed one at a time.
+
+        It is the order in which the scheduler picks them with a `max_concurrency` of 1:
+        the most prioritized ready node first. It is computed once for every set of available results.
+
+        >>> graph = DiGraphEx()
+        >>> graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+        >>> plan = ExecutionPlan.from_graph(graph)
+        >>> [plan.ids[i] for i in plan.sequential_order({"a": 1})]
+        ['b', 'c', 'd']
+
+        Args:
+            results (Dict[Identifier, Any]): results available before the execution starts.
+
+        Returns:
+            List[int]: the indices of the nodes to execute in order.
+        """
+        done = tuple(i for i, id_ in enumerate(self.ids) if id_ in results)
+        order = self._sequential_orders.get(done)
+        if order is None:
+            state = self.start(results)
+            order = []
+            while state:
+                index = state.pop()
+                order.append(index)
+                state.release(index)
+            self._sequential_orders[done] = order
+        return order
+
+
+def upward_ranks(
+    ids: List[Identifier],
+    successors_ptr: List[int],
+    successors: List[int],
+    durations: Mapping[Identifier, float],
+) -> List[float]:
+    """Compute the upward rank of every node: the duration of the longest path from the node to a sink.
+
+    Starting the node with the highest upward rank first starts the critical path first (HEFT).
+    The nodes without a duration are assumed to take no time.
+
+    >>> ranks = upward_ranks(["a", "b", "c"], [0, 2, 2, 2], [1, 2], {"a": 1.0, "b": 3.0, "c": 0.5})
+    >>> ranks
+    [4.0, 3.0, 0.5]
+
+    Args:
+        ids (List[Identifier]): the ids of the nodes in topological order
+        successors_ptr (List[int]): look at `ExecutionPlan`
+        successors (List[int]): look at `ExecutionPlan`
+        durations (Mapping[Identifier, float]): the durations of the nodes in seconds
+
+    Returns:
+        List[float]: the upward rank of every node
+    """
+    ranks = [0.0] * len(ids)
+    # the successors of a node come after it in topological order
+    for i in range(len(ids) - 1, -1, -1):
+        longest = max(
+            (ranks[succ] for succ in successors[successors_ptr[i] : successors_ptr[i + 1]]),
+            default=0.0,
+        )
+        ranks[i] = durations.get(ids[i], 0.0) + longest
+    return ranks
+
+
+def fusable(xn: "ExecNode") -> bool:
+    """Check if an ExecNode can share a thread pool task with others, fused in a chain or batched.
+
+    Args:
+        xn: the ExecNode
+
+    Returns:
+        whether it is a plain threaded ExecNode
+    """
+    return (
+        xn.resource == Resource.thread
+        and not xn.is_sequential
+        and not xn.is_coroutine
+        and xn.pool is None
+        and xn.timeout is None
+        and xn.retries == 0
+        and xn.memory is None
+    )
+
+
+class PlanState:
+    """The mutable state of a single execution of an ExecutionPlan.
+
+    >>> graph = DiGraphEx()
+    >>> graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    >>> plan = ExecutionPlan.from_graph(graph)
+    >>> state = plan.start({"a": 1})
+    >>> [plan.ids[state.pop()], plan.ids[state.pop()]]
+    ['b', 'c']
+    >>> state.release(plan.indices["b"])
+    >>> state.release(plan.indices["c"])
+    >>> plan.ids[state.peek()]
+    'd'
+    >>> state.remaining
+    1
+    """
+
+    def __init__(self, plan: ExecutionPlan, results: Dict[Identifier, Any]) -> None:
+        """Initialize the state of the execution.
+
+        Args:
+            plan (ExecutionPlan): the executed plan
+            results (Dict[Identifier, Any]): results available before the execution starts.
+        """
+        self.plan = plan
+        self.counters = plan.in_degrees.copy()
+        self.remaining = len(plan)
+        # the nodes fused after a submitted node, released with it
+        self.chains: Dict[int, List[int]] = {}
+        # saves the results as soon as they are computed, set by the scheduler
+        self.checkpoint: Optional["ResultsCheckpoint"] = None
+        # drops the results that are not used anymore, set by the scheduler
+        self.results_release: Optional[ResultsRelease] = None
+        # keeps the results within the memory budget of the execution, set by the scheduler
+        self.memory: Optional["MemoryBudget"] = None
+
+        # nodes whose results are already available are done before the execution starts.
+        # their counter is set far below zero so that releasing their predecessors never makes them ready.
+        done = [i for i, id_ in enumerate(plan.ids) if id_ in results]
+        for i in done:
+            self.counters[i] = -len(plan) - 1
+        self.ready: List[Tuple[float, int]] = []
+        for i in done:
+            self.release(i)
+
+        # the ready nodes are kept in a heap ordered by decreasing compound priority.
+        # ties are broken by the topological index of the node to keep the order stable.
+        self.ready = [
+            (-plan.priorities[i], i) for i, counter in enumerate(self.counters) if counter == 0
+        ]
+        heapq.heapify(self.ready)
+
+    def __bool__(self) -> bool:
+        """Whether some nodes are ready to be executed."""
+        return bool(self.ready)
+
+    def __len__(self) -> int:
+        """Number of nodes ready to be executed."""
+        return len(self.ready)
+
+    def peek(self) -> int:
+        """Get the index of the ready node with the highest priority without removing it."""
+        return self.ready[0][1]
+
+    def pop(self) -> int:
+        """Remove and return the index of the ready node with the highest priority."""
+        return heapq.heappop(self.ready)[1]
+
+    def push(self, index: int) -> None:
+        """Make a node that was popped ready again.
+
+        Args:
+            index (int): the index of the node
+        """
+        heapq.heappush(self.ready, (-self.plan.priorities[index], index))
+
+    def take_chain(self, index: int) -> List[int]:
+        """Take the nodes that will be executed right after a node by the same task.
+
+        A node is fused after its predecessor if it is the predecessor's only successor
+        and the predecessor is the last of its own predecessors to run. Chains of such nodes are followed.
+        The fused nodes never become ready: they are released with the node once it finishes.
+
+        Args:
+            index (int): the index of the node about to be submitted
+
+        Returns:
+            List[int]: the indices of the fused nodes in execution order, empty if there is none.
+        """
+        plan = self.plan
+        if not plan.fused_next:
+            return []
+        chain = []
+        succ = plan.fused_next[index]
+        # a counter of 1 means that only the previous node of the chain is not done yet
+        while succ != -1 and self.counters[succ] == 1:
+            self.counters[succ] = -len(plan) - 1
+            chain.append(succ)
+            succ = plan.fused_next[succ]
+        if chain:
+            self.chains[index] = chain
+        return chain
+
+    def release(self, index: int) -> None:
+        """Mark a node as done and push the nodes that became ready because of it.
+
+        The nodes fused after it (see `take_chain`) are marked as done too.
+
+        Args:
+            index (int): the index of the finished node
+        """
+        self._release(index)
+        if self.chains:
+            for fused in self.chains.pop(index, ()):
+                self._release(fused)
+
+    def _release(self, index: int) -> None:
+        self.remaining -= 1
+        plan = self.plan
+        counters = self.counters
+        for i in range(plan.successors_ptr[index], plan.successors_ptr[index + 1]):
+            succ = plan.successors[i]
+            counters[succ] -= 1
+            if counters[succ] == 0:
+                heapq.heappush(self.ready, (-plan.priorities[succ], succ))
+        if self.checkpoint is not None:
+            self.checkpoint.release(index)
+        if self.results_release is not None:
+            self.results_release.release(index)
+        if self.memory is not None:
+            self.memory.release(index, self)
+
+
+class ResultsRelease:
+    """Drops the results of an execution as soon as they are not used anymore.
+
+    Every result is reference counted by the successors that use it (see `ExecutionPlan.consumers`).
+    A result is dropped once all of them are done, or as soon as it is computed if it has none.
+
+    >>> graph = DiGraphEx()
+    >>> graph.add_edges_from([("a", "b"), ("b", "c")])
+    >>> plan = ExecutionPlan.from_graph(graph, retained={"c"})
+    >>> results = {"a": 1, "b": 2}
+    >>> release = ResultsRelease(plan, results)
+    >>> release.release(plan.indices["b"])
+    >>> results
+    {'b': 2}
+    """
+
+    def __init__(
+        self,
+        plan: ExecutionPlan,
+        results: Dict[Identifier, Any],
+        transport: Optional["SharedMemoryTransport"] = None,
+    ) -> None:
+        """Start counting the consumers of the results.
+
+        Args:
+            plan (ExecutionPlan): the executed plan, compiled with `retained`
+            results (Dict[Identifier, Any]): the results of the execution
+            transport (Optional[SharedMemoryTransport]): the shared memory segments backing the dropped results
+                are released too. Defaults to None.
+        """
+        self.plan = plan
+        self.results = results
+        self.transport = transport
+        self.consumers = plan.consumers.copy()
+
+    def release(self, index: int) -> None:
+        """Mark a node as done: drop its result if nothing uses it and the results of its predecessors it was the last to use.
+
+        Args:
+            index (int): the index of the finished node
+        """
+        plan = self.plan
+        consumers = self.consumers
+        if consumers[index] == 0:
+            self._drop(index)
+        for i in range(plan.predecessors_ptr[index], plan.predecessors_ptr[index + 1]):
+            pred = plan.predecessors[i]
+            consumers[pred] -= 1
+            if consumers[pred] == 0:
+                self._drop(pred)
+
+    def _drop(self, index: int) -> None:
+        id_ = self.plan.ids[index]
+        self.results.pop(id_, None)
+        if self.transport is not None:
+            self.transport.discard(id_)
@@ -3,7 +3,7 @@
 The user should use the decorators `@dag` and `@xn` to create Tawazi objects `DAG` and `ExecNode`.
 """
 import functools
-from typing import Any, Callable, Optional, Union, overload
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union, overload
 
 from typing_extensions import Literal
 
@@ -11,7 +11,7 @@ from tawazi import AsyncDAG
 from tawazi._dag import DAG, threadsafe_make_dag
 
 from .config import cfg
-from .consts import RVDAG, RVXN, P, Resource, TagOrTags
+from .consts import RVDAG, RVXN, NoVal, P, Resource, TagOrTags
 from .node import LazyExecNode
 
 
@@ -31,6 +31,23 @@ def xn(
     setup: bool = False,
     unpack_to: Optional[int] = None,
     resource: Resource = cfg.TAWAZI_DEFAULT_RESOURCE,
+    pool: Optional[str] = None,
+    cost: int = 1,
+    timeout: Optional[float] = None,
+    fallback: Any = NoVal,
+    retries: int = 0,
+    backoff: float = 0.0,
+    retry_on: Union[Type[Exception], Tuple[Type[Exception], ...]] = (Exception,),
+    retain: bool = False,
+    memory: Optional[int] = None,
+    stream: bool = False,
+    per_item: bool = False,
+    batchable: bool = False,
+    max_batch: int = 32,
+    max_wait_ms: float = 5.0,
+    memoize: bool = False,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
 ) -> LazyExecNode[P, RVXN]:
     ...
 
@@ -45,6 +62,23 @@ def xn(
     setup: bool = False,
     unpack_to: Optional[int] = None,
     resource: Resource = cfg.TAWAZI_DEFAULT_RESOURCE,
+    pool: Optional[str] = None,
+    cost: int = 1,
+    timeout: Optional[float] = None,
+    fallback: Any = NoVal,
+    retries: int = 0,
+    backoff: float = 0.0,
+    retry_on: Union[Type[Exception], Tuple[Type[Exception], ...]] = (Exception,),
+    retain: bool = False,
+    memory: Optional[int] = None,
+    stream: bool = False,
+    per_item: bool = False,
+    batchable: bool = False,
+    max_batch: int = 32,
+    max_wait_ms: float = 5.0,
+    memoize: bool = False,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
 ) -> Callable[[Callable[P, RVXN]], LazyExecNode[P, RVXN]]:
     ...
 
@@ -59,6 +93,23 @@ def xn(
     setup: bool = False,
     unpack_to: Optional[int] = None,
     resource: Resource = cfg.TAWAZI_DEFAULT_RESOURCE,
+    pool: Optional[str] = None,
+    cost: int = 1,
+    timeout: Optional[float] = None,
+    fallback: Any = NoVal,
+    retries: int = 0,
+    backoff: float = 0.0,
+    retry_on: Union[Type[Exception], Tuple[Type[Exception], ...]] = (Exception,),
+    retain: bool = False,
+    memory: Optional[int] = None,
+    stream: bool = False,
+    per_item: bool = False,
+    batchable: bool = False,
+    max_batch: int = 32,
+    max_wait_ms: float = 5.0,
+    memoize: bool = False,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
 ) -> Union[Callable[[Callable[P, RVXN]], LazyExecNode[P, RVXN]], LazyExecNode[P, RVXN]]:
     """Decorate a normal function to make it an ExecNode.
 
@@ -89,6 +140,46 @@ def xn(
         unpack_to (Optional[int]): if not None, this ExecNode's execution must return unpacked results corresponding
                                    to the given value
         resource (str): the resource to use to execute this ExecNode. Defaults to "thread".
+        pool (Optional[str]): the name of the pool of the `DAG` this ExecNode takes capacity from.
+            Defaults to None.
+        cost (int): the capacity of the pool held by this ExecNode while it runs. Defaults to 1.
+        timeout (Optional[float]): the maximum number of seconds this ExecNode can take once submitted.
+            Coroutines and "async-thread" ExecNodes are cancelled when they time out,
+            the threads and processes that already started can't be interrupted: their result is ignored.
+            Defaults to None.
+        fallback (Any): the result of this ExecNode if it times out, its successors are executed with it.
+            If no fallback is provided, a timeout raises a `TawaziTimeoutError`.
+        retries (int): the number of times this ExecNode is executed again if it raises one of `retry_on`.
+            The other ready ExecNodes keep running while it waits for its retry. Defaults to 0.
+        backoff (float): the base delay in seconds before a retry, doubled after every failed attempt.
+            The actual delay is drawn at random between 0 and this value (jitter). Defaults to 0.
+        retry_on (Union[Type[Exception], Tuple[Type[Exception], ...]]): the errors that trigger a retry.
+            Defaults to (Exception,).
+        retain (bool): if True, the result of this ExecNode is kept until the end of the execution
+            even when `TAWAZI_RELEASE_RESULTS` is enabled. Defaults to False.
+        memory (Optional[int]): the number of bytes taken by the result of this ExecNode.
+            Under a `memory_budget`, it only starts when the running ExecNodes leave enough room for it.
+            Defaults to None (the size of the result is estimated once it is computed).
+        stream (bool): if True, the function of this ExecNode returns an iterable or an async iterable
+            (a generator for example) whose items are streamed to its successors while they are produced.
+            Up to `TAWAZI_STREAM_QUEUE_SIZE` items are produced in advance. Defaults to False.
+        per_item (bool): if True, the function of this ExecNode is called once per item of the streams
+            among its arguments (the n-th items of several streams are passed together)
+            and its results are streamed in turn. Defaults to False.
+        batchable (bool): if True, the calls of this ExecNode made at the same time by concurrent executions
+            of the DAG (see `DAG.map`) are gathered into a single call of its function.
+            The function receives the list of the values of every argument and must return the list of the outputs,
+            which are scattered back to the executions. Defaults to False.
+        max_batch (int): the maximum number of calls gathered in a single call. Defaults to 32.
+        max_wait_ms (float): the maximum number of milliseconds the first call of a batch waits for others to join.
+            Defaults to 5.
+        memoize (bool): if True, the result of a call of this ExecNode is reused by the next calls
+            with the same arguments, across the executions of the DAG. The arguments are compared by value,
+            the buffers (bytes, numpy arrays etc.) by a digest of their content
+            and other unhashable types with the hasher registered by `tawazi.register_hasher`. Defaults to False.
+        maxsize (Optional[int]): the maximum number of memoized results, the least recently used is evicted first.
+            Defaults to 128, None for no limit.
+        ttl (Optional[float]): the number of seconds a memoized result is reused. Defaults to None (no expiry).
 
     Returns:
         LazyExecNode: The decorated function wrapped in an `ExecNode`.
@@ -107,8 +198,26 @@ def xn(
             setup=setup,
             unpack_to=unpack_to,
             resource=resource,
+            pool=pool,
+            cost=cost,
+            timeout=timeout,
+            fallback=fallback,
+            retries=retries,
+            backoff=backoff,
+            retry_on=retry_on,  # type: ignore[arg-type]
+            retain=retain,
+            memory=memory,
+            stream=stream,
+            per_item=per_item,
+            batchable=batchable,
+            max_batch=max_batch,
+            max_wait_ms=max_wait_ms,
+            memoize=memoize,
+            maxsize=maxsize,
+            ttl=ttl,
         )
         functools.update_wrapper(lazy_exec_node, _func)
+        object.__setattr__(lazy_exec_node, "_decorated", True)
         return lazy_exec_node
 
     # case #1: arguments are provided to the decorator
@@ -131,6 +240,9 @@ def dag(
     *,
     max_concurrency: int = 1,
     is_async: Literal[False] = False,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> DAG[P, RVDAG]:
     ...
 
@@ -141,34 +253,58 @@ def dag(
     *,
     max_concurrency: int = 1,
     is_async: Literal[True] = True,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> AsyncDAG[P, RVDAG]:
     ...
 
 
 @overload
 def dag(
-    declare_dag_function: Callable[P, RVDAG], *, max_concurrency: int = 1, is_async: bool = False
+    declare_dag_function: Callable[P, RVDAG],
+    *,
+    max_concurrency: int = 1,
+    is_async: bool = False,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[DAG[P, RVDAG], AsyncDAG[P, RVDAG]]:
     ...
 
 
 @overload
 def dag(
-    *, max_concurrency: int = 1, is_async: Literal[False] = False
+    *,
+    max_concurrency: int = 1,
+    is_async: Literal[False] = False,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Callable[[Callable[P, RVDAG]], DAG[P, RVDAG]]:
     ...
 
 
 @overload
 def dag(
-    *, max_concurrency: int = 1, is_async: Literal[True] = True
+    *,
+    max_concurrency: int = 1,
+    is_async: Literal[True] = True,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Callable[[Callable[P, RVDAG]], AsyncDAG[P, RVDAG]]:
     ...
 
 
 @overload
 def dag(
-    *, max_concurrency: int = 1, is_async: bool = False
+    *,
+    max_concurrency: int = 1,
+    is_async: bool = False,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[
     Callable[[Callable[P, RVDAG]], DAG[P, RVDAG]],
     Callable[[Callable[P, RVDAG]], AsyncDAG[P, RVDAG]],
@@ -181,6 +317,9 @@ def dag(
     *,
     max_concurrency: int = 1,
     is_async: bool = False,
+    pools: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    memory_budget: Optional[int] = None,
 ) -> Union[
     DAG[P, RVDAG],
     AsyncDAG[P, RVDAG],
@@ -202,6 +341,13 @@ def dag(
             These constants are computed only once during the `DAG` declaration.
         max_concurrency: the maximum number of concurrent threads to execute in parallel.
         is_async: if True, the returned object will be an `AsyncDAG` instead of a `DAG`.
+        pools: the capacity of every named pool, e.g. `{"cpu": 4, "io": 64}`.
+            An `ExecNode` declared with `@xn(pool=..., cost=...)` only starts when its pool has enough capacity left.
+        timeout: the maximum number of seconds of every execution of the DAG.
+            Once it is over, the execution stops and raises a `TawaziTimeoutError`.
+        memory_budget: the number of bytes the results of an execution can take in memory.
+            Once it is exceeded, the oldest large results are spilled to disk and loaded back when they are used.
+            An `ExecNode` declared with `@xn(memory=...)` only starts when the running ones leave enough room for it.
 
     Returns:
         a `DAG` instance that can be used just like a normal Python function. It will be executed by Tawazi's scheduler.
@@ -213,7 +359,7 @@ def dag(
     # wrapper used to support parametrized and non parametrized decorators
     def intermediate_wrapper(_func: Callable[P, RVDAG]) -> Union[DAG[P, RVDAG], AsyncDAG[P, RVDAG]]:
         # 0. Protect against multiple threads declaring many DAGs at the same time
-        d = threadsafe_make_dag(_func, max_concurrency, is_async)
+        d = threadsafe_make_dag(_func, max_concurrency, is_async, pools, timeout, memory_budget)
         functools.update_wrapper(d, _func)
         return d
 
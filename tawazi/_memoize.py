@@ -0,0 +1,204 @@
+"""Module helper to memoize the results of an ExecNode between the executions of its DAG.
+
+The results are keyed by the values of the arguments, the buffers (bytes, numpy arrays etc.) are keyed by a digest
+of their content. The types that are neither hashable by value nor buffers can be keyed by a hasher registered for them.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Sequence, Tuple
+
+from loguru import logger
+
+# the hashers registered by the user, by type
+_hashers: Dict[type, Callable[[Any], Hashable]] = {}
+# hashed by their identity but never mutated
+_SINGLETONS = (None, Ellipsis, NotImplemented)
+
+
+def register_hasher(type_: type, hasher: Callable[[Any], Hashable]) -> None:
+    """Key the arguments of a type by a custom hasher when an ExecNode is memoized.
+
+    The hasher of the closest parent class is used for the subclasses.
+
+    >>> register_hasher(set, frozenset)
+    >>> make_key([{1, 2}], {}) == make_key([{2, 1}], {})
+    True
+
+    Args:
+        type_ (type): the type of the arguments
+        hasher (Callable[[Any], Hashable]): makes a hashable key out of an argument,
+            two arguments with the same key are considered equal.
+    """
+    _hashers[type_] = hasher
+
+
+def _digest(buffer: Any) -> bytes:
+    return hashlib.blake2b(memoryview(buffer).cast("B"), digest_size=16).digest()
+
+
+def _value_key(value: Any) -> Hashable:
+    for type_ in type(value).__mro__:
+        hasher = _hashers.get(type_)
+        if hasher is not None:
+            return type_, hasher(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if isinstance(value, memoryview) and not value.c_contiguous:
+            return type(value), _digest(value.tobytes())
+        return type(value), _digest(value)
+    # numpy arrays (and alike) are keyed by their content, whatever their memory layout
+    if hasattr(value, "dtype") and hasattr(value, "shape") and hasattr(value, "tobytes"):
+        # the buffer of an array of objects holds their addresses: it would be a hit even after they are mutated
+        if getattr(value.dtype, "hasobject", False):
+            raise TypeError(f"{type(value).__name__} of objects is hashed by their identity")
+        return type(value), str(value.dtype), tuple(value.shape), _digest(value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_value_key(item) for item in value)
+    if isinstance(value, dict):
+        return type(value), tuple((key, _value_key(item)) for key, item in value.items())
+    # an object hashed by its identity is equal to itself only: it would be a hit even after being mutated
+    identity_hashed = type(value).__hash__ is object.__hash__  # type: ignore[comparison-overlap]
+    if identity_hashed and not any(value is s for s in _SINGLETONS):
+        raise TypeError(f"{type(value).__name__} is hashed by its identity")
+    # the type is part of the key: 1 and True are equal but the function might not treat them the same way
+    hash(value)
+    return type(value), value
+
+
+def make_key(args: Sequence[Any], kwargs: Dict[str, Any]) -> Optional[Hashable]:
+    """Make the key of a call out of its arguments.
+
+    >>> make_key([b"abc", 1], {"scale": 2.0}) == make_key([b"abc", 1], {"scale": 2.0})
+    True
+    >>> make_key([[1, 2]], {}) == make_key([[1, 3]], {})
+    False
+
+    Args:
+        args (Sequence[Any]): the positional arguments
+        kwargs (Dict[str, Any]): the keyword arguments
+
+    Returns:
+        Optional[Hashable]: the key, None if one of the arguments can't be keyed.
+    """
+    try:
+        return (
+            tuple(_value_key(arg) for arg in args),
+            tuple(sorted((name, _value_key(arg)) for name, arg in kwargs.items())),
+        )
+    except TypeError:
+        return None
+
+
+class MemoInfo(NamedTuple):
+    """Statistics of the memoized results of an ExecNode, similar to `functools.lru_cache`'s."""
+
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class Memo:
+    """Thread safe cache of the results of a function with a least recently used eviction and an expiry.
+
+    >>> memo = Memo(maxsize=2, ttl=None)
+    >>> [memo.call([x], {}, lambda: x * 2) for x in (1, 2, 1, 3, 2)]
+    [2, 4, 2, 6, 4]
+    >>> memo.info()
+    MemoInfo(hits=1, misses=4, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, maxsize: Optional[int], ttl: Optional[float]) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            maxsize (Optional[int]): the maximum number of results kept, None for no limit.
+            ttl (Optional[float]): the number of seconds a result is kept, None for no expiry.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # the expiry date and the result of every key, from the least to the most recently used
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Optional[int], Optional[float]]]:
+        # copies start empty
+        return self.__class__, (self.maxsize, self.ttl)
+
+    def info(self) -> MemoInfo:
+        """Get the statistics of the cache."""
+        with self._lock:
+            return MemoInfo(self.hits, self.misses, self.maxsize, len(self._results))
+
+    def clear(self) -> None:
+        """Remove all the results and reset the statistics."""
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+    def call(self, args: Sequence[Any], kwargs: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+        """Get the result of a call from the cache, or compute it if it isn't cached.
+
+        Args:
+            args (Sequence[Any]): the positional arguments of the call
+            kwargs (Dict[str, Any]): the keyword arguments of the call
+            compute (Callable[[], Any]): computes the result of the call
+
+        Returns:
+            Any: the result of the call
+        """
+        key = make_key(args, kwargs)
+        hit, result = self._get(key)
+        if hit:
+            return result
+        result = compute()
+        self._put(key, result)
+        return result
+
+    async def acall(
+        self, args: Sequence[Any], kwargs: Dict[str, Any], compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Same as `call` for a result computed by a coroutine.
+
+        Args:
+            args (Sequence[Any]): the positional arguments of the call
+            kwargs (Dict[str, Any]): the keyword arguments of the call
+            compute (Callable[[], Awaitable[Any]]): computes the result of the call
+
+        Returns:
+            Any: the result of the call
+        """
+        key = make_key(args, kwargs)
+        hit, result = self._get(key)
+        if hit:
+            return result
+        result = await compute()
+        self._put(key, result)
+        return result
+
+    def _get(self, key: Optional[Hashable]) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = None if key is None else self._results.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._results[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._results.move_to_end(key)
+            return True, entry[1]
+
+    def _put(self, key: Optional[Hashable], result: Any) -> None:
+        if key is None:
+            logger.debug("The arguments can't be keyed, the result is not memoized")
+            return
+        expiry = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._results[key] = (expiry, result)
+            self._results.move_to_end(key)
+            if self.maxsize is not None and len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
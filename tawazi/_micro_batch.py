@@ -0,0 +1,101 @@
+"""Module helper to gather the concurrent calls of an ExecNode into a single vectorized call of its function.
+
+The first call of a batch leads it: it waits for other calls to join (at most `max_wait` seconds),
+calls the function once with all their arguments and scatters the outputs back to the other calls.
+The calls don't need any extra thread, they come from concurrent executions of the same DAG.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from tawazi.errors import TawaziUsageError
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.calls: List[Tuple[Sequence[Any], Dict[str, Any], "Future[Any]"]] = []
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """Gathers the calls of a function made at the same time by different threads into batches.
+
+    The function receives, for each of its parameters, the list of the values of that parameter in the batch,
+    and returns the list of the outputs in the same order.
+
+    >>> batcher = MicroBatcher(max_batch=8, max_wait=0.0)
+    >>> batcher.call(lambda xs, ys: [x + y for x, y in zip(xs, ys)], [1, 2], {})
+    3
+    """
+
+    def __init__(self, max_batch: int, max_wait: float) -> None:
+        """Initialize the batcher.
+
+        Args:
+            max_batch (int): the maximum number of calls in a batch, a full batch is executed right away.
+            max_wait (float): the maximum number of seconds the first call of a batch waits for others.
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        # the batch that new calls join, None if they must start a new one
+        self._open: Optional[_Batch] = None
+
+    def __reduce__(self) -> Tuple[Any, Tuple[int, float]]:
+        # copies start with no pending calls
+        return self.__class__, (self.max_batch, self.max_wait)
+
+    def call(
+        self, function: Callable[..., Any], args: Sequence[Any], kwargs: Dict[str, Any]
+    ) -> Any:
+        """Call the function with the arguments of a single call, batched with the concurrent calls.
+
+        Args:
+            function (Callable[..., Any]): the vectorized function
+            args (Sequence[Any]): the positional arguments of this call
+            kwargs (Dict[str, Any]): the keyword arguments of this call
+
+        Returns:
+            Any: the output of this call
+
+        Raises:
+            TawaziUsageError: if the function doesn't return one output per call
+        """
+        future: "Future[Any]" = Future()
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if batch is None:
+                batch = self._open = _Batch()
+            batch.calls.append((args, kwargs, future))
+            if len(batch.calls) >= self.max_batch:
+                # the next calls start a new batch
+                self._open = None
+                batch.full.set()
+
+        if not leader:
+            return future.result()
+
+        batch.full.wait(self.max_wait)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+
+        calls = batch.calls
+        try:
+            batch_args = [[call[0][i] for call in calls] for i in range(len(args))]
+            batch_kwargs = {key: [call[1][key] for call in calls] for key in kwargs}
+            outputs = function(*batch_args, **batch_kwargs)
+            # numpy arrays are accepted too
+            if not hasattr(outputs, "__len__") or len(outputs) != len(calls):
+                raise TawaziUsageError(
+                    f"a batchable function must return a sequence of {len(calls)} outputs, "
+                    f"one per call of the batch, provided {outputs!r}"
+                )
+        except BaseException as e:
+            for _, _, call_future in calls:
+                call_future.set_exception(e)
+        else:
+            for (_, _, call_future), output in zip(calls, outputs):
+                call_future.set_result(output)
+        return future.result()
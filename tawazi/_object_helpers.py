@@ -1,26 +1,30 @@
-"""Pre-instantiated objects that can be used as helpers."""
+"""Pre-instantiated objects that can be used as helpers.
+
+They are cheap, so they run on the scheduler's thread instead of going through the thread pool.
+"""
 
 from typing import Any, TypeVar, Union
 
 from ._decorators import xn
+from .consts import Resource
 
 T = TypeVar("T")
 V = TypeVar("V")
 
 
-@xn
+@xn(resource=Resource.main_thread)
 def and_(a: T, b: V) -> Union[T, V]:
     """Equivalent of `and` wrapped in ExecNode."""
     return a and b
 
 
-@xn
+@xn(resource=Resource.main_thread)
 def or_(a: T, b: V) -> Union[T, V]:
     """Equivalent of `or` wrapped in ExecNode."""
     return a or b
 
 
-@xn
+@xn(resource=Resource.main_thread)
 def not_(a: Any) -> bool:
     """Equivalent of `not` wrapped in ExecNode."""
     return not a
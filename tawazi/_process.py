@@ -0,0 +1,308 @@
+"""Module helper to run ExecNodes in a pool of processes or sub-interpreters."""
+import importlib
+import pickle
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from types import FunctionType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from tawazi.config import cfg
+from tawazi.consts import Identifier, NoVal
+from tawazi.errors import TawaziUsageError
+from tawazi.node.uxn import UsageExecNode
+from tawazi.profile import Profile
+
+if TYPE_CHECKING:
+    from multiprocessing.shared_memory import SharedMemory
+
+    from tawazi._shared_memory import SharedMemoryTransport, SharedPayload
+
+try:
+    # python 3.14+
+    from concurrent.futures import InterpreterPoolExecutor  # type: ignore[attr-defined]
+
+    SUB_INTERPRETERS_AVAILABLE = True
+except ImportError:
+    SUB_INTERPRETERS_AVAILABLE = False
+
+# results of the setup ExecNodes, sent once to the worker process when it starts
+_setup_results: Dict[Identifier, Any] = {}
+
+
+@dataclass(frozen=True)
+class FunctionReference:
+    """Reference to a function defined at the top level of a module.
+
+    A function decorated with `@xn` can't be pickled by reference because its name in the module
+    is bound to the LazyExecNode. The worker process imports the module and unwraps the LazyExecNode instead.
+    """
+
+    module: str
+    qualname: str
+
+    def resolve(self) -> Callable[..., Any]:
+        """Import the referenced function.
+
+        Returns:
+            Callable[..., Any]: the function
+        """
+        from tawazi.node import ExecNode
+
+        obj: Any = importlib.import_module(self.module)
+        for name in self.qualname.split("."):
+            obj = getattr(obj, name)
+        if isinstance(obj, ExecNode):
+            return obj.exec_function
+        return obj  # type: ignore[no-any-return]
+
+
+@dataclass(frozen=True)
+class SetupResult:
+    """Placeholder for the result of a setup ExecNode that was already sent to the worker process."""
+
+    uxn: UsageExecNode
+
+    def resolve(self) -> Any:
+        """Get the result of the setup ExecNode inside the worker process."""
+        return self.uxn.result(_setup_results)
+
+
+@dataclass(frozen=True)
+class SharedResult:
+    """Placeholder for the result of an ExecNode living in shared memory, received as a view by the worker process."""
+
+    uxn: UsageExecNode
+    payload: "SharedPayload"
+
+    def resolve(self, attached: Dict[str, "SharedMemory"]) -> Any:
+        """Get the result of the ExecNode inside the worker process.
+
+        The views are read-only because the same memory is shared with all the other users of this result.
+
+        Args:
+            attached (Dict[str, SharedMemory]): the segments attached by the worker process for the current execution
+        """
+        from tawazi._shared_memory import loads
+
+        return self.uxn.result({self.uxn.id: loads(self.payload, attached, readonly=True)})
+
+
+Target = Union[FunctionReference, Callable[..., Any]]
+Payload = Union[bytes, "SharedPayload"]
+
+
+def make_target(id_: Identifier, func: Callable[..., Any]) -> Target:
+    """Make the picklable representation of the function of an ExecNode executed in a process.
+
+    Args:
+        id_ (Identifier): the id of the ExecNode
+        func (Callable[..., Any]): the function of the ExecNode
+
+    Returns:
+        Target: a reference to the function if it is a plain function, otherwise the callable itself.
+
+    Raises:
+        TawaziUsageError: if the function is a lambda or is defined inside another function.
+    """
+    if not isinstance(func, FunctionType):
+        # partials, callable instances etc. are pickled as they are
+        return func
+
+    if "<locals>" in func.__qualname__ or func.__name__ == "<lambda>":
+        raise TawaziUsageError(
+            f"ExecNode {id_} can't be executed in a process because its function {func.__qualname__} "
+            "is a lambda, a closure or is defined inside another function. "
+            "Define it at the top level of a module instead."
+        )
+    return FunctionReference(func.__module__, func.__qualname__)
+
+
+def _init_worker(setup_results: Dict[Identifier, Any]) -> None:
+    _setup_results.clear()
+    _setup_results.update(setup_results)
+
+
+def _resolve(value: Any, attached: Dict[str, "SharedMemory"]) -> Any:
+    if isinstance(value, SetupResult):
+        return value.resolve()
+    if isinstance(value, SharedResult):
+        return value.resolve(attached)
+    return value
+
+
+def _run(
+    payload: Payload, shared_memory_min_bytes: Optional[int], attached: Dict[str, "SharedMemory"]
+) -> Tuple[Payload, Profile]:
+    if isinstance(payload, bytes):
+        id_, target, args, kwargs = pickle.loads(payload)  # noqa: S301
+    else:
+        from tawazi._shared_memory import loads
+
+        id_, target, args, kwargs = loads(payload, attached)
+
+    func = target.resolve() if isinstance(target, FunctionReference) else target
+    args = [_resolve(arg, attached) for arg in args]
+    kwargs = {key: _resolve(arg, attached) for key, arg in kwargs.items()}
+
+    profile = Profile(cfg.TAWAZI_PROFILE_ALL_NODES)
+    with profile:
+        result = func(*args, **kwargs)
+
+    try:
+        if shared_memory_min_bytes is None:
+            return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), profile
+
+        from tawazi._shared_memory import dumps
+
+        return dumps(result, shared_memory_min_bytes), profile
+    except Exception as e:
+        # the original error might not be picklable itself
+        raise TawaziUsageError(
+            f"The result of ExecNode {id_} executed in a process can't be pickled: {e!r}"
+        ) from None
+
+
+def run_in_process(
+    payload: Payload, shared_memory_min_bytes: Optional[int] = None
+) -> Tuple[Payload, Profile]:
+    """Execute the function of an ExecNode inside the worker process.
+
+    Args:
+        payload (Payload): the pickled id, target, args and kwargs of the ExecNode
+        shared_memory_min_bytes (Optional[int]): if provided, the buffers of the result larger than this value
+            are placed in shared memory. Defaults to None.
+
+    Returns:
+        Tuple[Payload, Profile]: the pickled result and the profile of the execution
+
+    Raises:
+        TawaziUsageError: if the result can't be pickled
+    """
+    attached: Dict[str, "SharedMemory"] = {}
+    try:
+        return _run(payload, shared_memory_min_bytes, attached)
+    finally:
+        # the arguments are not used anymore, the worker process detaches from their segments
+        if attached:
+            from tawazi._shared_memory import close
+
+            close(list(attached.values()))
+
+
+def dump_payload(
+    id_: Identifier,
+    target: Target,
+    args: List[Any],
+    kwargs: Dict[str, Any],
+    transport: Optional["SharedMemoryTransport"] = None,
+) -> Payload:
+    """Pickle everything needed to execute an ExecNode in a worker process.
+
+    Args:
+        id_ (Identifier): the id of the ExecNode
+        target (Target): the function of the ExecNode
+        args (List[Any]): the positional arguments
+        kwargs (Dict[str, Any]): the keyword arguments
+        transport (Optional[SharedMemoryTransport]): if provided, the large buffers are placed in shared memory.
+
+    Returns:
+        Payload: the payload
+
+    Raises:
+        TawaziUsageError: if the function or the arguments can't be pickled
+    """
+    try:
+        if transport is not None:
+            return transport.dumps((id_, target, args, kwargs))
+        return pickle.dumps((id_, target, args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise TawaziUsageError(
+            f"ExecNode {id_} can't be executed in a process because its function "
+            f"or its arguments can't be pickled: {e!r}"
+        ) from e
+
+
+class ProcessPool:
+    """Long-lived pool of processes in which the ExecNodes with `Resource.process` run.
+
+    The results of the setup ExecNodes are sent to the worker processes once when they start,
+    instead of being pickled with the arguments on every execution.
+    The worker processes are replaced when a setup ExecNode they don't know about is needed.
+    The same pool can run the ExecNodes with `Resource.sub_interpreter` in sub-interpreters instead of processes.
+    """
+
+    def __init__(self, max_workers: int, sub_interpreters: bool = False) -> None:
+        """Create the pool, the worker processes are only started on first use.
+
+        Args:
+            max_workers (int): the maximum number of worker processes
+            sub_interpreters (bool): whether to use sub-interpreters instead of processes. Defaults to False.
+                Only available starting from python 3.14.
+        """
+        self.max_workers = max_workers
+        self.sub_interpreters = sub_interpreters
+        self._executor: Optional[Executor] = None
+        self._setup_results: Dict[Identifier, Any] = {}
+        self._shared_memory = False
+        self._lock = Lock()
+
+    def submit(
+        self,
+        payload: Payload,
+        setup_results: Dict[Identifier, Any],
+        shared_memory_min_bytes: Optional[int] = None,
+    ) -> "Future[Any]":
+        """Execute a pickled ExecNode in a worker process.
+
+        Args:
+            payload (Payload): the payload made by `dump_payload`
+            setup_results (Dict[Identifier, Any]): the results of the setup ExecNodes used by the ExecNode
+            shared_memory_min_bytes (Optional[int]): look at `run_in_process`. Defaults to None.
+
+        Returns:
+            Future[Any]: the future of `run_in_process`
+        """
+        shared_memory = shared_memory_min_bytes is not None
+        with self._lock:
+            if (
+                self._executor is None
+                or (shared_memory and not self._shared_memory)
+                or any(
+                    self._setup_results.get(id_, NoVal) is not result
+                    for id_, result in setup_results.items()
+                )
+            ):
+                if self._executor is not None:
+                    # the already submitted ExecNodes still finish in the previous workers
+                    self._executor.shutdown(wait=False)
+                if shared_memory:
+                    from tawazi._shared_memory import ensure_tracker_running
+
+                    ensure_tracker_running()
+                    self._shared_memory = True
+                self._setup_results = {**self._setup_results, **setup_results}
+                executor_type = (
+                    InterpreterPoolExecutor if self.sub_interpreters else ProcessPoolExecutor
+                )
+                self._executor = executor_type(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self._setup_results,),
+                )
+            return self._executor.submit(  # type: ignore[union-attr]
+                run_in_process, payload, shared_memory_min_bytes
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker processes, new ones are started if the pool is used again.
+
+        Args:
+            wait (bool): whether to wait for the running ExecNodes to finish. Defaults to True.
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            self._setup_results = {}
+            self._shared_memory = False
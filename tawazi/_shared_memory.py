@@ -0,0 +1,274 @@
+"""Module helper to exchange large buffers with the worker processes through shared memory.
+
+Objects are pickled with protocol 5: the buffers larger than a threshold (numpy arrays, bytearrays etc.)
+are not copied in the pickle stream but placed in shared memory segments.
+The receiving side builds its objects as views over these segments instead of copying them.
+"""
+import os
+import pickle
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from tawazi._helpers import StrictDict
+from tawazi.consts import Identifier
+
+# segments whose buffers were still used by some objects when they had to be closed
+_unclosed: List[SharedMemory] = []
+
+
+@dataclass(frozen=True)
+class SharedPayload:
+    """An object pickled with protocol 5 whose large buffers are stored in shared memory segments.
+
+    Args:
+        data (bytes): the pickle stream without the out-of-band buffers.
+        segments (Tuple[Tuple[str, int], ...]): the name and size of the segment of every out-of-band buffer.
+    """
+
+    data: bytes
+    segments: Tuple[Tuple[str, int], ...]
+
+
+def ensure_tracker_running() -> None:
+    """Start the resource tracker before starting worker processes so that they all share it.
+
+    Otherwise every worker starts its own tracker which unlinks the segments it knows about when the worker stops.
+    """
+    if os.name == "posix":
+        resource_tracker.ensure_running()
+
+
+def dumps(
+    obj: Any, min_bytes: int, keep: Optional[Dict[str, SharedMemory]] = None
+) -> SharedPayload:
+    """Pickle an object, placing its buffers larger than min_bytes in new shared memory segments.
+
+    Args:
+        obj (Any): the object to pickle
+        min_bytes (int): the buffers smaller than this are kept in the pickle stream
+        keep (Optional[Dict[str, SharedMemory]]): if provided, the created segments are kept open in it,
+            otherwise they are closed (but not unlinked) right away.
+
+    Returns:
+        SharedPayload: the pickled object
+    """
+    created: List[Tuple[SharedMemory, int]] = []
+
+    def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+        view = buffer.raw()
+        if view.nbytes < min_bytes:
+            return True
+        # the segment might be bigger than requested (rounded to the page size)
+        shm = SharedMemory(create=True, size=max(view.nbytes, 1))
+        created.append((shm, view.nbytes))
+        shm.buf[: view.nbytes] = view
+        return False
+
+    try:
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)
+    except BaseException:
+        for shm, _ in created:
+            shm.close()
+            shm.unlink()
+        raise
+
+    for shm, _ in created:
+        if keep is None:
+            shm.close()
+        else:
+            keep[shm.name] = shm
+    return SharedPayload(data, tuple((shm.name, size) for shm, size in created))
+
+
+def loads(payload: SharedPayload, attached: Dict[str, SharedMemory], readonly: bool = False) -> Any:
+    """Unpickle an object, its buffers are views over the shared memory segments.
+
+    Args:
+        payload (SharedPayload): the pickled object
+        attached (Dict[str, SharedMemory]): the segments already attached by this process.
+            The segments attached by this call are added to it and must stay open as long as the object is used.
+        readonly (bool): whether the views are read-only. Defaults to False.
+
+    Returns:
+        Any: the object
+    """
+    buffers = []
+    for name, size in payload.segments:
+        if name not in attached:
+            attached[name] = SharedMemory(name=name)
+        buffer = attached[name].buf[:size]
+        buffers.append(buffer.toreadonly() if readonly else buffer)
+    return pickle.loads(payload.data, buffers=buffers)  # noqa: S301
+
+
+def close(segments: List[SharedMemory]) -> None:
+    """Close segments, the ones still used by some objects are closed later.
+
+    Args:
+        segments (List[SharedMemory]): the segments to close
+    """
+    segments = segments + _unclosed
+    _unclosed.clear()
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:
+            _unclosed.append(shm)
+
+
+class SharedMemoryTransport:
+    """The shared memory segments used by a single execution of a DAG.
+
+    Every segment is reference counted: it is referenced by the result it holds
+    and by the ExecNodes running in a worker process that received it as an argument.
+    A segment is unlinked as soon as it is not referenced anymore.
+    When the execution ends, the results backed by shared memory are copied to the main process's memory
+    and all the remaining segments are unlinked.
+    """
+
+    def __init__(self, min_bytes: int) -> None:
+        """Initialize the transport.
+
+        Args:
+            min_bytes (int): the buffers smaller than this are pickled in-band.
+        """
+        self.min_bytes = min_bytes
+        self.closed = False
+        self._segments: Dict[str, SharedMemory] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._payloads: Dict[Identifier, SharedPayload] = {}
+        # results are loaded from the threads of the ProcessPoolExecutor
+        self._lock = Lock()
+
+    def payload_of(self, id_: Identifier) -> Optional[SharedPayload]:
+        """Get the payload backing the result of an ExecNode.
+
+        Args:
+            id_ (Identifier): the id of the ExecNode
+
+        Returns:
+            Optional[SharedPayload]: the payload if the result lives in shared memory, None otherwise.
+        """
+        return self._payloads.get(id_)
+
+    def dumps(self, obj: Any) -> SharedPayload:
+        """Pickle an object to send it to a worker process, the payload is referenced until it is released.
+
+        Args:
+            obj (Any): the object to pickle
+
+        Returns:
+            SharedPayload: the pickled object
+        """
+        with self._lock:
+            payload = dumps(obj, self.min_bytes, keep=self._segments)
+            self._acquire(payload)
+        return payload
+
+    def load(self, id_: Identifier, payload: SharedPayload) -> Any:
+        """Unpickle the result of an ExecNode, the payload is referenced until the end of the execution.
+
+        Args:
+            id_ (Identifier): the id of the ExecNode
+            payload (SharedPayload): the pickled result
+
+        Returns:
+            Any: the result, None if the execution already ended.
+        """
+        with self._lock:
+            if self.closed:
+                # the execution failed in the meantime, nobody will use this result
+                for name, _ in payload.segments:
+                    _unlink(name)
+                return None
+            result = loads(payload, self._segments)
+            self._payloads[id_] = payload
+            self._acquire(payload)
+        return result
+
+    def acquire(self, payload: SharedPayload) -> None:
+        """Reference the segments of a payload.
+
+        Args:
+            payload (SharedPayload): the payload
+        """
+        with self._lock:
+            self._acquire(payload)
+
+    def release(self, payload: SharedPayload) -> None:
+        """Dereference the segments of a payload, unlinking the ones that are not referenced anymore.
+
+        Args:
+            payload (SharedPayload): the payload
+        """
+        with self._lock:
+            if self.closed:
+                return
+            unreferenced = []
+            for name, _ in payload.segments:
+                self._refcounts[name] -= 1
+                if self._refcounts[name] == 0:
+                    del self._refcounts[name]
+                    unreferenced.append(name)
+            self._unlink(unreferenced)
+
+    def discard(self, id_: Identifier) -> None:
+        """Stop referencing the payload backing a result that was dropped from the results of the execution.
+
+        Args:
+            id_ (Identifier): the id of the ExecNode
+        """
+        with self._lock:
+            payload = self._payloads.pop(id_, None)
+        if payload is not None:
+            self.release(payload)
+
+    def close(self, results: StrictDict[Identifier, Any]) -> None:
+        """End the execution: copy the results out of shared memory and unlink all the segments.
+
+        Args:
+            results (StrictDict[Identifier, Any]): the results of the execution
+        """
+        with self._lock:
+            self.closed = True
+            for id_, payload in self._payloads.items():
+                if id_ in results:
+                    buffers = [
+                        bytearray(self._segments[name].buf[:size])
+                        for name, size in payload.segments
+                    ]
+                    result = pickle.loads(payload.data, buffers=buffers)  # noqa: S301
+                    results.force_set(id_, result)
+            self._payloads = {}
+            self._unlink(list(self._refcounts))
+            self._refcounts = {}
+
+    def _acquire(self, payload: SharedPayload) -> None:
+        for name, _ in payload.segments:
+            self._refcounts[name] = self._refcounts.get(name, 0) + 1
+
+    def _unlink(self, names: List[str]) -> None:
+        segments = []
+        for name in names:
+            shm = self._segments.pop(name, None)
+            if shm is None:
+                _unlink(name)
+                continue
+            shm.unlink()
+            segments.append(shm)
+        logger.debug("Unlinked shared memory segments {}", names)
+        close(segments)
+
+
+def _unlink(name: str) -> None:
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.unlink()
+    shm.close()
@@ -0,0 +1,272 @@
+"""Module helper to keep the results of an execution within a memory budget by spilling them to disk.
+
+Results are pickled with protocol 5: their large buffers (numpy arrays, bytearrays etc.) are written
+out-of-band in the spill file. They are loaded back as views over a copy-on-write memory map of the file,
+so the pages of a spilled result are only read from disk when they are accessed.
+"""
+import mmap
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from tawazi._helpers import StrictDict
+from tawazi.config import cfg
+from tawazi.consts import Identifier
+
+if TYPE_CHECKING:
+    from tawazi._dag.plan import ExecutionPlan, PlanState
+    from tawazi._shared_memory import SharedMemoryTransport
+    from tawazi.node import ExecNode
+
+# results smaller than this are never spilled, writing them to disk wouldn't free a significant amount of memory
+MIN_SPILL_BYTES = 64 * 1024
+# the out-of-band buffers are aligned in the spill file so that the arrays loaded over them are aligned too
+_ALIGNMENT = 64
+
+
+def estimate_size(obj: Any) -> int:
+    """Estimate the number of bytes taken in memory by a result.
+
+    The buffers of numpy arrays (and other objects exposing `nbytes`) are counted,
+    the items of lists, tuples and dicts are summed up.
+
+    >>> estimate_size(bytes(1000))
+    1000
+    >>> estimate_size((bytearray(10), [bytearray(20), "abc"]))
+    33
+
+    Args:
+        obj (Any): the result
+
+    Returns:
+        int: the estimated number of bytes
+    """
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_size(value) for value in obj.values())
+    return sys.getsizeof(obj)
+
+
+@dataclass(frozen=True)
+class Spilled:
+    """Placeholder for a result written to disk, it takes the place of the result in the results of the execution.
+
+    Args:
+        path (str): the spill file
+        data_size (int): the size of the pickle stream at the beginning of the file
+        buffers (Tuple[Tuple[int, int], ...]): the offset and size of every out-of-band buffer in the file
+    """
+
+    path: str
+    data_size: int
+    buffers: Tuple[Tuple[int, int], ...]
+
+    def load(self) -> Any:
+        """Load the result back, its buffers are views over a copy-on-write memory map of the file.
+
+        Returns:
+            Any: the result
+        """
+        with open(self.path, "rb") as f:
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+        buffers = [view[offset : offset + size] for offset, size in self.buffers]
+        return pickle.loads(view[: self.data_size], buffers=buffers)  # noqa: S301
+
+
+class SpillStore:
+    """The spill files of a single execution, they live in a temporary directory removed when the execution ends."""
+
+    def __init__(self) -> None:
+        """Initialize the store, the directory is only created when the first result is spilled."""
+        self.directory: Optional[str] = None
+        self._count = 0
+
+    def dump(self, obj: Any) -> Spilled:
+        """Write an object to a new spill file.
+
+        Args:
+            obj (Any): the object
+
+        Returns:
+            Spilled: the placeholder to load the object back
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="tawazi-spill-", dir=cfg.TAWAZI_SPILL_DIR)
+        buffers: List["pickle.PickleBuffer"] = []
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        path = os.path.join(self.directory, str(self._count))
+        self._count += 1
+
+        layout = []
+        with open(path, "wb") as f:
+            f.write(data)
+            offset = len(data)
+            for buffer in buffers:
+                raw = buffer.raw()
+                offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+                f.seek(offset)
+                f.write(raw)
+                layout.append((offset, raw.nbytes))
+                offset += raw.nbytes
+        return Spilled(path, len(data), tuple(layout))
+
+    def close(self, results: StrictDict[Identifier, Any]) -> None:
+        """End the execution: load the spilled results that are still needed and remove the spill files.
+
+        The loaded results stay valid after their files are removed, their memory maps keep the data alive.
+
+        Args:
+            results (StrictDict[Identifier, Any]): the results of the execution
+        """
+        # nothing was spilled
+        if self.directory is None:
+            return
+        for id_, result in list(results.items()):
+            if isinstance(result, Spilled):
+                results.force_set(id_, result.load())
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+
+
+class MemoryBudget:
+    """Keeps the results of a single execution within a number of bytes.
+
+    The size of every result is declared by its ExecNode (`memory`) or estimated once it is computed.
+    When the results take more than the budget, the oldest ones are spilled to disk (see `SpillStore`),
+    the ExecNodes using them load them back through `UsageExecNode.result`.
+    An ExecNode that declares its memory only starts if the running ExecNodes that declared theirs leave enough room,
+    otherwise it is parked until one of them finishes.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        plan: "ExecutionPlan",
+        exec_nodes: Dict[Identifier, "ExecNode"],
+        results: StrictDict[Identifier, Any],
+        store: SpillStore,
+        transport: Optional["SharedMemoryTransport"] = None,
+    ) -> None:
+        """Start with an empty budget.
+
+        Args:
+            budget (int): the number of bytes the results can take
+            plan (ExecutionPlan): the executed plan
+            exec_nodes (Dict[Identifier, ExecNode]): dictionary identifying ExecNodes
+            results (StrictDict[Identifier, Any]): the results of the execution, the spilled ones are replaced in it.
+            store (SpillStore): where the results are spilled
+            transport (Optional[SharedMemoryTransport]): the shared memory segments backing the spilled results
+                are released too. Defaults to None.
+        """
+        self.budget = budget
+        self.plan = plan
+        self.exec_nodes = exec_nodes
+        self.results = results
+        self.store = store
+        self.transport = transport
+        # size of the results kept in memory, the oldest first
+        self.sizes: "OrderedDict[Identifier, int]" = OrderedDict()
+        self.in_memory = 0
+        # results that failed to be spilled
+        self.pinned: Set[Identifier] = set()
+        # memory declared by the running ExecNodes and the ExecNodes waiting for it
+        self.reserved: Dict[int, int] = {}
+        self.parked: List[int] = []
+
+    def admit(self, index: int, xn: "ExecNode") -> bool:
+        """Reserve the memory declared by an ExecNode about to run, if the running ExecNodes leave enough room.
+
+        Args:
+            index (int): the index of the ExecNode in the plan
+            xn (ExecNode): the ExecNode
+
+        Returns:
+            bool: whether the ExecNode can run, always True if it doesn't declare its memory or if it is the only one.
+        """
+        if xn.memory is None or index in self.reserved:
+            return True
+        if self.reserved and sum(self.reserved.values()) + xn.memory > self.budget:
+            return False
+        self.reserved[index] = xn.memory
+        return True
+
+    def park(self, index: int, xn: "ExecNode") -> None:
+        """Put aside a ready ExecNode until a running ExecNode gives its memory back.
+
+        Args:
+            index (int): the index of the ExecNode in the plan, it is already popped from the ready nodes.
+            xn (ExecNode): the ExecNode
+        """
+        logger.debug(
+            "Not enough memory left to run {}, it waits for other ExecNodes to finish", xn.id
+        )
+        self.parked.append(index)
+
+    def cancel(self, index: int, state: "PlanState") -> None:
+        """Give back the memory reserved by an ExecNode that couldn't start after all.
+
+        Args:
+            index (int): the index of the ExecNode in the plan
+            state (PlanState): the state of the execution, the parked ExecNodes are made ready again.
+        """
+        if self.reserved.pop(index, None) is not None and self.parked:
+            for parked in self.parked:
+                state.push(parked)
+            self.parked = []
+
+    def release(self, index: int, state: Optional["PlanState"] = None) -> None:
+        """Account for the result of a finished ExecNode, spilling the oldest results if the budget is exceeded.
+
+        Args:
+            index (int): the index of the finished ExecNode in the plan
+            state (Optional[PlanState]): the state of the execution, the parked ExecNodes are made ready again.
+                Defaults to None.
+        """
+        if state is not None:
+            self.cancel(index, state)
+        id_ = self.plan.ids[index]
+        xn = self.exec_nodes[id_]
+        # the results of the setup ExecNodes are kept by the DAG anyway
+        if xn.setup or id_ not in self.results:
+            return
+        size = xn.memory if xn.memory is not None else estimate_size(self.results[id_])
+        self.sizes[id_] = size
+        self.in_memory += size
+        if self.in_memory > self.budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        # forget the results that were dropped in the meantime (see ResultsRelease)
+        for id_ in [id_ for id_ in self.sizes if id_ not in self.results]:
+            self.in_memory -= self.sizes.pop(id_)
+
+        for id_, size in list(self.sizes.items()):
+            if self.in_memory <= self.budget:
+                return
+            if size < MIN_SPILL_BYTES or id_ in self.pinned:
+                continue
+            try:
+                spilled = self.store.dump(self.results[id_])
+            except Exception as e:
+                logger.warning("The result of {} can't be spilled to disk: {!r}", id_, e)
+                self.pinned.add(id_)
+                continue
+            self.results.force_set(id_, spilled)
+            del self.sizes[id_]
+            self.in_memory -= size
+            if self.transport is not None:
+                self.transport.discard(id_)
+            logger.debug("Spilled the result of {} ({} bytes) to {}", id_, size, spilled.path)
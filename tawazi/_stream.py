@@ -0,0 +1,210 @@
+"""Module helper to stream the items produced by an ExecNode to its successors while they are produced.
+
+Every stream is fed by its own daemon thread through a bounded queue:
+the stages of a streaming pipeline work on different items at the same time,
+and a stage that is ahead of its consumer blocks until the consumer catches up (backpressure).
+"""
+import asyncio
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, List, NoReturn, Optional
+
+from tawazi.config import cfg
+from tawazi.errors import TawaziUsageError
+
+# marks the end of the items in the queue of a stream
+_END = object()
+# the waiting producer checks this often whether its stream was closed
+_POLL_INTERVAL = 0.1
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class Stream(Iterator[Any]):
+    """The items of an iterable, an iterator or an async iterator produced in a thread and consumed one by one.
+
+    A stream can only be consumed once: each of its items is received by a single consumer.
+
+    >>> stream = Stream("numbers", range(3))
+    >>> list(stream)
+    [0, 1, 2]
+    """
+
+    def __init__(
+        self,
+        id_: str,
+        items: Any,
+        on_error: Optional[Callable[[Exception], NoReturn]] = None,
+        maxsize: Optional[int] = None,
+    ) -> None:
+        """Start producing the items in a daemon thread.
+
+        Args:
+            id_ (str): identifier of the ExecNode producing the stream
+            items (Any): an iterable or an async iterable
+            on_error (Optional[Callable[[Exception], NoReturn]]): raises the error of the producer on the consumer's side.
+                Defaults to None (the error is raised as is).
+            maxsize (Optional[int]): the number of items produced in advance.
+                Defaults to None (`TAWAZI_STREAM_QUEUE_SIZE`).
+        """
+        self.id = id_
+        self._on_error = on_error
+        self._queue: "queue.Queue[Any]" = queue.Queue(
+            cfg.TAWAZI_STREAM_QUEUE_SIZE if maxsize is None else maxsize
+        )
+        self._closed = threading.Event()
+        self._done = False
+        self._iterated = False
+        self._thread = threading.Thread(
+            target=self._produce, args=(items,), name=f"stream-{id_}", daemon=True
+        )
+        self._thread.start()
+
+    def __repr__(self) -> str:
+        """Human representation of the stream."""
+        return f"{self.__class__.__name__} of {self.id}"
+
+    def __iter__(self) -> "Stream":
+        """Consume the stream.
+
+        Raises:
+            TawaziUsageError: if the stream is already being consumed.
+        """
+        if self._iterated:
+            raise TawaziUsageError(
+                f"the stream produced by {self.id} can only be consumed once, "
+                "it must be used by a single ExecNode or returned by the DAG"
+            )
+        self._iterated = True
+        return self
+
+    def __next__(self) -> Any:
+        """Wait for the next item.
+
+        Raises:
+            StopIteration: when all the items are consumed.
+        """
+        if self._done:
+            raise StopIteration
+        item = self._queue.get()
+        if item is _END:
+            self._done = True
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self._done = True
+            if self._on_error is not None and isinstance(item.error, Exception):
+                self._on_error(item.error)
+            raise item.error
+        return item
+
+    def close(self) -> None:
+        """Stop producing the items, the streams this stream is computed from are closed too."""
+        self._closed.set()
+        self._done = True
+        # unblock the producer waiting for room in the queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, item: Any) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, items: Any) -> None:
+        try:
+            if hasattr(items, "__aiter__"):
+                asyncio.run(self._aproduce(items))
+            else:
+                iterator = iter(items)
+                try:
+                    for item in iterator:
+                        if not self._put(item):
+                            return
+                finally:
+                    close = getattr(iterator, "close", None)
+                    if close is not None:
+                        close()
+        except BaseException as e:
+            self._put(_Failure(e))
+            return
+        self._put(_END)
+
+    async def _aproduce(self, items: Any) -> None:
+        async for item in items:
+            # the event loop of this thread has nothing else to do while the consumer is behind
+            if not self._put(item):
+                return
+
+
+def map_items(
+    id_: str,
+    function: Callable[..., Any],
+    args: List[Any],
+    kwargs: Dict[str, Any],
+    on_error: Optional[Callable[[Exception], NoReturn]] = None,
+) -> Optional[Stream]:
+    """Apply a function to every item of the streams among its arguments.
+
+    The streams are consumed together: the n-th call receives the n-th item of each of them,
+    the other arguments are passed as is to every call.
+
+    >>> doubled = map_items("double", lambda x, factor: x * factor, [Stream("numbers", range(3)), 2], {})
+    >>> list(doubled)
+    [0, 2, 4]
+
+    Args:
+        id_ (str): identifier of the ExecNode applying the function
+        function (Callable[..., Any]): a function or a coroutine function
+        args (List[Any]): the positional arguments
+        kwargs (Dict[str, Any]): the keyword arguments
+        on_error (Optional[Callable[[Exception], NoReturn]]): look at `Stream`
+
+    Returns:
+        Optional[Stream]: the stream of the results, None if none of the arguments is a stream.
+    """
+    streams = [arg for arg in [*args, *kwargs.values()] if isinstance(arg, Stream)]
+    if not streams:
+        return None
+    iterators = [iter(stream) for stream in streams]
+
+    def calls() -> Iterator[Any]:
+        try:
+            while True:
+                # not zip: it would consume the streams a second time
+                try:
+                    items = [next(iterator) for iterator in iterators]
+                except StopIteration:
+                    return
+                next_items = iter(items)
+                call_args = [next(next_items) if isinstance(a, Stream) else a for a in args]
+                call_kwargs = {
+                    k: next(next_items) if isinstance(v, Stream) else v for k, v in kwargs.items()
+                }
+                yield call_args, call_kwargs
+        finally:
+            for stream in streams:
+                stream.close()
+
+    if asyncio.iscoroutinefunction(function):
+
+        async def acall_all() -> Any:
+            for call_args, call_kwargs in calls():
+                yield await function(*call_args, **call_kwargs)
+
+        return Stream(id_, acall_all(), on_error)
+
+    def call_all() -> Iterator[Any]:
+        for call_args, call_kwargs in calls():
+            yield function(*call_args, **call_kwargs)
+
+    return Stream(id_, call_all(), on_error)
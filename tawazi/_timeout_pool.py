@@ -0,0 +1,92 @@
+"""Module helper to run the threaded ExecNodes that have a timeout in a bounded pool of daemon threads."""
+import functools
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Tuple
+
+_Task = Optional[Tuple["Future[Any]", Callable[[], Any]]]
+
+
+class TimeoutPool:
+    """Pool of daemon threads in which the threaded ExecNodes with a timeout run.
+
+    A thread can't be interrupted: an ExecNode that timed out keeps its thread until its function returns.
+    The threads are daemons so that such an ExecNode never prevents the interpreter from exiting,
+    and there are at most `max_workers` of them: the ExecNodes submitted while they are all busy wait for one
+    to be free, their timeout is already running in the meantime.
+
+    >>> pool = TimeoutPool(max_workers=2)
+    >>> pool.submit(sum, [1, 2]).result()
+    3
+    >>> pool.shutdown()
+    """
+
+    def __init__(self, max_workers: int, name: str = "timeout") -> None:
+        """Create the pool, the threads are only started when needed.
+
+        Args:
+            max_workers (int): the maximum number of threads
+            name (str): the prefix of the names of the threads. Defaults to "timeout".
+        """
+        self.max_workers = max_workers
+        self.name = name
+        self._lock = threading.Lock()
+        self._tasks: "queue.SimpleQueue[_Task]" = queue.SimpleQueue()
+        # released every time a thread is done with a task, similarly to ThreadPoolExecutor
+        self._idle = threading.Semaphore(0)
+        self._threads = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Run a function in a thread of the pool.
+
+        Args:
+            fn (Callable[..., Any]): the function
+            *args (Any): its positional arguments
+            **kwargs (Any): its keyword arguments
+
+        Returns:
+            Future[Any]: the future of the call, cancelling it before it starts skips the call.
+        """
+        future: "Future[Any]" = Future()
+        with self._lock:
+            self._tasks.put((future, functools.partial(fn, *args, **kwargs)))
+            if not self._idle.acquire(blocking=False) and self._threads < self.max_workers:
+                self._threads += 1
+                threading.Thread(
+                    target=_work,
+                    args=(self._tasks, self._idle),
+                    name=f"{self.name}_{self._threads}",
+                    daemon=True,
+                ).start()
+        return future
+
+    def shutdown(self) -> None:
+        """Stop the threads without waiting for them, the busy ones stop once their function returns.
+
+        New threads are started if the pool is used again.
+        """
+        with self._lock:
+            for _ in range(self._threads):
+                self._tasks.put(None)
+            self._tasks = queue.SimpleQueue()
+            self._idle = threading.Semaphore(0)
+            self._threads = 0
+
+
+def _work(tasks: "queue.SimpleQueue[_Task]", idle: threading.Semaphore) -> None:
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        future, call = task
+        if future.set_running_or_notify_cancel():
+            try:
+                result = call()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        # don't keep the arguments of the last call alive while waiting
+        del task, future, call
+        idle.release()
@@ -1,5 +1,7 @@
 """configuration parameters for Tawazi."""
 
+from typing import Optional
+
 import pydantic
 from packaging.version import Version
 
@@ -44,6 +46,45 @@ class Config(BaseSettings):
     # choose the default Resource to use to execute the ExecNodes
     TAWAZI_DEFAULT_RESOURCE: Resource = Resource.thread
 
+    # exchange the large buffers (numpy arrays, bytearrays etc.) of the arguments and results
+    # of the ExecNodes executed in processes through shared memory instead of copying them through pipes.
+    # Only the buffers bigger than TAWAZI_SHARED_MEMORY_MIN_BYTES are placed in shared memory.
+    TAWAZI_SHARED_MEMORY: bool = False
+    TAWAZI_SHARED_MEMORY_MIN_BYTES: int = 64 * 1024
+
+    # maximum number of ready threaded ExecNodes executed one after the other by a single task of the thread pool.
+    # Batching amortizes the cost of submitting many tiny independent ExecNodes. 1 disables batching.
+    TAWAZI_BATCH_SIZE: int = 1
+    # target duration in milliseconds of a batch: the ready ExecNodes are batched as long as the sum of their durations
+    # (declared or measured like for TAWAZI_CRITICAL_PATH) stays below it.
+    # The ExecNodes without a known duration are only limited by TAWAZI_BATCH_SIZE.
+    TAWAZI_BATCH_TARGET_MS: float = 1.0
+
+    # prioritize the ready ExecNodes by their upward rank (the duration of the longest path to the end of the DAG)
+    # instead of their compound priority, so that the critical path starts first.
+    # The durations are declared with `DAG.config_from_dict({"durations": ...})`
+    # and measured during the executions when TAWAZI_PROFILE_ALL_NODES is enabled.
+    TAWAZI_CRITICAL_PATH: bool = False
+
+    # number of threads the threaded ExecNodes that timed out can keep, on top of the `max_concurrency` threads
+    # running the ExecNodes with a timeout. A thread can't be interrupted: it is only free once its function returns.
+    TAWAZI_TIMED_OUT_THREADS: int = 8
+
+    # drop the result of an ExecNode from the results of the execution as soon as all its successors are done.
+    # The results returned by the DAG, the results of setup ExecNodes and of ExecNodes with `retain=True` are kept.
+    TAWAZI_RELEASE_RESULTS: bool = False
+
+    # directory where the results are spilled when a DAG exceeds its `memory_budget`.
+    # None uses the default temporary directory.
+    TAWAZI_SPILL_DIR: Optional[str] = None
+
+    # number of items a streaming ExecNode produces in advance of its consumer (see `@xn(stream=True)`)
+    TAWAZI_STREAM_QUEUE_SIZE: int = 16
+
+    # stop an execution as soon as one of its ExecNodes raises: the ExecNodes that didn't start yet are cancelled
+    # and the running ones are signaled through their `tawazi.cancel_token()`.
+    TAWAZI_FAIL_FAST: bool = False
+
     # Logger settings
     LOGURU_LEVEL: str = Field(default="PROD", env="TAWAZI_LOGGER_LEVEL")  # type: ignore[call-arg]
     LOGURU_BACKTRACE: bool = Field(default=False, env="TAWAZI_LOGGER_BT")  # type: ignore[call-arg]
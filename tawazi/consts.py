@@ -124,6 +124,11 @@ class Resource(str, Enum):
     1. "main-thread": Launch the ExecNode inside the main thread, directly inside the main scheduler.
     2. "thread": Launch the ExecNode in a thread (Default)
     3. "async-thread": Launch the ExecNode in an async thread and await it
+    4. "process": Launch the ExecNode in a process of a ProcessPoolExecutor owned by the DAG.
+        Its function, arguments and result must be picklable.
+    5. "sub-interpreter": Launch the ExecNode in a sub-interpreter of an InterpreterPoolExecutor owned by the DAG.
+        Same constraints as "process", in addition, the modules it uses must support sub-interpreters.
+        Falls back to "process" before python 3.14.
 
     Notice that when "main-thread" is used, some of the scheduler functionalities stop working as previously expected:
     1. No new ExecNode will be launched during the execution of the corresponding ExecNode
@@ -135,8 +140,8 @@ class Resource(str, Enum):
     main_thread: str = "main-thread"
     thread: str = "thread"
     async_thread: str = "async-thread"
-    # process: str = "process"  # Reserved for the future
-    # sub_interpreter: str = "sub-interpreter"  # Reserved for the future
+    process: str = "process"
+    sub_interpreter: str = "sub-interpreter"
 
 
 # ImmutableType = Union[str, int, float, bool, Tuple[ImmutableType]]  # doesn't work because of cyclic typing
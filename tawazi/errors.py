@@ -33,6 +33,12 @@ class TawaziUsageError(TawaziError):
     pass
 
 
+class TawaziTimeoutError(TawaziError):
+    """Raised when an ExecNode without fallback or the whole DAG doesn't finish in time."""
+
+    pass
+
+
 class InvalidExecNodeCallError(TawaziError):
     """Raised when a ExecNode is called outside DAG definition (this will change in the future)."""
 
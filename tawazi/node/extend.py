@@ -2,13 +2,14 @@
 from typing import Any, Callable
 
 from tawazi.config import cfg
-from tawazi.consts import RVXN, P
+from tawazi.consts import RVXN, P, Resource
 
 from .node import LazyExecNode
 from .uxn import UsageExecNode
 
 
 def _xn(func: Callable[P, RVXN]) -> LazyExecNode[P, RVXN]:
+    # operators are too cheap to be worth a round trip to the thread pool: they run on the scheduler's thread
     return LazyExecNode(
         exec_function=func,
         priority=0,
@@ -17,7 +18,7 @@ def _xn(func: Callable[P, RVXN]) -> LazyExecNode[P, RVXN]:
         tag=None,
         setup=False,
         unpack_to=None,
-        resource=cfg.TAWAZI_DEFAULT_RESOURCE,
+        resource=Resource.main_thread,
     )
 
 
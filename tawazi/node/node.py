@@ -1,5 +1,6 @@
 """Module describing ExecNode Class and subclasses (The basic building Block of a DAG."""
 
+import asyncio
 import dataclasses
 import functools
 import inspect
@@ -9,11 +10,15 @@ from dataclasses import dataclass, field
 from functools import partial
 from threading import Lock
 from types import MethodType
-from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Generic, List, NoReturn, Optional, Tuple, Type, Union
 
 from loguru import logger
 
 from tawazi._helpers import StrictDict, make_raise_arg_error
+from tawazi._memoize import Memo, MemoInfo
+from tawazi._micro_batch import MicroBatcher
+from tawazi._process import SUB_INTERPRETERS_AVAILABLE, make_target
+from tawazi._stream import Stream, map_items
 from tawazi.config import cfg
 from tawazi.consts import (
     ARG_NAME_ACTIVATE,
@@ -26,6 +31,7 @@ from tawazi.consts import (
     USE_SEP_END,
     USE_SEP_START,
     Identifier,
+    NoVal,
     P,
     Resource,
     Tag,
@@ -100,6 +106,38 @@ class ExecNode:
         unpack_to (Optional[int]): if not None, this ExecNode's execution must return unpacked results corresponding
             to the given value
         resource (str): The resource to use to execute this ExecNode. Defaults to "thread".
+            Coroutine functions (`async def`) are awaited on the event loop of the DAG whatever the resource is.
+        pool (Optional[str]): name of the pool of the DAG (see `DAG.pools`) this ExecNode takes capacity from.
+            Defaults to None (only limited by `max_concurrency`).
+        cost (int): capacity of the pool held by this ExecNode while it runs. Defaults to 1.
+        timeout (Optional[float]): maximum number of seconds between the submission of this ExecNode
+            and the end of its execution. Defaults to None (no timeout).
+            Not enforced for the "main-thread" resource.
+        fallback (Any): result of this ExecNode if it times out, its successors run right away with it.
+            Defaults to NoVal, in which case a timeout raises a TawaziTimeoutError.
+        retries (int): number of times this ExecNode is executed again if it fails. Defaults to 0.
+        backoff (float): base delay in seconds before executing a failed ExecNode again.
+            The n-th retry waits a random delay between 0 and `backoff * 2 ** (n - 1)` seconds. Defaults to 0.
+        retry_on (Tuple[Type[Exception], ...]): the errors after which this ExecNode is executed again.
+            Defaults to (Exception,).
+        retain (bool): keep the result of this ExecNode until the end of the execution
+            when `TAWAZI_RELEASE_RESULTS` is enabled. Defaults to False.
+        memory (Optional[int]): number of bytes taken by the result of this ExecNode, used by the memory budget
+            of the DAG (see `DAG.memory_budget`). Defaults to None (estimated once the result is computed).
+        stream (bool): stream the items of the iterable or async iterable returned by this ExecNode
+            to its successors while they are produced. Defaults to False.
+        per_item (bool): call the function of this ExecNode once per item of the streams among its arguments,
+            its results are streamed to its successors. Defaults to False.
+        batchable (bool): gather the calls of this ExecNode made by concurrent executions of the DAG
+            into a single call of its function, which receives lists of arguments and returns a list of outputs.
+            Defaults to False.
+        max_batch (int): maximum number of calls gathered in a batch. Defaults to 32.
+        max_wait_ms (float): maximum number of milliseconds the first call of a batch waits for others. Defaults to 5.
+        memoize (bool): reuse the result of a previous call of this ExecNode with the same arguments,
+            across the executions of its DAG. Defaults to False.
+        maxsize (Optional[int]): maximum number of memoized results, the least recently used is evicted first.
+            Defaults to 128, None for no limit.
+        ttl (Optional[float]): number of seconds a memoized result is reused. Defaults to None (no expiry).
 
     Raises:
         ValueError: if setup and debug are both True.
@@ -114,6 +152,23 @@ class ExecNode:
     setup: bool = False
     unpack_to: Optional[int] = None
     resource: Resource = cfg.TAWAZI_DEFAULT_RESOURCE
+    pool: Optional[str] = None
+    cost: int = 1
+    timeout: Optional[float] = None
+    fallback: Any = NoVal
+    retries: int = 0
+    backoff: float = 0.0
+    retry_on: Tuple[Type[Exception], ...] = (Exception,)
+    retain: bool = False
+    memory: Optional[int] = None
+    stream: bool = False
+    per_item: bool = False
+    batchable: bool = False
+    max_batch: int = 32
+    max_wait_ms: float = 5.0
+    memoize: bool = False
+    maxsize: Optional[int] = 128
+    ttl: Optional[float] = None
     call_location: str = ""
     call_location_frame: int = 2
 
@@ -122,6 +177,11 @@ class ExecNode:
     # TODO: make this a list of UsageExecNode to implement the And operation for the twz_active in SUBdag and in SUPdag
     active: Optional[UsageExecNode] = None
 
+    # the pending calls of a batchable ExecNode, never copied (see `MicroBatcher`)
+    _batcher: Optional[MicroBatcher] = field(init=False, repr=False, compare=False, default=None)
+    # the memoized results, shared by the executions of the DAG but not by its copies
+    _memo: Optional[Memo] = field(init=False, repr=False, compare=False, default=None)
+
     def __post_init__(self) -> None:
         """Post init to validate attributes."""
         if isinstance(self.exec_function, partial):
@@ -150,6 +210,118 @@ class ExecNode:
         if not isinstance(self.resource, Resource):
             raise ValueError(f"resource must be of type {Resource}, provided {type(self.resource)}")
 
+        if not (self.pool is None or isinstance(self.pool, str)):
+            raise ValueError(f"pool must be a str or None, provided {type(self.pool)}")
+
+        if not isinstance(self.cost, int) or self.cost < 1:
+            raise ValueError(f"cost must be a positive int, provided {self.cost!r}")
+
+        if self.timeout is not None and (
+            isinstance(self.timeout, bool)
+            or not isinstance(self.timeout, (int, float))
+            or self.timeout <= 0
+        ):
+            raise ValueError(
+                f"timeout must be a positive number or None, provided {self.timeout!r}"
+            )
+
+        if isinstance(self.retries, bool) or not isinstance(self.retries, int) or self.retries < 0:
+            raise ValueError(f"retries must be a non negative int, provided {self.retries!r}")
+
+        if (
+            isinstance(self.backoff, bool)
+            or not isinstance(self.backoff, (int, float))
+            or self.backoff < 0
+        ):
+            raise ValueError(f"backoff must be a non negative number, provided {self.backoff!r}")
+
+        if isinstance(self.retry_on, type):
+            object.__setattr__(self, "retry_on", (self.retry_on,))
+        if not isinstance(self.retry_on, tuple) or not all(
+            isinstance(error, type) and issubclass(error, Exception) for error in self.retry_on
+        ):
+            raise ValueError(
+                f"retry_on must be an Exception type or a tuple of them, provided {self.retry_on!r}"
+            )
+
+        if self.memory is not None and (
+            isinstance(self.memory, bool) or not isinstance(self.memory, int) or self.memory < 1
+        ):
+            raise ValueError(f"memory must be a positive int or None, provided {self.memory!r}")
+
+        if (self.stream or self.per_item) and self.resource in (
+            Resource.process,
+            Resource.sub_interpreter,
+        ):
+            raise TawaziUsageError(
+                f"ExecNode {self.id} can't be executed in a {self.resource.value} "
+                "because its items are streamed through the memory of the main process."
+            )
+
+        if (
+            isinstance(self.max_batch, bool)
+            or not isinstance(self.max_batch, int)
+            or self.max_batch < 1
+        ):
+            raise ValueError(f"max_batch must be a positive int, provided {self.max_batch!r}")
+
+        if (
+            isinstance(self.max_wait_ms, bool)
+            or not isinstance(self.max_wait_ms, (int, float))
+            or self.max_wait_ms < 0
+        ):
+            raise ValueError(
+                f"max_wait_ms must be a non negative number, provided {self.max_wait_ms!r}"
+            )
+
+        if self.batchable:
+            if self.is_coroutine or self.resource in (Resource.process, Resource.sub_interpreter):
+                raise TawaziUsageError(
+                    f"ExecNode {self.id} can't be batchable: its calls are gathered in the threads "
+                    "of the executions, coroutines and workers of other processes are not supported."
+                )
+            object.__setattr__(
+                self, "_batcher", MicroBatcher(self.max_batch, self.max_wait_ms / 1000)
+            )
+
+        if self.maxsize is not None and (
+            isinstance(self.maxsize, bool) or not isinstance(self.maxsize, int) or self.maxsize < 1
+        ):
+            raise ValueError(f"maxsize must be a positive int or None, provided {self.maxsize!r}")
+
+        if self.ttl is not None and (
+            isinstance(self.ttl, bool) or not isinstance(self.ttl, (int, float)) or self.ttl <= 0
+        ):
+            raise ValueError(f"ttl must be a positive number or None, provided {self.ttl!r}")
+
+        if self.memoize:
+            if self.resource in (Resource.process, Resource.sub_interpreter):
+                raise TawaziUsageError(
+                    f"ExecNode {self.id} can't be memoized in a {self.resource.value}: "
+                    "its results are kept in the memory of the main process."
+                )
+            object.__setattr__(self, "_memo", Memo(self.maxsize, self.ttl))
+
+        if self.is_coroutine and self.resource in (Resource.process, Resource.sub_interpreter):
+            raise TawaziUsageError(
+                f"ExecNode {self.id} can't be executed in a {self.resource.value} "
+                "because its function is a coroutine function. "
+                "Coroutine functions are awaited on the event loop of the DAG."
+            )
+
+        if self.resource in (Resource.process, Resource.sub_interpreter):
+            # fail early if the function can't be sent to a worker process
+            make_target(self.id, self.exec_function)
+
+        if self.resource == Resource.sub_interpreter and not SUB_INTERPRETERS_AVAILABLE:
+            warnings.warn(
+                RuntimeWarning(
+                    f"Sub-interpreters require python 3.14 or later, "
+                    f"ExecNode {self.id} will be executed in a process instead."
+                ),
+                stacklevel=2,
+            )
+
         if any(not isinstance(arg, UsageExecNode) for arg in self.args):
             raise ValueError("args must be of type UsageExecNode")
 
@@ -162,6 +334,29 @@ class ExecNode:
                 f"The node {self.id} can't be a setup and a debug node at the same time."
             )
 
+        if self.stream and self.per_item:
+            raise ValueError(
+                f"The node {self.id} can't be a stream and a per_item node at the same time, "
+                "the results of a per_item node are already streamed."
+            )
+
+        # a stream can only be consumed once, it can't be kept between executions
+        if self.setup and (self.stream or self.per_item):
+            raise ValueError(f"The setup node {self.id} can't be a stream or a per_item node.")
+
+        if self.unpack_to is not None and (self.stream or self.per_item):
+            raise ValueError(f"The node {self.id} can't unpack the items of a stream.")
+
+        if self.batchable and (self.stream or self.per_item or self.setup):
+            raise ValueError(
+                f"The node {self.id} can't be batchable and a stream, a per_item or a setup node."
+            )
+
+        if self.memoize and (self.stream or self.per_item or self.setup):
+            raise ValueError(
+                f"The node {self.id} can't be memoized and a stream, a per_item or a setup node."
+            )
+
         if self.unpack_to is not None:
             if not isinstance(self.unpack_to, int):
                 raise ValueError(
@@ -211,6 +406,11 @@ class ExecNode:
 
         return deps
 
+    @property
+    def is_coroutine(self) -> bool:
+        """Whether the function of this ExecNode is a coroutine function (`async def`)."""
+        return asyncio.iscoroutinefunction(self.exec_function)
+
     def execute(self, results: Dict[Identifier, Any], profiles: Dict[Identifier, Profile]) -> Any:
         """Execute the ExecNode inside of a DAG.
 
@@ -225,13 +425,7 @@ class ExecNode:
         profiles[self.id] = Profile(cfg.TAWAZI_PROFILE_ALL_NODES)
 
         # 1. prepare args and kwargs for usage:
-        args = [uxn.result(results) for uxn in self.args]
-        kwargs = {
-            # kwarg might be executed in a dag in dag "which will contain "."
-            key.split(".")[-1]: uxn.result(results)
-            for key, uxn in self.kwargs.items()
-            if key not in RESERVED_KWARGS
-        }
+        args, kwargs = self.resolve_args(lambda uxn: uxn.result(results))
 
         # 1. pre-
         # 1.1 prepare the profiling
@@ -239,19 +433,127 @@ class ExecNode:
             # 2 post-
             # 2.1 write the result
             try:
-                results[self.id] = self.exec_function(*args, **kwargs)
+                results[self.id] = self._call(args, kwargs)
             except Exception as e:
-                if self.call_location:
-                    raise TawaziError(
-                        f"Error occurred while executing ExecNode {self.id} at {self.call_location}"
-                    ) from e
-
-                raise e
+                self.raise_execution_error(e)
 
         # 3. useless return value
         logger.debug("Finished executing {} with task {}", self.id, self.exec_function)
         return results[self.id]
 
+    async def aexecute(
+        self, results: Dict[Identifier, Any], profiles: Dict[Identifier, Profile]
+    ) -> Any:
+        """Await the coroutine function of the ExecNode on the running event loop.
+
+        Args:
+            results (Dict[Identifier, Any]): A shared dictionary containing the results of other ExecNodes in the DAG;
+            profiles (Dict[Identifier, Profile]): A dictionary containing the profiles of the execution of all other ExecNodes in the DAG
+
+        Returns:
+            the result of the execution of the current ExecNode
+        """
+        logger.debug("Start awaiting {} with task {}", self.id, self.exec_function)
+        profiles[self.id] = Profile(cfg.TAWAZI_PROFILE_ALL_NODES)
+
+        args, kwargs = self.resolve_args(lambda uxn: uxn.result(results))
+
+        with profiles[self.id]:
+            try:
+                stream = self._map_items(args, kwargs)
+                if stream is not None:
+                    results[self.id] = stream
+                elif self.stream:
+                    results[self.id] = self._stream(await self.exec_function(*args, **kwargs))
+                elif self._memo is not None:
+                    results[self.id] = await self._memo.acall(
+                        args, kwargs, lambda: self.exec_function(*args, **kwargs)
+                    )
+                else:
+                    results[self.id] = await self.exec_function(*args, **kwargs)
+            except Exception as e:
+                self.raise_execution_error(e)
+
+        logger.debug("Finished awaiting {} with task {}", self.id, self.exec_function)
+        return results[self.id]
+
+    def _call(self, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        if self._memo is not None:
+            return self._memo.call(args, kwargs, lambda: self._call_function(args, kwargs))
+        return self._call_function(args, kwargs)
+
+    def _call_function(self, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        stream = self._map_items(args, kwargs)
+        if stream is not None:
+            return stream
+        if self.stream:
+            return self._stream(self.exec_function(*args, **kwargs))
+        if self._batcher is not None:
+            return self._batcher.call(self.exec_function, args, kwargs)
+        return self.exec_function(*args, **kwargs)
+
+    def cache_info(self) -> MemoInfo:
+        """Get the hits, the misses and the size of the memoized results of this ExecNode.
+
+        Raises:
+            TawaziUsageError: if this ExecNode is not memoized
+
+        Returns:
+            MemoInfo: the statistics of the memoized results
+        """
+        if self._memo is None:
+            raise TawaziUsageError(f"ExecNode {self.id} is not memoized, use @xn(memoize=True)")
+        return self._memo.info()
+
+    def cache_clear(self) -> None:
+        """Forget the memoized results of this ExecNode and reset its statistics."""
+        if self._memo is not None:
+            self._memo.clear()
+
+    def _map_items(self, args: List[Any], kwargs: Dict[str, Any]) -> Optional[Stream]:
+        if not self.per_item:
+            return None
+        return map_items(self.id, self.exec_function, args, kwargs, self.raise_execution_error)
+
+    def _stream(self, items: Any) -> Stream:
+        return Stream(self.id, items, self.raise_execution_error)
+
+    def resolve_args(
+        self, get_value: Callable[[UsageExecNode], Any]
+    ) -> Tuple[List[Any], Dict[str, Any]]:
+        """Get the args and kwargs to pass to the function of this ExecNode.
+
+        Args:
+            get_value (Callable[[UsageExecNode], Any]): gets the value of a dependency
+
+        Returns:
+            Tuple[List[Any], Dict[str, Any]]: the args and kwargs
+        """
+        args = [get_value(uxn) for uxn in self.args]
+        kwargs = {
+            # kwarg might be executed in a dag in dag "which will contain "."
+            key.split(".")[-1]: get_value(uxn)
+            for key, uxn in self.kwargs.items()
+            if key not in RESERVED_KWARGS
+        }
+        return args, kwargs
+
+    def raise_execution_error(self, e: Exception) -> NoReturn:
+        """Raise the error of a failed execution of this ExecNode.
+
+        Args:
+            e (Exception): the error raised by the function of this ExecNode
+
+        Raises:
+            TawaziError: pointing to the location where the ExecNode was called if it is known
+        """
+        if self.call_location:
+            raise TawaziError(
+                f"Error occurred while executing ExecNode {self.id} at {self.call_location}"
+            ) from e
+
+        raise e
+
     def get_call_location(self) -> str:
         """Get Location where ExecNode was called."""
         frame = inspect.currentframe()
@@ -266,8 +568,16 @@ class ExecNode:
         frame_info = inspect.getframeinfo(frame)
         return f"{frame_info.filename}:{frame_info.lineno}"
 
-    def _conf_to_values(self, conf: Dict[str, Any]) -> Dict[str, Any]:
+    def _init_values(self) -> Dict[str, Any]:
+        """Deep copy the values of the fields that are passed to the constructor of the ExecNode."""
         values = dataclasses.asdict(self)
+        for f in dataclasses.fields(self):
+            if not f.init:
+                del values[f.name]
+        return values
+
+    def _conf_to_values(self, conf: Dict[str, Any]) -> Dict[str, Any]:
+        values = self._init_values()
         # copy the values of ExecNode that are also dataclass
         values["args"] = self.args
         values["kwargs"] = self.kwargs
@@ -275,8 +585,37 @@ class ExecNode:
         # modify the values of ExecNode that should be modified
         values["is_sequential"] = conf.get("is_sequential", self.is_sequential)
         values["priority"] = conf.get("priority", self.priority)
+        values["pool"] = conf.get("pool", self.pool)
+        values["cost"] = conf.get("cost", self.cost)
+        values["timeout"] = conf.get("timeout", self.timeout)
+        values["retries"] = conf.get("retries", self.retries)
+        values["backoff"] = conf.get("backoff", self.backoff)
+        values["retain"] = conf.get("retain", self.retain)
+        values["memory"] = conf.get("memory", self.memory)
+        values["max_batch"] = conf.get("max_batch", self.max_batch)
+        values["max_wait_ms"] = conf.get("max_wait_ms", self.max_wait_ms)
+        values["maxsize"] = conf.get("maxsize", self.maxsize)
+        values["ttl"] = conf.get("ttl", self.ttl)
         return values  # ignore: typing[no-any-return]
 
+    def _reconfigure(self, conf: Dict[str, Any]) -> "ExecNode":
+        """Make a copy of this ExecNode with the parameters changed by a config.
+
+        The pending batched calls and the memoized results are kept unless the config changes their parameters.
+
+        Args:
+            conf: the config of the ExecNode
+
+        Returns:
+            the reconfigured ExecNode
+        """
+        xn = type(self)(**self._conf_to_values(conf))
+        if (xn.max_batch, xn.max_wait_ms) == (self.max_batch, self.max_wait_ms):
+            object.__setattr__(xn, "_batcher", self._batcher)
+        if (xn.maxsize, xn.ttl) == (self.maxsize, self.ttl):
+            object.__setattr__(xn, "_memo", self._memo)
+        return xn
+
 
 class ReturnExecNode(ExecNode):
     """ExecNode corresponding to a constant Return value of a DAG."""
@@ -356,11 +695,43 @@ class LazyExecNode(ExecNode, Generic[P, RVXN]):
     The original function is kept to be called during the scheduling phase when calling the DAG.
     """
 
+    # only the LazyExecNode made by @xn is flagged, not its copies used by the DAGs
+    _decorated: bool = False
+
     def __post_init__(self) -> None:
         """Post init to validate attributes."""
         super().__post_init__()
         self._validate_dependencies()
 
+    def cache_info(self) -> MemoInfo:
+        """Get the hits, the misses and the size of the memoized results of this ExecNode.
+
+        Raises:
+            TawaziUsageError: if this ExecNode is not memoized, or if it is the decorated function:
+                every DAG memoizes the results of its own copy.
+
+        Returns:
+            MemoInfo: the statistics of the memoized results
+        """
+        self._check_memo_owner()
+        return super().cache_info()
+
+    def cache_clear(self) -> None:
+        """Forget the memoized results of this ExecNode and reset its statistics.
+
+        Raises:
+            TawaziUsageError: if this ExecNode is the decorated function: every DAG memoizes the results of its own copy.
+        """
+        self._check_memo_owner()
+        super().cache_clear()
+
+    def _check_memo_owner(self) -> None:
+        if self._decorated and self.memoize:
+            raise TawaziUsageError(
+                f"The results of ExecNode {self.id} are memoized by the DAGs using it, "
+                f"use dag.exec_nodes[{self.id!r}] instead"
+            )
+
     # in reality it returns UsageExecNode:
     def __call__(self, *args: P.args, **kwargs: P.kwargs) -> RVXN:
         """Record the dependencies in a global variable to be called later in DAG.
@@ -392,7 +763,7 @@ class LazyExecNode(ExecNode, Generic[P, RVXN]):
         # 1.1 if ExecNode is used multiple times, <<usage_count>> is appended to its ID
         id_ = _lazy_xn_id(self.id, count_occurrences(self.id, exec_nodes))
         # 1.1 Construct a new LazyExecNode corresponding to the current call
-        values = dataclasses.asdict(self)
+        values = self._init_values()
         # force deepcopying instead of the default behavior of asdict: recursively apply asdict to dataclasses!
         values["exec_function"] = deepcopy(self.exec_function)
         values["id_"] = id_
@@ -7,6 +7,7 @@ from typing import Any, Dict, List, NoReturn, Tuple, Union
 
 from typing_extensions import Self
 
+from tawazi._spill import Spilled
 from tawazi.consts import Identifier, NoValType
 
 # NOTE: None is hashable! In theory it can be used as a key in a dict!
@@ -59,7 +60,11 @@ class UsageExecNode:
         #     raise TawaziTypeError(f"{xn} didn't run, hence its result is not indexable. Check your DAG's config")
 
         if self.id in results:
-            return reduce(lambda obj, key: obj.__getitem__(key), self.key, results[self.id])
+            result = results[self.id]
+            # the result was spilled to disk to keep the execution within its memory budget
+            if isinstance(result, Spilled):
+                result = result.load()
+            return reduce(lambda obj, key: obj.__getitem__(key), self.key, result)
         return None
 
     def __bool__(self) -> NoReturn:
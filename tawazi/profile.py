@@ -1,6 +1,6 @@
 """Module helper to profile execution time of Tawazi ExecNodes."""
 from time import perf_counter, process_time, thread_time
-from typing import Any
+from typing import Any, List
 
 
 class Profile:
@@ -34,6 +34,8 @@ class Profile:
         self.process_exec_time = 0.0
         # [s.] (thread_time()) system & user time consumed by the thread
         self.thread_exec_time = 0.0
+        # profiles of the failed attempts that preceded this one when the ExecNode is retried
+        self.failed_attempts: List["Profile"] = []
 
     def __enter__(self) -> "Profile":
         """Context manager entry point.
@@ -16,6 +16,20 @@ async def test_sync_in_async() -> None:
     def pipeline() -> str:
         return sync_xn()
 
+    # no ExecNode needs an event loop: the DAG doesn't start one
+    assert pipeline() == "sync"
+
+
+@pytest.mark.asyncio
+async def test_sync_with_async_thread_in_async() -> None:
+    @xn(resource=Resource.async_thread)
+    def sync_xn() -> Literal["sync"]:
+        return "sync"
+
+    @dag
+    def pipeline() -> str:
+        return sync_xn()
+
     with pytest.warns(RuntimeWarning, match="was never awaited"):
         with pytest.raises(RuntimeError, match="cannot be called from a running event loop"):
             assert pipeline() == "sync"
@@ -81,3 +95,25 @@ async def test_make_async_executor() -> None:
     stateful_pipeline = pipeline_sleep.executor()
     assert isinstance(stateful_pipeline, AsyncDAGExecution)
     assert await stateful_pipeline(0.1) == "slept"
+
+
+@xn(resource=Resource.thread)
+def threaded_sleep(t: float) -> str:
+    sleep(t)
+    return "slept"
+
+
+@dag(is_async=True)
+def pipeline_threaded_sleep(t: float) -> str:
+    return threaded_sleep(t)
+
+
+@pytest.mark.asyncio
+async def test_threaded_exec_node_does_not_block_event_loop() -> None:
+    t0 = time()
+    assert await asyncio.gather(pipeline_threaded_sleep(0.1), asyncio.sleep(0.1, result="toes")) == [  # type: ignore[comparison-overlap]
+        "slept",
+        "toes",
+    ]
+    duration = time() - t0
+    assert duration < 0.2
@@ -0,0 +1,155 @@
+import asyncio
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from pytest_mock import MockerFixture
+from tawazi import cfg, dag, xn
+from tawazi._dag.helpers import execute_batch
+from tawazi.errors import TawaziError
+from tawazi.profile import Profile
+
+WIDTH = 40
+
+
+@xn
+def root(x: int) -> int:
+    return x
+
+
+@xn
+def feature(x: int, i: int) -> int:
+    return x + i
+
+
+@xn
+def failing_feature(x: int, i: int) -> int:
+    if i == 5:
+        raise ValueError("failed in batch")
+    return x + i
+
+
+@xn
+def collect(*features: int) -> List[int]:
+    return list(features)
+
+
+@dag(max_concurrency=2)
+def fan_out(x: int) -> List[int]:
+    r = root(x)
+    return collect(*[feature(r, i) for i in range(WIDTH)])
+
+
+@dag(max_concurrency=2, is_async=True)
+def async_fan_out(x: int) -> List[int]:
+    r = root(x)
+    return collect(*[feature(r, i) for i in range(WIDTH)])
+
+
+@dag(max_concurrency=2)
+def failing_fan_out(x: int) -> List[int]:
+    r = root(x)
+    return collect(*[failing_feature(r, i) for i in range(10)])
+
+
+@pytest.fixture(autouse=True)
+def batch_size() -> Iterator[None]:
+    previous = cfg.TAWAZI_BATCH_SIZE
+    cfg.TAWAZI_BATCH_SIZE = 8
+    yield
+    cfg.TAWAZI_BATCH_SIZE = previous
+    cfg.TAWAZI_BATCH_TARGET_MS = 1.0
+    fan_out.durations.clear()
+    fan_out.config_from_dict({})
+
+
+def test_batching_submits_fewer_tasks(mocker: MockerFixture) -> None:
+    submit = mocker.spy(fan_out._get_thread_pool(), "submit")
+    assert fan_out(1) == [1 + i for i in range(WIDTH)]
+    # root and collect are submitted alone, the features by batches of at most 8
+    # (the last ones might be split between both threads)
+    assert 2 + WIDTH // 8 <= submit.call_count <= 2 + WIDTH // 4
+
+
+def test_batching_disabled(mocker: MockerFixture) -> None:
+    cfg.TAWAZI_BATCH_SIZE = 1
+    submit = mocker.spy(fan_out._get_thread_pool(), "submit")
+    assert fan_out(1) == [1 + i for i in range(WIDTH)]
+    assert submit.call_count == 2 + WIDTH
+
+
+def test_batch_spread_over_free_slots(mocker: MockerFixture) -> None:
+    cfg.TAWAZI_BATCH_SIZE = 100
+    submit = mocker.spy(fan_out._get_thread_pool(), "submit")
+    assert fan_out(1) == [1 + i for i in range(WIDTH)]
+    # the 40 features are split between the 2 threads
+    assert submit.call_count == 2 + 2
+
+
+def test_batching_async() -> None:
+    assert asyncio.run(async_fan_out(1)) == [1 + i for i in range(WIDTH)]
+
+
+def test_batching_error() -> None:
+    with pytest.raises(TawaziError) as exc_info:
+        failing_fan_out(1)
+    assert isinstance(exc_info.value.__cause__, ValueError)
+
+
+def test_batching_keeps_results_and_profiles() -> None:
+    exec_ = fan_out.executor()
+    exec_(1)
+    features = [
+        id_
+        for id_, exec_node in fan_out.exec_nodes.items()
+        if exec_node.exec_function is feature.exec_function
+    ]
+    assert len(features) == WIDTH
+    assert [exec_.results[id_] for id_ in features] == [1 + i for i in range(WIDTH)]
+    assert all(id_ in exec_.profiles for id_ in features)
+
+
+def feature_durations(duration: float) -> Dict[str, Dict[str, float]]:
+    return {
+        "durations": {
+            id_: duration
+            for id_, exec_node in fan_out.exec_nodes.items()
+            if exec_node.exec_function is feature.exec_function
+        }
+    }
+
+
+def test_batch_sized_by_durations(mocker: MockerFixture) -> None:
+    cfg.TAWAZI_BATCH_SIZE = 100
+    # 0.3ms per feature: 3 features fit in the 1ms target
+    fan_out.config_from_dict(feature_durations(0.0003))
+    submit = mocker.spy(fan_out._get_thread_pool(), "submit")
+    assert fan_out(1) == [1 + i for i in range(WIDTH)]
+    assert submit.call_count == 2 + -(-WIDTH // 3)
+
+
+def test_long_exec_nodes_are_not_batched(mocker: MockerFixture) -> None:
+    fan_out.config_from_dict(feature_durations(0.01))
+    submit = mocker.spy(fan_out._get_thread_pool(), "submit")
+    assert fan_out(1) == [1 + i for i in range(WIDTH)]
+    assert submit.call_count == 2 + WIDTH
+
+
+def test_failure_in_batch_only_fails_its_exec_node() -> None:
+    @xn
+    def one() -> int:
+        return 1
+
+    @xn
+    def fail() -> int:
+        raise ValueError("failed in batch")
+
+    futures: List["Future[Any]"] = [Future() for _ in range(4)]
+    futures[3].cancel()
+    profiles: Dict[str, Profile] = {}
+    execute_batch([one, fail, one, fail], futures, {}, profiles)
+    assert futures[0].result() == 1
+    assert isinstance(futures[1].exception(), ValueError)
+    # the ExecNodes after the failure are still executed, the cancelled ones are not
+    assert futures[2].result() == 1
+    assert futures[3].cancelled()
@@ -0,0 +1,117 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from tawazi import Resource, dag, xn
+from tawazi._dag.digraph import DiGraphEx
+from tawazi._dag.plan import ExecutionPlan
+
+threads: Dict[str, int] = {}
+call_order: List[str] = []
+
+
+def record(name: str) -> None:
+    threads[name] = threading.get_ident()
+    call_order.append(name)
+
+
+@xn
+def a(x: int) -> int:
+    record("a")
+    return x + 1
+
+
+@xn
+def b(x: int) -> int:
+    record("b")
+    return x * 2
+
+
+@xn
+def c(x: int) -> int:
+    record("c")
+    return x - 3
+
+
+@xn
+def d(x: int) -> bool:
+    record("d")
+    return x > 0
+
+
+@xn
+def e(x: int) -> int:
+    record("e")
+    return x
+
+
+@xn(resource=Resource.main_thread)
+def main(x: int) -> int:
+    return x
+
+
+@dag(max_concurrency=2)
+def chain(x: int) -> int:
+    return c(b(a(x)))
+
+
+@dag(max_concurrency=2)
+def chain_active(x: int) -> Tuple[int, Optional[int]]:
+    y = a(x)
+    return y, e(y, twz_active=d(y))  # type: ignore[call-arg]
+
+
+@dag(max_concurrency=2)
+def broken_chain(x: int) -> int:
+    return c(main(b(x)))
+
+
+def test_plan_fused_next() -> None:
+    plan = chain._get_call_plan()
+    ids = plan.ids
+    assert ids[plan.fused_next[plan.indices["a"]]] == "b"
+    assert ids[plan.fused_next[plan.indices["b"]]] == "c"
+    assert plan.fused_next[plan.indices["c"]] == -1
+
+    # nodes of different resources are not fused
+    plan = broken_chain._get_call_plan()
+    assert plan.fused_next[plan.indices["b"]] == -1
+    assert plan.fused_next[plan.indices["main"]] == -1
+
+
+def test_plan_without_exec_nodes_has_no_fusion() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("a", "b"), ("b", "c")])
+    plan = ExecutionPlan.from_graph(graph)
+    state = plan.start({})
+    assert state.take_chain(state.pop()) == []
+
+
+def test_take_chain_and_release() -> None:
+    plan = chain._get_call_plan()
+    state = plan.start({chain.input_uxns[0].id: 1})
+    head = state.pop()
+    assert plan.ids[head] == "a"
+    assert [plan.ids[i] for i in state.take_chain(head)] == ["b", "c"]
+    # the fused nodes never become ready
+    assert not state
+    state.release(head)
+    assert state.remaining == 0
+
+
+def test_fused_chain_runs_in_a_single_thread() -> None:
+    threads.clear()
+    call_order.clear()
+    exec_ = chain.executor()
+    assert exec_(1) == 1
+    assert call_order == ["a", "b", "c"]
+    assert threads["a"] == threads["b"] == threads["c"] != threading.get_ident()
+    # every fused ExecNode keeps its own result and profile
+    assert exec_.results["a"] == 2
+    assert exec_.results["b"] == 4
+    assert exec_.results["c"] == 1
+    assert {"a", "b", "c"} <= set(exec_.profiles)
+
+
+def test_fused_chain_with_twz_active() -> None:
+    assert chain_active(1) == (2, 2)
+    assert chain_active(-5) == (-4, None)
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from pathlib import Path
+from typing import Generator, List
+
+import pytest
+from tawazi import dag, xn
+from tawazi._checkpoint import Checkpoint, _dump
+from tawazi.config import cfg
+from tawazi.errors import TawaziError, TawaziUsageError
+
+calls: List[str] = []
+broken = {"c": True}
+
+
+@pytest.fixture(autouse=True)
+def reset() -> Generator[None, None, None]:
+    calls.clear()
+    broken["c"] = True
+    yield
+    cfg.TAWAZI_RELEASE_RESULTS = False
+
+
+@xn
+def a(x: int) -> int:
+    calls.append("a")
+    return x + 1
+
+
+@xn
+def b(x: int) -> int:
+    calls.append("b")
+    return 2 * x
+
+
+@xn
+def c(x: int, y: int) -> int:
+    calls.append("c")
+    if broken["c"]:
+        raise RuntimeError("c is broken")
+    return x + y
+
+
+@dag(max_concurrency=2)
+def pipe(x: int) -> int:
+    y = a(x)
+    return c(y, b(y))
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_resume_after_failure(tmp_path: Path, max_concurrency: int) -> None:
+    pipe.max_concurrency = max_concurrency
+    with pytest.raises(TawaziError):
+        pipe.executor(checkpoint_dir=str(tmp_path))(1)
+    assert sorted(calls) == ["a", "b", "c"]
+
+    calls.clear()
+    broken["c"] = False
+    execution = pipe.executor(checkpoint_dir=str(tmp_path))
+    assert execution.resume() == 6
+    # only the ExecNode that failed is executed again
+    assert calls == ["c"]
+    assert execution.results["a"] == 2
+    pipe.max_concurrency = 2
+
+
+def test_results_are_written_atomically(tmp_path: Path) -> None:
+    broken["c"] = False
+    assert pipe.executor(checkpoint_dir=str(tmp_path))(1) == 6
+    assert sorted(path.name for path in (tmp_path / "results").iterdir()) == [
+        "a.pkl",
+        "b.pkl",
+        "c.pkl",
+    ]
+    assert (tmp_path / "args.pkl").exists()
+
+
+def test_new_execution_clears_the_checkpoint(tmp_path: Path) -> None:
+    with pytest.raises(TawaziError):
+        pipe.executor(checkpoint_dir=str(tmp_path))(1)
+    broken["c"] = False
+    assert pipe.executor(checkpoint_dir=str(tmp_path))(10) == 33
+
+    calls.clear()
+    assert pipe.executor(checkpoint_dir=str(tmp_path)).resume() == 33
+    assert calls == []
+
+
+def test_released_results_are_checkpointed(tmp_path: Path) -> None:
+    cfg.TAWAZI_RELEASE_RESULTS = True
+
+    @dag(max_concurrency=2)
+    def released(x: int) -> int:
+        return c(a(x), b(a(x)))
+
+    with pytest.raises(TawaziError):
+        released.executor(checkpoint_dir=str(tmp_path))(1)
+
+    calls.clear()
+    broken["c"] = False
+    assert released.executor(checkpoint_dir=str(tmp_path)).resume() == 6
+    assert calls == ["c"]
+
+
+def test_unpicklable_result_is_executed_again(tmp_path: Path) -> None:
+    @xn
+    def lock() -> threading.Lock:
+        calls.append("lock")
+        return threading.Lock()
+
+    @xn
+    def use(lock: threading.Lock, x: int) -> int:
+        return c.exec_function(x, x)  # type: ignore[no-any-return]
+
+    @dag(max_concurrency=2)
+    def locked(x: int) -> int:
+        return use(lock(), a(x))
+
+    with pytest.raises(TawaziError):
+        locked.executor(checkpoint_dir=str(tmp_path))(1)
+
+    calls.clear()
+    broken["c"] = False
+    assert locked.executor(checkpoint_dir=str(tmp_path)).resume() == 4
+    assert sorted(calls) == ["c", "lock"]
+
+
+def test_async_resume(tmp_path: Path) -> None:
+    @dag(max_concurrency=2, is_async=True)
+    def apipe(x: int) -> int:
+        y = a(x)
+        return c(y, b(y))
+
+    with pytest.raises(TawaziError):
+        asyncio.run(apipe.executor(checkpoint_dir=str(tmp_path))(1))
+
+    calls.clear()
+    broken["c"] = False
+    assert asyncio.run(apipe.executor(checkpoint_dir=str(tmp_path)).resume()) == 6
+    assert calls == ["c"]
+
+
+def test_result_is_saved_as_it_was_released(tmp_path: Path) -> None:
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.start(())
+    value = [1]
+    checkpoint.save("a", value)
+    # a successor mutating the result doesn't change what is checkpointed
+    value.append(2)
+    checkpoint.close()
+    assert Checkpoint(str(tmp_path)).load() == ((), {"a": [1]})
+
+
+def test_failed_write_raises_its_own_error(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError) as excinfo:
+        _dump(tmp_path / "missing" / "a.pkl", b"")
+    # the temporary file was never created, removing it doesn't raise on top
+    assert excinfo.value.__context__ is None
+
+
+def test_resume_needs_a_checkpoint(tmp_path: Path) -> None:
+    with pytest.raises(TawaziUsageError):
+        pipe.executor().resume()
+    with pytest.raises(TawaziUsageError):
+        pipe.executor(checkpoint_dir=str(tmp_path)).resume()
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from typing import Any, List
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi.errors import TawaziError, TawaziUsageError
+
+in_flight = 0
+max_in_flight = 0
+
+
+@xn
+async def fetch(i: int) -> int:
+    global in_flight, max_in_flight
+    in_flight += 1
+    max_in_flight = max(max_in_flight, in_flight)
+    await asyncio.sleep(0.05)
+    in_flight -= 1
+    return i
+
+
+@xn
+async def thread_name(_: Any) -> str:
+    return threading.current_thread().name
+
+
+@xn(resource=Resource.main_thread)
+def total(*values: int) -> int:
+    return sum(values)
+
+
+@xn
+async def fail(i: int) -> int:
+    raise ValueError("failed in coroutine")
+
+
+@dag(is_async=True, max_concurrency=200)
+def fan_out() -> int:
+    return total(*[fetch(i) for i in range(200)])  # type: ignore[arg-type]
+
+
+@dag(is_async=True, max_concurrency=3)
+def limited_fan_out() -> int:
+    return total(*[fetch(i) for i in range(12)])  # type: ignore[arg-type]
+
+
+@dag
+def sync_pipe(i: int) -> List[Any]:
+    return [fetch(i), thread_name(i)]
+
+
+@dag
+def failing_pipe(i: int) -> int:
+    return fail(i)  # type: ignore[return-value]
+
+
+@pytest.fixture(autouse=True)
+def reset_in_flight() -> None:
+    global in_flight, max_in_flight
+    in_flight = max_in_flight = 0
+
+
+@pytest.mark.asyncio
+async def test_coroutines_are_awaited_concurrently_without_threads() -> None:
+    threads = set(threading.enumerate())
+    # 200 sleeps of 50ms each overlap on the event loop
+    assert await asyncio.wait_for(fan_out(), timeout=2) == sum(range(200))
+    assert max_in_flight == 200
+    # the threads of other DAGs might stop meanwhile, but no thread is started
+    assert set(threading.enumerate()) <= threads
+
+
+@pytest.mark.asyncio
+async def test_coroutines_respect_max_concurrency() -> None:
+    assert await limited_fan_out() == sum(range(12))
+    assert max_in_flight == 3
+
+
+def test_coroutines_in_sync_dag() -> None:
+    assert sync_pipe(3) == [3, threading.current_thread().name]
+
+
+def test_coroutine_error() -> None:
+    with pytest.raises(TawaziError) as exc_info:
+        failing_pipe(1)
+    assert isinstance(exc_info.value.__cause__, ValueError)
+
+
+def test_coroutine_in_process() -> None:
+    with pytest.raises(TawaziUsageError, match="coroutine function"):
+
+        @xn(resource=Resource.process)
+        async def remote() -> int:
+            return 1
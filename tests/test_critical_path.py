@@ -0,0 +1,103 @@
+import time
+from typing import Generator, List
+
+import pytest
+from tawazi import DAG, cfg, dag, xn
+
+call_order: List[str] = []
+
+
+@pytest.fixture(autouse=True)
+def critical_path() -> Generator[None, None, None]:
+    previous = cfg.TAWAZI_CRITICAL_PATH, cfg.TAWAZI_PROFILE_ALL_NODES
+    cfg.TAWAZI_CRITICAL_PATH = True
+    call_order.clear()
+    yield
+    cfg.TAWAZI_CRITICAL_PATH, cfg.TAWAZI_PROFILE_ALL_NODES = previous
+
+
+@xn
+def short(i: int) -> int:
+    call_order.append(f"short{i}")
+    return i
+
+
+@xn
+def long_(x: int) -> int:
+    call_order.append("long")
+    time.sleep(0.05)
+    return x
+
+
+@xn
+def end(*values: int) -> int:
+    call_order.append("end")
+    return sum(values)
+
+
+def make_unbalanced(max_concurrency: int) -> DAG[[], int]:
+    @dag(max_concurrency=max_concurrency)
+    def unbalanced() -> int:
+        return end(*[short(i) for i in range(4)], long_(long_(1)))
+
+    return unbalanced
+
+
+def test_declared_durations() -> None:
+    unbalanced = make_unbalanced(1)
+    assert unbalanced() == 7
+    # without durations, the ExecNodes run in topological order
+    assert call_order[0] == "short0"
+
+    call_order.clear()
+    unbalanced.config_from_dict({"durations": {"long_": 1.0, "long_<<1>>": 1.0}})
+    assert unbalanced() == 7
+    assert call_order[:2] == ["long", "long"]
+
+
+def test_measured_durations() -> None:
+    cfg.TAWAZI_PROFILE_ALL_NODES = True
+    unbalanced = make_unbalanced(1)
+    assert unbalanced() == 7
+    assert call_order[0] == "short0"
+    assert unbalanced.durations["long_"] >= 0.05
+    assert unbalanced.durations["short"] < 0.05
+
+    call_order.clear()
+    assert unbalanced() == 7
+    assert call_order[:2] == ["long", "long"]
+
+
+def test_durations_not_measured_without_profiling() -> None:
+    cfg.TAWAZI_PROFILE_ALL_NODES = False
+    unbalanced = make_unbalanced(2)
+    assert unbalanced() == 7
+    assert unbalanced.durations == {}
+
+
+def test_critical_path_shortens_makespan() -> None:
+    cfg.TAWAZI_PROFILE_ALL_NODES = True
+
+    @xn
+    def slow_short(i: int) -> int:
+        time.sleep(0.05)
+        return i
+
+    @dag(max_concurrency=2)
+    def unbalanced() -> int:
+        return end(*[slow_short(i) for i in range(4)], long_(long_(1)))
+
+    # the measured durations make the chain of long_ start right away
+    unbalanced()
+    start = time.perf_counter()
+    unbalanced()
+    assert time.perf_counter() - start < 0.2 - 0.02
+    unbalanced.close()
+
+
+def test_executor_uses_durations() -> None:
+    unbalanced = make_unbalanced(1)
+    unbalanced.config_from_dict({"durations": {"long_": 1.0, "long_<<1>>": 1.0}})
+    executor = unbalanced.executor()
+    assert executor() == 7
+    assert call_order[:2] == ["long", "long"]
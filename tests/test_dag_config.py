@@ -1,4 +1,5 @@
 import json
+from typing import Any, Dict
 
 import pytest
 import yaml
@@ -90,3 +91,19 @@ def test_with_twz_active() -> None:
         {"nodes": {"a": {"priority": 42, "is_sequential": False}}, "max_concurrency": 3}
     )
     assert my_dag() == "1234poulpe"
+
+
+@pytest.mark.parametrize(
+    "invalid", [{"timeout": -1}, {"memory_budget": 0}, {"max_concurrency": 0}, {"pools": {"db": 0}}]
+)
+def test_invalid_config_leaves_the_dag_unchanged(invalid: Dict[str, Any]) -> None:
+    @dag(max_concurrency=2)
+    def pipe() -> str:
+        return b(a(1234), "poulpe")
+
+    with pytest.raises(ValueError):
+        pipe.config_from_dict({"nodes": {"a": {"priority": 42}}, "max_concurrency": 3, **invalid})
+    assert pipe.get_node_by_id("a").priority == 0
+    assert pipe.max_concurrency == 2
+    assert (pipe.timeout, pipe.memory_budget, pipe.pools) == (None, None, {})
+    assert pipe() == "1234poulpe"
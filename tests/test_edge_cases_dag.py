@@ -8,6 +8,7 @@ from networkx import NetworkXUnfeasible
 from tawazi import DAG, dag, xn
 from tawazi._dag.digraph import DiGraphEx
 from tawazi._dag.helpers import sync_execute
+from tawazi._dag.plan import ExecutionPlan
 from tawazi._helpers import StrictDict
 from tawazi.errors import TawaziUsageError
 from tawazi.node import ExecNode, UsageExecNode
@@ -18,7 +19,7 @@ def shortcut_execute(dag: DAG[Any, Any], graph: DiGraphEx) -> Any:
         results=dag.results,
         exec_nodes=dag.exec_nodes,
         max_concurrency=dag.max_concurrency,
-        graph=graph,
+        plan=ExecutionPlan.from_graph(graph),
     )
 
 
@@ -0,0 +1,196 @@
+from typing import List
+
+import pytest
+from tawazi import Resource, cfg, dag, xn
+from tawazi._dag.digraph import DiGraphEx
+from tawazi._dag.plan import ExecutionPlan
+
+
+@xn
+def inc(x: int) -> int:
+    return x + 1
+
+
+@xn
+def add(x: int, y: int) -> int:
+    return x + y
+
+
+@xn(debug=True)
+def debug_inc(x: int) -> int:
+    return x + 1
+
+
+@dag
+def pipe(x: int) -> int:
+    a = inc(x)
+    b = inc(a)
+    c = inc(a)
+    debug_inc(c)
+    return add(b, c)
+
+
+def test_plan_from_graph() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")])
+    graph.compound_priority.update({"a": 3, "b": 1, "c": 1, "d": 0})
+    plan = ExecutionPlan.from_graph(graph)
+
+    assert len(plan) == 4
+    assert plan.ids[0] == "a" and plan.ids[-1] == "d"
+    assert all(plan.indices[id_] == i for i, id_ in enumerate(plan.ids))
+
+    def successors(id_: str) -> List[str]:
+        i = plan.indices[id_]
+        return sorted(
+            plan.ids[j]
+            for j in plan.successors[plan.successors_ptr[i] : plan.successors_ptr[i + 1]]
+        )
+
+    assert successors("a") == ["b", "c"]
+    assert successors("b") == ["d"]
+    assert successors("d") == []
+    assert [plan.in_degrees[plan.indices[id_]] for id_ in "abcd"] == [0, 1, 1, 2]
+    assert [plan.priorities[plan.indices[id_]] for id_ in "abcd"] == [3, 1, 1, 0]
+
+
+def test_plan_state_does_not_modify_plan() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("a", "b"), ("b", "c")])
+    plan = ExecutionPlan.from_graph(graph)
+    in_degrees = list(plan.in_degrees)
+
+    state = plan.start({})
+    for id_ in "abc":
+        assert state.pop() == plan.indices[id_]
+        assert not state
+        state.release(plan.indices[id_])
+    assert state.remaining == 0
+    assert plan.in_degrees == in_degrees
+
+
+def test_plan_state_with_available_results() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("arg", "b"), ("setup", "b"), ("setup", "c"), ("b", "d")])
+    plan = ExecutionPlan.from_graph(graph)
+
+    state = plan.start({"arg": 1, "setup": 2})
+    assert sorted([state.pop(), state.pop()]) == sorted([plan.indices["b"], plan.indices["c"]])
+    assert not state
+    assert state.remaining == 3
+
+
+def test_ready_nodes_ordered_by_priority() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("root", leaf) for leaf in "abcdef"])
+    graph.compound_priority.update({"root": 0, "a": 1, "b": 5, "c": 3, "d": 5, "e": 0, "f": 3})
+    plan = ExecutionPlan.from_graph(graph)
+
+    state = plan.start({"root": None})
+    popped = []
+    while state:
+        popped.append(state.pop())
+    assert [plan.priorities[i] for i in popped] == [5, 5, 3, 3, 1, 0]
+    # ties are broken by the topological order
+    assert popped[0] < popped[1] and popped[2] < popped[3]
+
+
+def test_peek_does_not_pop() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("a", "b"), ("a", "c")])
+    graph.compound_priority.update({"a": 0, "b": 1, "c": 2})
+    plan = ExecutionPlan.from_graph(graph)
+
+    state = plan.start({"a": None})
+    assert state.peek() == plan.indices["c"]
+    assert state.peek() == plan.indices["c"]
+    assert state.pop() == plan.indices["c"]
+    assert state.pop() == plan.indices["b"]
+    assert not state
+
+
+def test_call_plan_is_compiled_once() -> None:
+    assert pipe(1) == 6
+    plan = pipe._get_call_plan()
+    nb_nodes = len(pipe.graph_ids)
+    for i in range(5):
+        assert pipe(i) == 2 * i + 4
+    assert pipe._get_call_plan() is plan
+    # the graph of the DAG is never modified by the scheduler
+    assert len(pipe.graph_ids) == nb_nodes
+
+
+@pytest.mark.parametrize("run_debug_nodes", [True, False])
+def test_call_plan_depends_on_debug_nodes(run_debug_nodes: bool) -> None:
+    previous = cfg.RUN_DEBUG_NODES
+    cfg.RUN_DEBUG_NODES = run_debug_nodes
+    try:
+        assert pipe(1) == 6
+        plan = pipe._get_call_plan()
+        assert ("debug_inc" in plan.indices) is run_debug_nodes
+    finally:
+        cfg.RUN_DEBUG_NODES = previous
+
+
+def test_call_plan_recompiled_after_reconfiguration() -> None:
+    @dag
+    def pipe_(x: int) -> int:
+        return inc(inc(x))
+
+    assert pipe_(1) == 3
+    plan = pipe_._get_call_plan()
+    pipe_.config_from_dict({"nodes": {"inc": {"priority": 10}}})
+    new_plan = pipe_._get_call_plan()
+    assert new_plan is not plan
+    assert new_plan.priorities[new_plan.indices["inc"]] == 10
+    assert pipe_(1) == 3
+
+
+def test_executor_plan_is_reused() -> None:
+    exec_ = pipe.executor(target_nodes=["inc<<1>>"])
+    assert set(exec_.plan.ids) == set(exec_.graph.nodes)
+    exec_(1)
+    assert exec_.results["inc<<1>>"] == 3
+
+
+@xn(resource=Resource.async_thread)
+def async_thread_inc(x: int) -> int:
+    return x + 1
+
+
+@xn
+async def coroutine_inc(x: int) -> int:
+    return x + 1
+
+
+def test_plan_needs_event_loop() -> None:
+    @dag
+    def pipe_async_thread(x: int) -> int:
+        return inc(async_thread_inc(x))
+
+    @dag
+    def pipe_coroutine(x: int) -> int:
+        return inc(coroutine_inc(x))  # type: ignore[arg-type]
+
+    assert not pipe._get_call_plan().needs_event_loop
+    assert pipe_async_thread._get_call_plan().needs_event_loop
+    assert pipe_coroutine._get_call_plan().needs_event_loop
+    assert pipe_async_thread(1) == pipe_coroutine(1) == 3
+
+
+def test_plan_with_durations() -> None:
+    graph = DiGraphEx()
+    graph.add_edges_from([("root", "short"), ("root", "long"), ("long", "end"), ("short", "end")])
+    graph.compound_priority.update({"root": 0, "short": 5, "long": 0, "end": 0})
+    durations = {"root": 1.0, "short": 0.5, "long": 2.0, "end": 1.0}
+    plan = ExecutionPlan.from_graph(graph, durations=durations)
+
+    assert plan.priorities[plan.indices["root"]] == 4.0
+    assert plan.priorities[plan.indices["long"]] == 3.0
+    assert plan.priorities[plan.indices["short"]] == 1.5
+    # the compound priorities are not used anymore
+    assert plan.ids[plan.start({"root": None}).peek()] == "long"
+
+    # the nodes without a duration take no time
+    plan = ExecutionPlan.from_graph(graph, durations={"long": 3.0, "end": 1.0})
+    assert plan.priorities[plan.indices["short"]] == 1.0
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, List
+
+import pytest
+from tawazi import Resource, cancel_token, dag, xn
+from tawazi.config import cfg
+from tawazi.errors import TawaziError
+
+executed: List[str] = []
+
+
+@pytest.fixture(autouse=True)
+def fail_fast() -> Generator[None, None, None]:
+    executed.clear()
+    cfg.TAWAZI_FAIL_FAST = True
+    yield
+    cfg.TAWAZI_FAIL_FAST = False
+
+
+@xn(priority=10)
+def fail() -> None:
+    time.sleep(0.05)
+    raise ValueError("failed")
+
+
+@xn
+def record(name: str) -> str:
+    executed.append(name)
+    return name
+
+
+def cooperate() -> bool:
+    # stops early once the execution is cancelled, gives up after 5 seconds otherwise
+    cancelled = cancel_token().wait(5)
+    executed.append(f"cancelled={cancelled}")
+    return cancelled
+
+
+def test_queued_exec_nodes_are_cancelled() -> None:
+    @xn
+    def slow_record(name: str) -> None:
+        time.sleep(0.02)
+        executed.append(name)
+
+    @dag(max_concurrency=11)
+    def pipe() -> None:
+        fail()
+        for i in range(10):
+            slow_record(str(i))
+
+    # a single worker: the ExecNodes submitted after fail wait in the queue of the pool
+    pool = ThreadPoolExecutor(max_workers=1)
+    pipe.thread_pool = pool
+    with pytest.raises(TawaziError):
+        pipe()
+    pool.shutdown(wait=True)
+    # at most the one the worker picked before the cancellation
+    assert len(executed) <= 1
+
+
+@pytest.mark.parametrize("resource", [Resource.thread, Resource.async_thread])
+def test_running_exec_nodes_are_signaled(resource: Resource) -> None:
+    @dag(max_concurrency=2)
+    def pipe() -> None:
+        xn(resource=resource)(cooperate)()
+        fail()
+
+    start = time.perf_counter()
+    with pytest.raises(TawaziError):
+        pipe()
+    # the error is raised without waiting for the running ExecNodes
+    while not executed and time.perf_counter() - start < 5:
+        time.sleep(0.01)
+    assert executed == ["cancelled=True"]
+
+
+def test_error_carries_partial_profiles() -> None:
+    @xn
+    def fail_after(name: str) -> None:
+        raise ValueError(name)
+
+    @dag(max_concurrency=2)
+    def pipe() -> None:
+        fail_after(record("a"))
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe()
+    profiles = excinfo.value.profiles  # type: ignore[attr-defined]
+    assert "record" in profiles
+    assert "fail_after" not in profiles
+
+
+def test_inline_execution_error_carries_profiles() -> None:
+    @xn
+    def fail_after(name: str) -> None:
+        raise ValueError(name)
+
+    @dag(max_concurrency=1)
+    def pipe() -> None:
+        fail_after(record("a"))
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe()
+    assert "record" in excinfo.value.profiles  # type: ignore[attr-defined]
+
+
+def test_disabled_by_default() -> None:
+    cfg.TAWAZI_FAIL_FAST = False
+
+    @dag(max_concurrency=2)
+    def pipe() -> None:
+        fail()
+        record("a")
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe()
+    assert not hasattr(excinfo.value, "profiles")
+    assert not cancel_token().cancelled
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from typing import List, Tuple
+
+from tawazi import Resource, dag, xn
+
+order: List[str] = []
+
+
+@xn(priority=1)
+def low(x: int) -> int:
+    order.append("low")
+    return x
+
+
+@xn(priority=10)
+def high(x: int) -> int:
+    order.append("high")
+    return x
+
+
+@xn
+def thread_name(x: int) -> str:
+    order.append("thread_name")
+    return threading.current_thread().name
+
+
+@xn(resource=Resource.process)
+def square(x: int) -> int:
+    return x * x
+
+
+@dag
+def pipe(x: int) -> Tuple[int, int, str]:
+    return low(x), high(x), thread_name(x)
+
+
+@dag(is_async=True)
+def pipe_async(x: int) -> Tuple[int, int, str]:
+    return low(x), high(x), thread_name(x)
+
+
+@dag
+def pipe_process(x: int) -> int:
+    return square(square(x))
+
+
+def test_inline_execution_in_calling_thread() -> None:
+    order.clear()
+    assert pipe(1) == (1, 1, threading.current_thread().name)
+    # no thread was started to run the ExecNodes
+    assert pipe.thread_pool is None or not pipe.thread_pool._threads
+
+
+def test_inline_execution_same_order_as_concurrent() -> None:
+    order.clear()
+    pipe(1)
+    inline_order = order.copy()
+    order.clear()
+    # the asyncio scheduler is never inlined
+    asyncio.run(pipe_async(1))
+    assert inline_order == order == ["high", "low", "thread_name"]
+
+
+def test_inline_execution_order_is_computed_once() -> None:
+    pipe(1)
+    plan = pipe._get_call_plan()
+    orders = dict(plan._sequential_orders)
+    pipe(2)
+    assert plan._sequential_orders == orders
+
+
+def test_inline_execution_with_process() -> None:
+    with pipe_process:
+        assert pipe_process(3) == 81
@@ -0,0 +1,303 @@
+import asyncio
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+
+import pytest
+from tawazi import dag, xn
+from tawazi._dag.helpers import SharedSlots
+from tawazi.errors import TawaziError
+
+lock = threading.Lock()
+setup_calls: List[int] = []
+
+
+@xn(setup=True)
+def model() -> int:
+    setup_calls.append(1)
+    return 10
+
+
+@xn
+def scale(x: int, factor: int) -> int:
+    return x * factor
+
+
+@xn
+def wait(x: int, delay: float) -> int:
+    time.sleep(delay)
+    return x
+
+
+@pytest.fixture(autouse=True)
+def reset() -> None:
+    setup_calls.clear()
+    tracked.update(running=0, max_running=0, overlapped_sequential=0)
+    starts.clear()
+
+
+def test_map_in_order() -> None:
+    @dag(max_concurrency=4)
+    def pipe(x: int) -> int:
+        return scale(x, model())
+
+    assert list(pipe.map(range(20), max_in_flight=4)) == [10 * x for x in range(20)]
+    # the setup ExecNode is executed once for all the executions
+    assert setup_calls == [1]
+
+
+def test_map_several_iterables() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int, factor: int) -> int:
+        return scale(x, factor)
+
+    assert list(pipe.map([1, 2, 3], [4, 5])) == [4, 10]
+
+
+def test_executions_overlap() -> None:
+    @dag(max_concurrency=4)
+    def pipe(x: int) -> int:
+        return wait(x, 0.05)
+
+    start = time.perf_counter()
+    assert list(pipe.map(range(8), max_in_flight=4)) == list(range(8))
+    assert time.perf_counter() - start < 8 * 0.05
+
+
+def test_max_in_flight() -> None:
+    running = 0
+    max_running = 0
+
+    @xn
+    def start(x: int) -> int:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        return x
+
+    @xn
+    def end(x: int) -> int:
+        nonlocal running
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return x
+
+    @dag(max_concurrency=4)
+    def pipe(x: int) -> int:
+        return end(start(x))
+
+    assert list(pipe.map(range(10), max_in_flight=2)) == list(range(10))
+    assert max_running <= 2
+
+
+# the ExecNodes running at the same time
+tracked = {"running": 0, "max_running": 0, "overlapped_sequential": 0}
+# whether every ExecNode that started was sequential, in start order
+starts: List[bool] = []
+
+
+def track(x: int, sequential: bool = False) -> int:
+    with lock:
+        starts.append(sequential)
+        tracked["running"] += 1
+        tracked["max_running"] = max(tracked["max_running"], tracked["running"])
+    time.sleep(0.01)
+    with lock:
+        if sequential and tracked["running"] > 1:
+            tracked["overlapped_sequential"] += 1
+        tracked["running"] -= 1
+    return x
+
+
+run = xn(track)
+run_alone = xn(is_sequential=True)(track)
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_map_respects_max_concurrency(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def pipe(x: int) -> List[int]:
+        return [run(x), run(x)]
+
+    assert list(pipe.map(range(8), max_in_flight=4)) == [[x, x] for x in range(8)]
+    assert tracked["max_running"] == max_concurrency
+
+
+def test_map_sequential_exec_node_runs_alone() -> None:
+    @dag(max_concurrency=4)
+    def pipe(x: int) -> List[int]:
+        return [run(x), run_alone(x, True), run(x)]
+
+    assert list(pipe.map(range(8), max_in_flight=4)) == [[x, x, x] for x in range(8)]
+    assert tracked["overlapped_sequential"] == 0
+    assert tracked["max_running"] > 1
+
+
+def test_map_sequential_exec_node_is_not_starved(monkeypatch: pytest.MonkeyPatch) -> None:
+    # the requested slots, the requesting execution and whether the slots were taken, in order
+    requests: List[Tuple[int, Any, bool]] = []
+    acquire = SharedSlots.acquire
+
+    def recording_acquire(self: SharedSlots, slots: int, wake: Callable[[], None]) -> bool:
+        with lock:
+            taken = acquire(self, slots, wake)
+            requests.append((slots, wake.__self__, taken))  # type: ignore[attr-defined]
+        return taken
+
+    monkeypatch.setattr(SharedSlots, "acquire", recording_acquire)
+
+    @xn(is_sequential=True)
+    def gather(x: int, *fan: int) -> int:
+        return track(x, True)
+
+    @dag(max_concurrency=4)
+    def pipe(x: int) -> int:
+        return gather(x, *[run(x) for _ in range(4)])
+
+    assert list(pipe.map(range(16), max_in_flight=8)) == list(range(16))
+    assert tracked["overlapped_sequential"] == 0
+    # once a sequential ExecNode waits for all the slots, only the executions already waiting
+    # before it take slots before it, once each
+    waiting: List[Any] = []
+    for i, (slots, execution, taken) in enumerate(requests):
+        if taken:
+            if execution in waiting:
+                waiting.remove(execution)
+            continue
+        if execution not in waiting:
+            waiting.append(execution)
+        if slots < 4:
+            continue
+        ahead = waiting[: waiting.index(execution)]
+        for _, other, other_taken in requests[i + 1 :]:
+            if other is execution and other_taken:
+                break
+            if other_taken:
+                assert other in ahead
+                ahead.remove(other)
+
+
+def test_map_error_gives_slots_back() -> None:
+    @xn
+    def fail(x: int) -> int:
+        if x == 1:
+            raise ValueError("failed")
+        return x
+
+    @dag(max_concurrency=1)
+    def pipe(x: int) -> int:
+        return fail(x)
+
+    with pytest.raises(TawaziError):
+        list(pipe.map(range(3), max_in_flight=2))
+    # the slot of the failed execution isn't kept
+    assert list(pipe.map([0, 2], max_in_flight=2)) == [0, 2]
+
+
+def test_map_as_completed() -> None:
+    @dag(max_concurrency=4)
+    def pipe(x: int, delay: float) -> int:
+        return wait(x, delay)
+
+    results = list(pipe.map([0, 1, 2], [0.3, 0.0, 0.15], max_in_flight=3, ordered=False))
+    assert results == [1, 2, 0]
+
+
+def test_map_consumes_inputs_lazily() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return scale(x, 2)
+
+    results = pipe.map(itertools.count(), max_in_flight=2)
+    assert list(itertools.islice(results, 5)) == [0, 2, 4, 6, 8]
+
+
+def test_map_raises_the_error_of_an_execution() -> None:
+    consumed: List[int] = []
+
+    @xn
+    def fail_on_two(x: int) -> int:
+        if x == 2:
+            raise ValueError(x)
+        return x
+
+    def inputs() -> Any:
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return fail_on_two(x)
+
+    results = pipe.map(inputs(), max_in_flight=2)
+    assert [next(results), next(results)] == [0, 1]
+    with pytest.raises(TawaziError):
+        next(results)
+    assert len(consumed) < 10
+
+
+def test_async_map() -> None:
+    @xn
+    async def await_(x: int, delay: float) -> int:
+        await asyncio.sleep(delay)
+        return x
+
+    @dag(max_concurrency=4, is_async=True)
+    def pipe(x: int, delay: float) -> int:
+        return await_(x, delay)  # type: ignore[return-value]
+
+    async def collect(ordered: bool) -> List[int]:
+        return [r async for r in pipe.map([0, 1, 2], [0.2, 0.0, 0.1], ordered=ordered)]
+
+    assert asyncio.run(collect(True)) == [0, 1, 2]
+    assert asyncio.run(collect(False)) == [1, 2, 0]
+
+
+def test_async_map_respects_max_concurrency() -> None:
+    running = 0
+    max_running = 0
+
+    @xn
+    async def await_(x: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return x
+
+    @dag(max_concurrency=2, is_async=True)
+    def pipe(x: int) -> List[int]:
+        return [await_(x), await_(x)]  # type: ignore[list-item]
+
+    async def collect() -> List[List[int]]:
+        return [r async for r in pipe.map(range(8), max_in_flight=4)]
+
+    assert asyncio.run(collect()) == [[x, x] for x in range(8)]
+    assert max_running == 2
+
+
+def test_async_map_shares_setup() -> None:
+    @dag(max_concurrency=2, is_async=True)
+    def pipe(x: int) -> int:
+        return scale(x, model())
+
+    async def collect() -> List[int]:
+        return [r async for r in pipe.map(range(5), max_in_flight=3)]
+
+    assert asyncio.run(collect()) == [0, 10, 20, 30, 40]
+    assert setup_calls == [1]
+
+
+@pytest.mark.parametrize("max_in_flight", [0, -1, 1.5, True])
+def test_invalid_max_in_flight(max_in_flight: Any) -> None:
+    @dag
+    def pipe(x: int) -> int:
+        return scale(x, 2)
+
+    with pytest.raises(ValueError, match="max_in_flight"):
+        pipe.map(range(3), max_in_flight=max_in_flight)
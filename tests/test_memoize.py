@@ -0,0 +1,253 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from tawazi import Resource, dag, register_hasher, xn
+from tawazi._memoize import MemoInfo
+from tawazi.errors import TawaziUsageError
+
+calls: List[Any] = []
+
+
+@pytest.fixture(autouse=True)
+def reset() -> None:
+    calls.clear()
+
+
+@xn(memoize=True)
+def tokenize(text: str) -> List[str]:
+    calls.append(text)
+    return text.split()
+
+
+@xn
+def count(tokens: List[str]) -> int:
+    return len(tokens)
+
+
+def test_results_are_reused_across_executions() -> None:
+    @dag(max_concurrency=2)
+    def pipe(text: str) -> int:
+        return count(tokenize(text))
+
+    assert [pipe("a b"), pipe("a b"), pipe("a b c")] == [2, 2, 3]
+    assert calls == ["a b", "a b c"]
+    assert pipe.exec_nodes["tokenize"].cache_info() == MemoInfo(
+        hits=1, misses=2, maxsize=128, currsize=2
+    )
+
+
+def test_buffers_are_keyed_by_content() -> None:
+    @xn(memoize=True)
+    def total(array: "np.ndarray[Any, Any]", header: bytes) -> float:
+        calls.append(header)
+        return float(array.sum())
+
+    @dag
+    def pipe(array: "np.ndarray[Any, Any]", header: bytes) -> float:
+        return total(array, header)
+
+    assert pipe(np.arange(4.0), b"v1") == 6.0
+    # another array with the same content
+    assert pipe(np.arange(4.0), b"v1") == 6.0
+    # the same content with another shape
+    assert pipe(np.arange(4.0).reshape(2, 2), b"v1") == 6.0
+    assert pipe(np.arange(4.0), b"v2") == 6.0
+    assert calls == [b"v1", b"v1", b"v2"]
+
+
+def test_least_recently_used_is_evicted() -> None:
+    @xn(memoize=True, maxsize=2)
+    def square(x: int) -> int:
+        calls.append(x)
+        return x * x
+
+    @dag
+    def pipe(x: int) -> int:
+        return square(x)
+
+    for x in (1, 2, 1, 3, 1, 2):
+        pipe(x)
+    # 2 was evicted by 3 because 1 was used more recently
+    assert calls == [1, 2, 3, 2]
+
+
+def test_results_expire() -> None:
+    @xn(memoize=True, ttl=0.05)
+    def now(x: int) -> float:
+        calls.append(x)
+        return time.monotonic()
+
+    @dag
+    def pipe(x: int) -> float:
+        return now(x)
+
+    first = pipe(1)
+    assert pipe(1) == first
+    time.sleep(0.1)
+    assert pipe(1) != first
+    assert calls == [1, 1]
+
+
+def test_registered_hasher() -> None:
+    class Document:
+        __hash__ = None  # type: ignore[assignment]
+
+        def __init__(self, text: str) -> None:
+            self.text = text
+
+    @xn(memoize=True)
+    def length(document: Document) -> int:
+        calls.append(document.text)
+        return len(document.text)
+
+    @dag
+    def pipe(document: Document) -> int:
+        return length(document)
+
+    # unhashable arguments are never memoized
+    assert [pipe(Document("abc")), pipe(Document("abc"))] == [3, 3]
+    assert len(calls) == 2
+
+    register_hasher(Document, lambda document: document.text)
+    assert [pipe(Document("abc")), pipe(Document("abc"))] == [3, 3]
+    assert len(calls) == 3
+
+
+def test_identity_hashed_arguments_are_not_memoized() -> None:
+    class Counter:
+        def __init__(self) -> None:
+            self.value = 0
+
+    @xn(memoize=True)
+    def read(counter: Counter) -> int:
+        calls.append(counter.value)
+        return counter.value
+
+    @dag
+    def pipe(counter: Counter) -> int:
+        return read(counter)
+
+    counter = Counter()
+    assert pipe(counter) == 0
+    counter.value = 1
+    # the same object, mutated: its result must not be reused
+    assert pipe(counter) == 1
+    assert calls == [0, 1]
+
+
+def test_arrays_of_objects_are_not_memoized() -> None:
+    @xn(memoize=True)
+    def total(array: "np.ndarray[Any, Any]") -> int:
+        calls.append(len(array))
+        return sum(len(item) for item in array)
+
+    @dag
+    def pipe(array: "np.ndarray[Any, Any]") -> int:
+        return total(array)
+
+    array = np.empty(2, dtype=object)
+    array[0], array[1] = [1], [2]
+    assert pipe(array) == 2
+    array[0].append(3)
+    # the same objects, mutated: the result must not be reused
+    assert pipe(array) == 3
+    assert calls == [2, 2]
+
+
+def test_concurrent_executions() -> None:
+    @dag(max_concurrency=4)
+    def pipe(text: str) -> int:
+        return count(tokenize(text))
+
+    texts = ["a", "a b", "a b c"] * 10
+    assert list(pipe.map(texts, max_in_flight=4)) == [1, 2, 3] * 10
+    info = pipe.exec_nodes["tokenize"].cache_info()
+    assert info.hits + info.misses == 30
+    assert info.currsize == 3
+    pipe.exec_nodes["tokenize"].cache_clear()
+    assert pipe.exec_nodes["tokenize"].cache_info().currsize == 0
+
+
+def test_memoized_coroutine() -> None:
+    @xn(memoize=True)
+    async def fetch(url: str) -> str:
+        calls.append(url)
+        await asyncio.sleep(0)
+        return url.upper()
+
+    @dag(is_async=True)
+    def pipe(url: str) -> str:
+        return fetch(url)  # type: ignore[return-value]
+
+    async def run() -> List[str]:
+        return [await pipe("a"), await pipe("a")]
+
+    assert asyncio.run(run()) == ["A", "A"]
+    assert calls == ["a"]
+
+
+def test_memoize_config_from_dict() -> None:
+    @dag
+    def pipe(text: str) -> List[str]:
+        return tokenize(text)
+
+    pipe.config_from_dict({"nodes": {"tokenize": {"maxsize": 1}}})
+    for text in ("a", "b", "a"):
+        pipe(text)
+    assert calls == ["a", "b", "a"]
+
+
+def test_config_from_dict_keeps_the_memoized_results() -> None:
+    @dag
+    def pipe(text: str) -> List[str]:
+        return tokenize(text)
+
+    pipe("a")
+    pipe.config_from_dict({"nodes": {"tokenize": {"priority": 3}}})
+    pipe("a")
+    assert calls == ["a"]
+    # the results are memoized with the new parameters
+    pipe.config_from_dict({"nodes": {"tokenize": {"ttl": 60}}})
+    pipe("a")
+    assert calls == ["a", "a"]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"memoize": True, "maxsize": 0},
+        {"memoize": True, "ttl": 0},
+        {"memoize": True, "stream": True},
+        {"memoize": True, "setup": True},
+    ],
+)
+def test_invalid_memoize_arguments(kwargs: Dict[str, object]) -> None:
+    with pytest.raises(ValueError):
+        xn(**kwargs)(count.exec_function)  # type: ignore[call-overload]
+
+
+def test_memoized_process_is_refused() -> None:
+    with pytest.raises(TawaziUsageError):
+        xn(memoize=True, resource=Resource.process)(len)
+
+
+def test_cache_info_of_non_memoized_exec_node() -> None:
+    with pytest.raises(TawaziUsageError):
+        count.cache_info()
+
+
+def test_cache_info_of_decorated_function() -> None:
+    @dag
+    def pipe(text: str) -> List[str]:
+        return tokenize(text)
+
+    pipe("a")
+    # every DAG memoizes the results of its own copy of tokenize
+    with pytest.raises(TawaziUsageError):
+        tokenize.cache_info()
+    with pytest.raises(TawaziUsageError):
+        tokenize.cache_clear()
+    assert pipe.exec_nodes["tokenize"].cache_info().currsize == 1
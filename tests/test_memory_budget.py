@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+import numpy as np
+import pytest
+from tawazi import dag, xn
+from tawazi._spill import Spilled, SpillStore, estimate_size
+from tawazi.config import cfg
+
+MB = 1024 * 1024
+spilled: List[Spilled] = []
+spilled_types: List[type] = []
+
+
+@pytest.fixture(autouse=True)
+def spill_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[Path, None, None]:
+    spilled.clear()
+    spilled_types.clear()
+    dump = SpillStore.dump
+
+    def recording_dump(self: SpillStore, obj: Any) -> Spilled:
+        spill = dump(self, obj)
+        spilled.append(spill)
+        spilled_types.append(type(obj))
+        return spill
+
+    monkeypatch.setattr(SpillStore, "dump", recording_dump)
+    cfg.TAWAZI_SPILL_DIR = str(tmp_path)
+    yield tmp_path
+    cfg.TAWAZI_SPILL_DIR = None
+
+
+@xn
+def load(value: int) -> "np.ndarray[Any, Any]":
+    return np.full(MB // 8, value, dtype=np.float64)
+
+
+@xn
+def increment(array: "np.ndarray[Any, Any]") -> "np.ndarray[Any, Any]":
+    return array + 1
+
+
+@xn
+def total(*arrays: "np.ndarray[Any, Any]") -> float:
+    return float(sum(array.sum() for array in arrays))
+
+
+class ClosedGate:
+    """A large falsy result."""
+
+    nbytes = MB
+
+    def __bool__(self) -> bool:
+        return False
+
+
+@xn
+def closed_gate() -> ClosedGate:
+    return ClosedGate()
+
+
+@xn
+def load_after(gate: ClosedGate, value: int) -> "np.ndarray[Any, Any]":
+    return load.exec_function(value)  # type: ignore[no-any-return]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_results_are_spilled_and_loaded_back(max_concurrency: int, spill_dir: Path) -> None:
+    @dag(max_concurrency=max_concurrency, memory_budget=2 * MB)
+    def pipe() -> Tuple[float, "np.ndarray[Any, Any]"]:
+        arrays = [increment(load(i)) for i in range(4)]
+        return total(*arrays), arrays[0]
+
+    executor = pipe.executor()
+    sum_, first = executor()
+    assert sum_ == (1 + 2 + 3 + 4) * MB // 8
+    assert len(spilled) > 0
+    # the results are loaded back when the execution ends and the spill files are removed
+    assert isinstance(first, np.ndarray)
+    np.testing.assert_array_equal(first, np.ones(MB // 8))
+    assert not any(isinstance(result, Spilled) for result in executor.results.values())
+    assert list(spill_dir.iterdir()) == []
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_spilled_falsy_twz_active_prunes(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency, memory_budget=2 * MB)
+    def pipe() -> Optional[float]:
+        gate = closed_gate()
+        arrays = [load_after(gate, i) for i in range(3)]
+        return total(*arrays, twz_active=gate)  # type: ignore[call-arg]
+
+    assert pipe() is None
+    # the gate was spilled before total was activated by it
+    assert ClosedGate in spilled_types
+
+
+def test_no_spill_within_budget() -> None:
+    @dag(max_concurrency=2, memory_budget=100 * MB)
+    def pipe() -> float:
+        return total(*[load(i) for i in range(4)])
+
+    assert pipe() == 6 * MB // 8
+    assert spilled == []
+
+
+def test_no_spill_without_budget() -> None:
+    @dag(max_concurrency=2)
+    def pipe() -> float:
+        return total(*[load(i) for i in range(4)])
+
+    assert pipe() == 6 * MB // 8
+    assert spilled == []
+
+
+def test_small_results_are_not_spilled() -> None:
+    @xn
+    def small(i: int) -> List[int]:
+        return [i] * 10
+
+    @xn
+    def count(*lists: List[int]) -> int:
+        return sum(len(list_) for list_ in lists)
+
+    @dag(max_concurrency=2, memory_budget=1)
+    def pipe() -> int:
+        return count(*[small(i) for i in range(5)])
+
+    assert pipe() == 50
+    assert spilled == []
+
+
+def test_spill_in_async_dag() -> None:
+    @xn
+    async def aload(value: int) -> "np.ndarray[Any, Any]":
+        return load.exec_function(value)  # type: ignore[no-any-return]
+
+    @dag(max_concurrency=2, memory_budget=MB, is_async=True)
+    def pipe() -> float:
+        return total(*[aload(i) for i in range(3)])  # type: ignore[arg-type]
+
+    assert asyncio.run(pipe()) == 3 * MB // 8
+    assert len(spilled) > 0
+
+
+def test_unpicklable_result_is_kept() -> None:
+    @xn(memory=10 * MB)
+    def locked() -> Dict[str, Any]:
+        return {"lock": threading.Lock()}
+
+    @xn
+    def use(big: Dict[str, Any], array: "np.ndarray[Any, Any]") -> bool:
+        return isinstance(big["lock"], type(threading.Lock())) and array.shape == (MB // 8,)
+
+    @dag(max_concurrency=2, memory_budget=MB)
+    def pipe() -> bool:
+        return use(locked(), load(0))
+
+    assert pipe()
+
+
+def test_heavy_nodes_are_held_back() -> None:
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def run() -> int:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return 0
+
+    heavy = xn(memory=600)(run)
+    light = xn(memory=300)(run)
+
+    @dag(max_concurrency=3, memory_budget=1000)
+    def heavy_pipe() -> List[int]:
+        return [heavy() for _ in range(3)]
+
+    assert heavy_pipe() == [0, 0, 0]
+    assert max_running == 1
+
+    max_running = 0
+
+    @dag(max_concurrency=3, memory_budget=1000)
+    def light_pipe() -> List[int]:
+        return [light() for _ in range(3)]
+
+    assert light_pipe() == [0, 0, 0]
+    assert max_running == 3
+
+
+def test_memory_budget_config_from_dict() -> None:
+    @dag(max_concurrency=2)
+    def pipe() -> float:
+        return total(*[load(i) for i in range(4)])
+
+    pipe.config_from_dict({"memory_budget": MB, "nodes": {"load": {"memory": MB}}})
+    assert pipe.memory_budget == MB
+    assert pipe() == 6 * MB // 8
+    assert len(spilled) > 0
+
+
+def test_estimate_size() -> None:
+    assert estimate_size(np.zeros(10, dtype=np.int32)) == 40
+    assert estimate_size({"a": b"abc", "b": [np.zeros(2)]}) == 19
+
+
+@pytest.mark.parametrize("budget", [0, -1, 1.5, True, "1GB"])
+def test_invalid_memory_budget(budget: Any) -> None:
+    with pytest.raises(ValueError, match="memory_budget"):
+
+        @dag(memory_budget=budget)
+        def pipe() -> float:
+            return total(load(0))
+
+
+@pytest.mark.parametrize("memory", [0, -1, 1.5, True])
+def test_invalid_memory(memory: Any) -> None:
+    with pytest.raises(ValueError, match="memory"):
+        xn(memory=memory)(load.exec_function)
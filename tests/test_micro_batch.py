@@ -0,0 +1,170 @@
+import pickle
+import threading
+from copy import deepcopy
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+from tawazi import dag, xn
+from tawazi.errors import TawaziError, TawaziUsageError
+
+batch_sizes: List[int] = []
+
+
+@pytest.fixture(autouse=True)
+def reset() -> None:
+    batch_sizes.clear()
+
+
+@xn(batchable=True, max_batch=4, max_wait_ms=50)
+def predict(xs: List[int]) -> List[int]:
+    batch_sizes.append(len(xs))
+    return [10 * x for x in xs]
+
+
+@xn
+def add_one(x: int) -> int:
+    return x + 1
+
+
+def test_concurrent_executions_are_batched() -> None:
+    @dag(max_concurrency=8)
+    def pipe(x: int) -> int:
+        return add_one(predict(x))  # type: ignore[arg-type]
+
+    assert list(pipe.map(range(16), max_in_flight=8)) == [10 * x + 1 for x in range(16)]
+    assert sum(batch_sizes) == 16
+    assert max(batch_sizes) > 1
+    assert max(batch_sizes) <= 4
+
+
+def test_single_call() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return predict(x)  # type: ignore[arg-type, return-value]
+
+    assert pipe(3) == 30
+    assert batch_sizes == [1]
+
+
+def test_arguments_are_gathered_per_parameter() -> None:
+    @xn(batchable=True, max_wait_ms=50)
+    def combine(xs: List[int], ys: List[int], *, offsets: List[int]) -> List[int]:
+        batch_sizes.append(len(xs))
+        return [x * y + o for x, y, o in zip(xs, ys, offsets)]
+
+    @dag(max_concurrency=4)
+    def pipe(x: int, y: int) -> int:
+        return combine(x, y, offsets=1)  # type: ignore[arg-type, return-value]
+
+    assert list(pipe.map([1, 2, 3, 4], [5, 6, 7, 8], max_in_flight=4)) == [6, 13, 22, 33]
+
+
+def test_vectorized_numpy_function() -> None:
+    @xn(batchable=True, max_wait_ms=50)
+    def norm(vectors: List["np.ndarray[Any, Any]"]) -> "np.ndarray[Any, Any]":
+        batch_sizes.append(len(vectors))
+        return np.linalg.norm(np.stack(vectors), axis=1)  # type: ignore[no-any-return]
+
+    @dag(max_concurrency=4)
+    def pipe(vector: "np.ndarray[Any, Any]") -> float:
+        return norm(vector)  # type: ignore[arg-type, return-value]
+
+    vectors = [np.array([3.0, 4.0]) * i for i in range(4)]
+    assert list(pipe.map(vectors, max_in_flight=4)) == [0.0, 5.0, 10.0, 15.0]
+
+
+def test_errors_fail_the_whole_batch() -> None:
+    barrier = threading.Barrier(2)
+
+    @xn(batchable=True, max_batch=2, max_wait_ms=1000)
+    def broken(xs: List[int]) -> List[int]:
+        raise ValueError(xs)
+
+    @xn
+    def synchronized(x: int) -> int:
+        barrier.wait()
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return broken(synchronized(x))  # type: ignore[arg-type, return-value]
+
+    results = pipe.map(range(2), max_in_flight=2)
+    with pytest.raises(TawaziError) as excinfo:
+        next(results)
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    assert sorted(excinfo.value.__cause__.args[0]) == [0, 1]
+
+
+def test_wrong_number_of_outputs() -> None:
+    @xn(batchable=True, max_wait_ms=0)
+    def too_few(xs: List[int]) -> List[int]:
+        return []
+
+    @dag
+    def pipe(x: int) -> int:
+        return too_few(x)  # type: ignore[arg-type, return-value]
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe(1)
+    assert isinstance(excinfo.value.__cause__, TawaziUsageError)
+
+
+def test_batch_config_from_dict() -> None:
+    @dag(max_concurrency=8)
+    def pipe(x: int) -> int:
+        return predict(x)  # type: ignore[arg-type, return-value]
+
+    pipe.config_from_dict({"nodes": {"predict": {"max_batch": 1}}})
+    assert list(pipe.map(range(8), max_in_flight=8)) == [10 * x for x in range(8)]
+    assert batch_sizes == [1] * 8
+
+
+def test_config_from_dict_keeps_the_pending_calls() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return predict(x)  # type: ignore[arg-type, return-value]
+
+    batcher = pipe.exec_nodes["predict"]._batcher
+    pipe.config_from_dict({"nodes": {"predict": {"priority": 3}}})
+    assert pipe.exec_nodes["predict"]._batcher is batcher
+    # the batches are made with the new parameters
+    pipe.config_from_dict({"nodes": {"predict": {"max_batch": 2}}})
+    assert pipe.exec_nodes["predict"]._batcher is not batcher
+    assert pipe.exec_nodes["predict"]._batcher.max_batch == 2  # type: ignore[union-attr]
+
+
+def test_batchable_exec_node_can_be_copied() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return predict(x)  # type: ignore[arg-type, return-value]
+
+    # composing a DAG deep copies its ExecNodes
+    copy = deepcopy(pipe.exec_nodes["predict"])
+    assert copy._batcher is not None
+    assert copy._batcher is not pipe.exec_nodes["predict"]._batcher
+    assert copy._batcher.max_batch == 4
+    assert pickle.loads(pickle.dumps(copy._batcher)).max_wait == 0.05  # noqa: S301
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"batchable": True, "max_batch": 0},
+        {"batchable": True, "max_wait_ms": -1},
+        {"batchable": True, "stream": True},
+        {"batchable": True, "setup": True},
+    ],
+)
+def test_invalid_batch_arguments(kwargs: Dict[str, object]) -> None:
+    with pytest.raises(ValueError):
+        xn(**kwargs)(add_one.exec_function)  # type: ignore[call-overload]
+
+
+def test_batchable_coroutine_is_refused() -> None:
+    async def acall(xs: List[int]) -> List[int]:
+        return xs
+
+    with pytest.raises(TawaziUsageError):
+        xn(batchable=True)(acall)
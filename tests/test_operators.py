@@ -1,7 +1,7 @@
 from typing import Any, Tuple, cast
 
 import pytest
-from tawazi import and_, dag, not_, or_, xn
+from tawazi import Resource, and_, dag, not_, or_, xn
 
 
 @xn
@@ -1045,3 +1045,17 @@ def test_eq_and_andop() -> None:
 
     assert pipe("twinkle", "toes") is True
     assert pipe("foo", "bar") is False
+
+
+OPERATOR_IDS = {"_add", "_lt", "and_", "_neg"}
+
+
+def test_operators_run_on_scheduler_thread() -> None:
+    @dag(max_concurrency=2)
+    def pipe(in1: int, in2: int) -> Tuple[Any, ...]:
+        return in1 + in2, in1 < in2, and_(in1, in2), -in1
+
+    assert pipe(1, 2) == (3, True, 2, -1)
+    operators = [xn for xn in pipe.exec_nodes.values() if xn.id.split("<<")[0] in OPERATOR_IDS]
+    assert len(operators) == 4
+    assert all(xn.resource == Resource.main_thread for xn in operators)
@@ -0,0 +1,133 @@
+import os
+from typing import Any, Callable, List
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi.errors import TawaziError, TawaziUsageError
+
+setup_calls = 0
+
+
+@xn(resource=Resource.process)
+def pid(x: int) -> int:
+    return os.getpid()
+
+
+@xn(resource=Resource.process)
+def add(x: int, y: int) -> int:
+    return x + y
+
+
+@xn(resource=Resource.process)
+def square(x: int) -> int:
+    return x * x
+
+
+@xn(setup=True)
+def load_table() -> List[int]:
+    global setup_calls
+    setup_calls += 1
+    return list(range(10))
+
+
+@xn(resource=Resource.process)
+def lookup(table: List[int], i: int) -> int:
+    return table[i]
+
+
+@xn(resource=Resource.process)
+def fail(x: int) -> int:
+    raise ValueError("failed in process")
+
+
+@xn(resource=Resource.process)
+def unpicklable_result(x: int) -> Callable[[], int]:
+    return lambda: x
+
+
+@xn
+def identity(x: Any) -> Any:
+    return x
+
+
+@dag(max_concurrency=2)
+def pipe(x: int) -> int:
+    return add(square(x), square(x))
+
+
+@dag(max_concurrency=2)
+def pipe_pid(x: int) -> int:
+    return pid(x)
+
+
+@dag
+def pipe_setup(i: int) -> int:
+    return lookup(load_table(), i)
+
+
+def test_process_resource() -> None:
+    assert pipe(3) == 18
+    assert pipe(4) == 32
+
+
+def test_process_resource_runs_in_another_process() -> None:
+    with pipe_pid:
+        worker_pid = pipe_pid(1)
+        assert worker_pid != os.getpid()
+        # the pool of processes is reused between calls
+        executor = pipe_pid._process_pool._executor
+        assert pipe_pid(2) != os.getpid()
+        assert pipe_pid._process_pool._executor is executor
+    assert pipe_pid._process_pool._executor is None
+
+
+def test_process_resource_profile() -> None:
+    exec_ = pipe.executor()
+    assert exec_(2) == 8
+    assert set(exec_.profiles) >= {"square", "square<<1>>", "add"}
+
+
+def test_setup_results_sent_once() -> None:
+    assert [pipe_setup(i) for i in range(10)] == list(range(10))
+    assert setup_calls == 1
+    assert pipe_setup._process_pool._setup_results.keys() == {"load_table"}
+    pipe_setup.close()
+
+
+def test_error_in_process() -> None:
+    @dag
+    def failing_pipe(x: int) -> int:
+        return fail(x)
+
+    with pytest.raises(TawaziError, match="Error occurred while executing ExecNode fail"):
+        failing_pipe(1)
+    failing_pipe.close()
+
+
+def test_local_function_in_process() -> None:
+    with pytest.raises(TawaziUsageError, match="can't be executed in a process"):
+
+        @xn(resource=Resource.process)
+        def local(x: int) -> int:
+            return x
+
+
+def test_unpicklable_argument() -> None:
+    @dag
+    def pipe_(x: int) -> int:
+        return square(identity(x))
+
+    with pytest.raises(TawaziUsageError, match="arguments can't be pickled"):
+        pipe_(lambda: 1)  # type: ignore[arg-type]
+    pipe_.close()
+
+
+def test_unpicklable_result() -> None:
+    @dag
+    def pipe_(x: int) -> Callable[[], int]:
+        return unpicklable_result(x)
+
+    with pytest.raises(TawaziError) as exc_info:
+        pipe_(1)
+    assert "can't be pickled" in str(exc_info.value.__cause__)
+    pipe_.close()
@@ -0,0 +1,162 @@
+import asyncio
+import gc
+import weakref
+from typing import Any, Dict, Generator, List, Tuple
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi.config import cfg
+
+
+class Blob:
+    """Stands for a large intermediate result."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+
+alive: List["weakref.ReferenceType[Blob]"] = []
+
+
+@pytest.fixture(autouse=True)
+def release_results() -> Generator[None, None, None]:
+    cfg.TAWAZI_RELEASE_RESULTS = True
+    alive.clear()
+    yield
+    cfg.TAWAZI_RELEASE_RESULTS = False
+
+
+def count_alive() -> int:
+    gc.collect()
+    return sum(ref() is not None for ref in alive)
+
+
+@xn
+def load(size: int) -> Blob:
+    blob = Blob(size)
+    alive.append(weakref.ref(blob))
+    return blob
+
+
+@xn
+def transform(blob: Blob) -> Blob:
+    # at most the input and the output of the transformation are alive
+    assert count_alive() <= 2
+    return load.exec_function(blob.size + 1)  # type: ignore[no-any-return]
+
+
+@xn
+def size_of(blob: Blob) -> int:
+    return blob.size
+
+
+@xn(retain=True)
+def retained(blob: Blob) -> Blob:
+    return blob
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_intermediate_results_are_released(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def chain(size: int) -> int:
+        return size_of(transform(transform(transform(load(size)))))
+
+    executor = chain.executor()
+    assert executor(1) == 4
+    assert set(executor.results) == {"size_of"}
+    assert count_alive() == 0
+
+
+def test_results_without_release() -> None:
+    cfg.TAWAZI_RELEASE_RESULTS = False
+
+    @dag(max_concurrency=2)
+    def chain(size: int) -> int:
+        return size_of(transform(load(size)))
+
+    executor = chain.executor()
+    assert executor(1) == 2
+    assert {"load", "transform", "size_of"} <= set(executor.results)
+
+
+def test_result_with_several_consumers() -> None:
+    @dag(max_concurrency=2)
+    def fan_out(size: int) -> Tuple[int, int, Blob]:
+        blob = load(size)
+        return size_of(blob), size_of(transform(blob)), retained(load(size))
+
+    executor = fan_out.executor()
+    first, second, blob = executor(3)
+    assert (first, second, blob.size) == (3, 4, 3)
+    assert set(executor.results) == {"size_of", "size_of<<1>>", "retained"}
+
+
+def test_returned_results_are_kept() -> None:
+    @dag(max_concurrency=2)
+    def pipe(size: int) -> Dict[str, Any]:
+        blob = load(size)
+        return {"blob": blob, "size": size_of(blob)}
+
+    result = pipe(5)
+    assert result["blob"].size == 5
+    assert result["size"] == 5
+
+
+def test_setup_results_are_kept() -> None:
+    @xn(setup=True)
+    def model() -> Blob:
+        return Blob(10)
+
+    @dag(max_concurrency=2)
+    def pipe(size: int) -> int:
+        return size_of(transform(model())) + size
+
+    assert pipe(1) == 12
+    executor = pipe.executor()
+    assert executor(1) == 12
+    assert model.id in executor.results
+
+
+def test_active_and_kwargs_are_consumers() -> None:
+    @xn
+    def is_big(blob: Blob) -> bool:
+        return blob.size > 2
+
+    @xn
+    def describe(blob: Blob, *, unit: str) -> str:
+        return f"{blob.size}{unit}"
+
+    @dag(max_concurrency=2)
+    def pipe(size: int) -> str:
+        blob = load(size)
+        return describe(blob, unit="MB", twz_active=is_big(blob))  # type: ignore[call-arg]
+
+    assert pipe(3) == "3MB"
+    assert pipe(1) is None
+
+
+def test_release_in_async_dag() -> None:
+    @xn
+    async def aload(size: int) -> Blob:
+        return load.exec_function(size)  # type: ignore[no-any-return]
+
+    @dag(max_concurrency=2, is_async=True)
+    def pipe(size: int) -> int:
+        return size_of(transform(aload(size)))  # type: ignore[arg-type]
+
+    executor = pipe.executor()
+    assert asyncio.run(executor(1)) == 2
+    assert set(executor.results) == {"size_of"}
+
+
+def test_release_main_thread_resource() -> None:
+    @xn(resource=Resource.main_thread)
+    def main_transform(blob: Blob) -> Blob:
+        return transform.exec_function(blob)  # type: ignore[no-any-return]
+
+    @dag(max_concurrency=2)
+    def pipe(size: int) -> int:
+        return size_of(main_transform(main_transform(load(size))))
+
+    assert pipe(1) == 3
+    assert count_alive() == 0
@@ -21,7 +21,8 @@ def test_main_thread_resource_thread_name() -> None:
         assert threading.current_thread().name != main_thread_name
         return 2
 
-    @dag
+    # with max_concurrency=1 every ExecNode runs inline in the calling thread
+    @dag(max_concurrency=2)
     def pipe() -> Tuple[int, int]:
         return xn1(), xn2()
 
@@ -76,3 +77,30 @@ def test_async_threaded_in_sync() -> None:
         return async_threaded_xn()
 
     assert pipeline() == "async_threaded"
+
+
+def test_mixed_resources_release_successors_without_delay() -> None:
+    t0 = time()
+    started = {}
+
+    @xn(resource=Resource.async_thread)
+    def slow_async_threaded() -> int:
+        sleep(3 * T)
+        return 1
+
+    @xn(resource=Resource.thread)
+    def fast_threaded() -> int:
+        return 2
+
+    @xn(resource=Resource.thread)
+    def successor(x: int) -> int:
+        started["successor"] = time() - t0
+        return x
+
+    @dag(max_concurrency=3)
+    def pipe() -> Tuple[int, int]:
+        return slow_async_threaded(), successor(fast_threaded())
+
+    assert pipe() == (1, 2)
+    # the successor of the threaded ExecNode doesn't wait for the async threaded ExecNode to finish
+    assert started["successor"] < T
@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+from tawazi import Resource, dag, xn
+
+lock = threading.Lock()
+running: Dict[str, int] = {"db": 0, "cpu": 0}
+max_running: Dict[str, int] = {"db": 0, "cpu": 0}
+
+
+@pytest.fixture(autouse=True)
+def reset_counters() -> None:
+    for pool in running:
+        running[pool] = 0
+        max_running[pool] = 0
+
+
+def run_in_pool(pool: str, i: int) -> int:
+    with lock:
+        running[pool] += 1
+        max_running[pool] = max(max_running[pool], running[pool])
+    time.sleep(0.02)
+    with lock:
+        running[pool] -= 1
+    return i
+
+
+@xn(pool="db")
+def query(i: int) -> int:
+    return run_in_pool("db", i)
+
+
+@xn(pool="cpu", cost=2)
+def compute(i: int) -> int:
+    return run_in_pool("cpu", i)
+
+
+@xn
+def total(*values: int) -> int:
+    return sum(values)
+
+
+@dag(max_concurrency=8, pools={"db": 2, "cpu": 4})
+def pipeline() -> int:
+    return total(*[query(i) for i in range(6)], *[compute(i) for i in range(6)])
+
+
+def test_pools_capacity_is_respected() -> None:
+    assert pipeline() == 30
+    assert max_running["db"] == 2
+    # every compute costs 2 tokens of the cpu pool
+    assert max_running["cpu"] == 2
+
+
+def test_pools_capacity_is_respected_in_async() -> None:
+    @dag(max_concurrency=8, pools={"db": 2, "cpu": 4}, is_async=True)
+    def async_pipeline() -> int:
+        return total(*[query(i) for i in range(6)], *[compute(i) for i in range(6)])
+
+    assert asyncio.run(async_pipeline()) == 30
+    assert max_running["db"] == 2
+    assert max_running["cpu"] == 2
+
+
+def test_pools_of_coroutines() -> None:
+    @xn(pool="db")
+    async def aquery(i: int) -> int:
+        with lock:
+            running["db"] += 1
+            max_running["db"] = max(max_running["db"], running["db"])
+        await asyncio.sleep(0.02)
+        with lock:
+            running["db"] -= 1
+        return i
+
+    @dag(max_concurrency=8, pools={"db": 3})
+    def queries() -> List[int]:
+        return [aquery(i) for i in range(9)]  # type: ignore[misc]
+
+    assert queries() == list(range(9))
+    assert max_running["db"] == 3
+
+
+def test_pools_are_limited_by_max_concurrency() -> None:
+    pipeline.config_from_dict({"max_concurrency": 1})
+    try:
+        assert pipeline() == 30
+        assert max_running == {"db": 1, "cpu": 1}
+    finally:
+        pipeline.config_from_dict({"max_concurrency": 8})
+
+
+def test_pools_config_from_dict() -> None:
+    @dag(max_concurrency=8, pools={"db": 2, "cpu": 4})
+    def reconfigured() -> int:
+        return total(*[query(i) for i in range(6)], *[compute(i) for i in range(6)])
+
+    reconfigured.config_from_dict({"pools": {"db": 1}, "nodes": {"compute": {"cost": 4}}})
+    assert reconfigured.pools == {"db": 1, "cpu": 4}
+    assert reconfigured.get_node_by_id("compute").cost == 4
+    assert reconfigured() == 30
+    assert max_running["db"] == 1
+
+
+def test_pools_main_thread_resource() -> None:
+    @xn(pool="db", resource=Resource.main_thread)
+    def main_query(i: int) -> int:
+        return run_in_pool("db", i)
+
+    @dag(max_concurrency=4, pools={"db": 1})
+    def main_queries() -> int:
+        return total(*[main_query(i) for i in range(4)], *[query(i) for i in range(4)])
+
+    assert main_queries() == 12
+    assert max_running["db"] == 1
+
+
+def test_pools_compose() -> None:
+    composed = pipeline.compose("composed", [], total, max_concurrency=8)  # type: ignore[arg-type]
+    assert composed.pools == pipeline.pools
+    assert composed() == 30
+    assert max_running["db"] == 2
+
+
+def test_unknown_pool() -> None:
+    with pytest.raises(ValueError, match="not declared"):
+
+        @dag(max_concurrency=2, pools={"cpu": 2})
+        def unknown() -> int:
+            return query(1)
+
+
+def test_cost_bigger_than_capacity() -> None:
+    with pytest.raises(ValueError, match="more than the capacity"):
+
+        @dag(max_concurrency=2, pools={"cpu": 1})
+        def too_big() -> int:
+            return compute(1)
+
+
+@pytest.mark.parametrize("capacity", [0, -1, 1.5])
+def test_invalid_capacity(capacity: float) -> None:
+    with pytest.raises(ValueError, match="capacity of pool"):
+
+        @dag(pools={"db": capacity})  # type: ignore[dict-item]
+        def invalid() -> int:
+            return query(1)
+
+
+@pytest.mark.parametrize("cost", [0, -1, 1.5])
+def test_invalid_cost(cost: float) -> None:
+    with pytest.raises(ValueError, match="cost must be a positive int"):
+        xn(pool="db", cost=cost)(run_in_pool)  # type: ignore[call-overload]
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi.config import cfg
+from tawazi.errors import TawaziError
+
+lock = threading.Lock()
+calls: Dict[str, int] = {}
+
+
+@pytest.fixture(autouse=True)
+def reset_calls() -> None:
+    calls.clear()
+
+
+def fail_first(name: str, failures: int, error: Exception) -> None:
+    with lock:
+        calls[name] = calls.get(name, 0) + 1
+        if calls[name] <= failures:
+            raise error
+
+
+@xn(retries=2)
+def flaky(x: int) -> int:
+    fail_first("flaky", 2, ConnectionError("transient"))
+    return x
+
+
+@xn
+def upstream(x: int) -> int:
+    fail_first("upstream", 0, ValueError())
+    return x + 1
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_retry_until_success(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def pipe(x: int) -> int:
+        return flaky(upstream(x))
+
+    assert pipe(1) == 2
+    assert calls == {"upstream": 1, "flaky": 3}
+
+
+def test_retries_exhausted() -> None:
+    @xn(retries=1)
+    def always_failing(x: int) -> int:
+        fail_first("always_failing", 10, ConnectionError("down"))
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return always_failing(x)
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe(1)
+    assert isinstance(excinfo.value.__cause__, ConnectionError)
+    assert calls["always_failing"] == 2
+
+
+def test_retry_on_filters_errors() -> None:
+    @xn(retries=3, retry_on=ConnectionError)
+    def wrong_input(x: int) -> int:
+        fail_first("wrong_input", 10, ValueError("not transient"))
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return wrong_input(x)
+
+    with pytest.raises(TawaziError):
+        pipe(1)
+    assert calls["wrong_input"] == 1
+
+
+def test_backoff_does_not_block_other_nodes(monkeypatch: pytest.MonkeyPatch) -> None:
+    # no jitter: the retry waits for the whole backoff delay
+    monkeypatch.setattr("tawazi._dag.helpers.random.uniform", lambda low, high: high)
+    order: List[str] = []
+
+    @xn(retries=1, backoff=0.2, priority=10)
+    def backing_off() -> str:
+        fail_first("backing_off", 1, ConnectionError())
+        order.append("backing_off")
+        return "retried"
+
+    @xn
+    def independent() -> str:
+        time.sleep(0.05)
+        order.append("independent")
+        return "independent"
+
+    @dag(max_concurrency=1)
+    def pipe() -> Tuple[str, str]:
+        return backing_off(), independent()
+
+    start = time.perf_counter()
+    assert pipe() == ("retried", "independent")
+    assert time.perf_counter() - start >= 0.2
+    # the single running slot is used by the other ExecNode during the backoff delay
+    assert order == ["independent", "backing_off"]
+    assert calls["backing_off"] == 2
+
+
+def test_backoff_with_nothing_else_to_run() -> None:
+    @xn(retries=3, backoff=0.01)
+    def alone() -> int:
+        fail_first("alone", 3, ConnectionError())
+        return 1
+
+    @dag(max_concurrency=2)
+    def pipe() -> int:
+        return alone()
+
+    assert pipe() == 1
+    assert calls["alone"] == 4
+
+
+def test_retry_coroutine() -> None:
+    @xn(retries=1)
+    async def aflaky(x: int) -> int:
+        fail_first("aflaky", 1, ConnectionError())
+        await asyncio.sleep(0)
+        return x
+
+    @dag(max_concurrency=2, is_async=True)
+    def pipe(x: int) -> int:
+        return aflaky(x)  # type: ignore[return-value]
+
+    assert asyncio.run(pipe(3)) == 3
+    assert calls["aflaky"] == 2
+
+
+def test_retry_in_pool() -> None:
+    @xn(retries=2, pool="db")
+    def query(x: int) -> int:
+        fail_first(f"query{x}", 1, ConnectionError())
+        return x
+
+    @dag(max_concurrency=4, pools={"db": 1})
+    def pipe() -> List[int]:
+        return [query(i) for i in range(3)]
+
+    assert pipe() == [0, 1, 2]
+    assert calls == {"query0": 2, "query1": 2, "query2": 2}
+
+
+def test_profile_records_failed_attempts() -> None:
+    cfg.TAWAZI_PROFILE_ALL_NODES = True
+    try:
+
+        @dag(max_concurrency=2)
+        def pipe(x: int) -> int:
+            return flaky(x)
+
+        executor = pipe.executor()
+        assert executor(1) == 1
+        profile = executor.profiles["flaky"]
+        assert len(profile.failed_attempts) == 2
+        assert all(attempt.abs_exec_time > 0 for attempt in profile.failed_attempts)
+    finally:
+        cfg.TAWAZI_PROFILE_ALL_NODES = False
+
+
+def test_retries_config_from_dict() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return flaky(x)
+
+    pipe.config_from_dict({"nodes": {"flaky": {"retries": 0}}})
+    with pytest.raises(TawaziError):
+        pipe(1)
+
+
+def test_retry_main_thread_resource() -> None:
+    @xn(retries=1, resource=Resource.main_thread)
+    def main_flaky(x: int) -> int:
+        fail_first("main_flaky", 1, ConnectionError())
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return main_flaky(x)
+
+    # main-thread ExecNodes run in the scheduler, their errors are not retried
+    with pytest.raises(TawaziError):
+        pipe(1)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"retries": -1},
+        {"retries": 1.5},
+        {"backoff": -1},
+        {"retry_on": ValueError()},
+        {"retry_on": (int,)},
+    ],
+)
+def test_invalid_retry_arguments(kwargs: Dict[str, object]) -> None:
+    with pytest.raises(ValueError, match="retries|backoff|retry_on"):
+        xn(**kwargs)(fail_first)  # type: ignore[call-overload]
@@ -0,0 +1,160 @@
+import mmap
+from pathlib import Path
+from typing import Iterator, Set, Tuple
+
+import numpy as np
+import pytest
+from tawazi import Resource, cfg, dag, xn
+from tawazi.errors import TawaziError
+
+SIZE = 1_000_000
+# where the shared memory segments are visible on Linux
+SHM_DIR = Path("/dev/shm")  # noqa: S108
+
+
+def segments() -> Set[Path]:
+    return set(SHM_DIR.glob("psm_*"))
+
+
+@pytest.fixture(autouse=True)
+def shared_memory() -> Iterator[None]:
+    previous = cfg.TAWAZI_SHARED_MEMORY
+    cfg.TAWAZI_SHARED_MEMORY = True
+    try:
+        yield
+    finally:
+        cfg.TAWAZI_SHARED_MEMORY = previous
+
+
+@xn(resource=Resource.process)
+def make_array(n: int) -> np.ndarray:
+    return np.arange(n, dtype=np.float64)
+
+
+@xn(resource=Resource.process)
+def double(arr: np.ndarray) -> np.ndarray:
+    return arr * 2
+
+
+@xn(resource=Resource.process)
+def total(arr: np.ndarray, other: np.ndarray) -> float:
+    return float(arr.sum() + other.sum())
+
+
+@xn(resource=Resource.process, unpack_to=2)
+def split(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    arr = np.arange(n, dtype=np.float64)
+    return arr, -arr
+
+
+@xn(resource=Resource.process)
+def fail(arr: np.ndarray) -> np.ndarray:
+    raise ValueError("failed")
+
+
+@xn
+def in_shared_memory(arr: np.ndarray) -> bool:
+    # arrays unpickled from shared memory are views over the memory of the segment
+    base = arr.base
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return isinstance(base, memoryview) and isinstance(base.obj, mmap.mmap)
+
+
+@dag(max_concurrency=2)
+def pipe(n: int) -> Tuple[float, np.ndarray, bool]:
+    arr = make_array(n)
+    doubled = double(arr)
+    return total(arr, doubled), doubled, in_shared_memory(doubled)
+
+
+@dag(max_concurrency=2)
+def pipe_unpacked(n: int) -> float:
+    pos, neg = split(n)
+    return total(pos, neg)
+
+
+@dag
+def failing_pipe(n: int) -> np.ndarray:
+    return fail(make_array(n))
+
+
+def test_shared_memory_results() -> None:
+    before = segments()
+    with pipe:
+        s, doubled, shared = pipe(SIZE)
+    assert s == pytest.approx(3 * (SIZE - 1) * SIZE / 2)
+    np.testing.assert_array_equal(doubled, np.arange(SIZE) * 2)
+    # the ExecNodes executed in the main process receive views over the shared memory
+    assert shared
+    # the results are copied out of the shared memory before the segments are unlinked
+    doubled += 1
+    if SHM_DIR.is_dir():
+        assert segments() <= before
+
+
+def test_shared_memory_unpacked_results() -> None:
+    with pipe_unpacked:
+        assert pipe_unpacked(SIZE) == 0
+
+
+def test_small_results_are_not_in_shared_memory() -> None:
+    before = segments()
+    with pipe:
+        s, doubled, shared = pipe(10)
+    assert s == 3 * 45
+    assert not shared
+    if SHM_DIR.is_dir():
+        assert segments() <= before
+
+
+def test_segments_unlinked_after_error() -> None:
+    before = segments()
+    with pytest.raises(TawaziError, match="Error occurred while executing ExecNode fail"):
+        failing_pipe(SIZE)
+    failing_pipe.close()
+    if SHM_DIR.is_dir():
+        assert segments() <= before
+
+
+@xn(resource=Resource.process)
+def increment_inplace(arr: np.ndarray) -> np.ndarray:
+    arr += 1
+    return arr
+
+
+@dag
+def inplace_pipe(n: int) -> np.ndarray:
+    return increment_inplace(make_array(n))
+
+
+def test_shared_results_are_read_only_in_processes() -> None:
+    with pytest.raises(TawaziError) as exc_info:
+        inplace_pipe(SIZE)
+    assert "read-only" in str(exc_info.value.__cause__)
+    inplace_pipe.close()
+
+
+@xn
+def new_segments(_: float, before: Set[Path]) -> int:
+    return len(segments() - before)
+
+
+@dag(max_concurrency=2)
+def released_pipe(n: int, before: Set[Path]) -> int:
+    doubled = double(make_array(n))
+    return new_segments(total(doubled, doubled), before)
+
+
+@pytest.mark.skipif(not SHM_DIR.is_dir(), reason="shared memory segments are not visible")
+def test_released_results_unlink_their_segments() -> None:
+    cfg.TAWAZI_RELEASE_RESULTS = True
+    try:
+        with released_pipe:
+            # the segments of the arrays are unlinked once the arrays are not used anymore
+            assert released_pipe(SIZE, segments()) == 0
+    finally:
+        cfg.TAWAZI_RELEASE_RESULTS = False
+
+    with released_pipe:
+        assert released_pipe(SIZE, segments()) == 2
@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Dict, Generator, Iterator, List
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi.config import cfg
+from tawazi.errors import TawaziError, TawaziUsageError
+
+produced: List[int] = []
+closed = threading.Event()
+
+
+@pytest.fixture(autouse=True)
+def reset() -> Generator[None, None, None]:
+    produced.clear()
+    closed.clear()
+    yield
+    cfg.TAWAZI_STREAM_QUEUE_SIZE = 16
+
+
+@xn(stream=True)
+def source(n: int, delay: float = 0.0) -> Iterator[int]:
+    try:
+        for i in range(n):
+            time.sleep(delay)
+            produced.append(i)
+            yield i
+    finally:
+        closed.set()
+
+
+@xn(per_item=True)
+def double(x: int) -> int:
+    return 2 * x
+
+
+@xn(per_item=True)
+def add(x: int, y: int) -> int:
+    return x + y
+
+
+@xn
+def collect(items: Iterator[int]) -> List[int]:
+    return list(items)
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_streaming_pipeline(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def pipe(n: int) -> List[int]:
+        return collect(add(double(source(n)), 1))  # type: ignore[arg-type]
+
+    assert pipe(5) == [1, 3, 5, 7, 9]
+
+
+def test_returned_stream_is_an_iterator() -> None:
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> Iterator[int]:
+        return double(source(n))  # type: ignore[arg-type, return-value]
+
+    items = pipe(4)
+    assert isinstance(items, Iterator)
+    assert list(items) == [0, 2, 4, 6]
+
+
+def test_stages_run_at_the_same_time() -> None:
+    first_seen: List[int] = []
+
+    @xn(per_item=True)
+    def observe(x: int) -> int:
+        if not first_seen:
+            first_seen.append(len(produced))
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> List[int]:
+        return collect(observe(source(n, 0.02)))  # type: ignore[arg-type]
+
+    assert pipe(10) == list(range(10))
+    # the first item is processed long before the last one is produced
+    assert first_seen[0] < 10
+
+
+def test_backpressure() -> None:
+    cfg.TAWAZI_STREAM_QUEUE_SIZE = 2
+    lags: List[int] = []
+
+    @xn
+    def slow_collect(items: Iterator[int]) -> int:
+        count = 0
+        for _ in items:
+            count += 1
+            time.sleep(0.005)
+            lags.append(len(produced) - count)
+        return count
+
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> int:
+        return slow_collect(source(n))
+
+    assert pipe(30) == 30
+    # the queue and the item waiting to be put in it
+    assert max(lags) <= cfg.TAWAZI_STREAM_QUEUE_SIZE + 1
+
+
+def test_async_generator_and_per_item_coroutine() -> None:
+    @xn(stream=True)
+    async def asource(n: int) -> AsyncIterator[int]:
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    @xn(per_item=True)
+    async def atriple(x: int) -> int:
+        await asyncio.sleep(0)
+        return 3 * x
+
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> List[int]:
+        return collect(atriple(asource(n)))  # type: ignore[arg-type]
+
+    assert pipe(3) == [0, 3, 6]
+
+
+def test_per_item_zips_streams() -> None:
+    @xn(stream=True)
+    def letters() -> str:
+        return "abc"
+
+    @xn(per_item=True)
+    def label(letter: str, number: int, *, sep: str) -> str:
+        return f"{letter}{sep}{number}"
+
+    @dag(max_concurrency=2)
+    def pipe() -> List[str]:
+        return collect(label(letters(), source(5), sep="-"))  # type: ignore[arg-type, return-value]
+
+    assert pipe() == ["a-0", "b-1", "c-2"]
+
+
+def test_per_item_without_stream_is_called_once() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return double(x)
+
+    assert pipe(4) == 8
+
+
+def test_errors_are_raised_by_the_consumer() -> None:
+    @xn(stream=True)
+    def failing_source() -> Iterator[int]:
+        yield 1
+        raise ValueError("broken source")
+
+    @xn(per_item=True)
+    def failing_stage(x: int) -> int:
+        if x == 2:
+            raise KeyError(x)
+        return x
+
+    @dag(max_concurrency=2)
+    def broken_source() -> List[int]:
+        return collect(failing_source())
+
+    with pytest.raises(TawaziError) as excinfo:
+        broken_source()
+    assert "failing_source" in str(excinfo.value.__cause__)
+    assert isinstance(excinfo.value.__cause__.__cause__, ValueError)  # type: ignore[union-attr]
+
+    @dag(max_concurrency=2)
+    def broken_stage(n: int) -> List[int]:
+        return collect(failing_stage(source(n)))  # type: ignore[arg-type]
+
+    with pytest.raises(TawaziError) as excinfo:
+        broken_stage(4)
+    assert isinstance(excinfo.value.__cause__.__cause__, KeyError)  # type: ignore[union-attr]
+
+
+def test_stream_is_consumed_once() -> None:
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> List[List[int]]:
+        items = source(n)
+        return [collect(items), collect(items)]
+
+    with pytest.raises(TawaziError) as excinfo:
+        pipe(3)
+    assert isinstance(excinfo.value.__cause__, TawaziUsageError)
+
+
+def test_close_stops_the_producers() -> None:
+    @dag(max_concurrency=2)
+    def pipe(n: int) -> Iterator[int]:
+        return double(source(n))  # type: ignore[arg-type, return-value]
+
+    items = pipe(1000)
+    assert [next(items), next(items)] == [0, 2]
+    items.close()  # type: ignore[attr-defined]
+    assert closed.wait(5)
+    assert len(produced) < 1000
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"stream": True, "per_item": True},
+        {"stream": True, "setup": True},
+        {"per_item": True, "unpack_to": 2},
+    ],
+)
+def test_invalid_stream_arguments(kwargs: Dict[str, object]) -> None:
+    with pytest.raises(ValueError):
+        xn(**kwargs)(collect.exec_function)  # type: ignore[call-overload]
+
+
+def test_stream_in_process_is_refused() -> None:
+    with pytest.raises(TawaziUsageError):
+        xn(stream=True, resource=Resource.process)(collect.exec_function)
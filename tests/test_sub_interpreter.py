@@ -0,0 +1,65 @@
+import os
+import warnings
+
+import pytest
+from tawazi import Resource, dag, xn
+from tawazi._process import SUB_INTERPRETERS_AVAILABLE
+from tawazi.errors import TawaziUsageError
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    @xn(resource=Resource.sub_interpreter)
+    def cube(x: int) -> int:
+        return x**3
+
+    @xn(resource=Resource.sub_interpreter)
+    def pid(x: int) -> int:
+        return os.getpid()
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+@dag(max_concurrency=2)
+def pipe(x: int, y: int) -> int:
+    return cube(x) + cube(y)
+
+
+@dag
+def pipe_pid(x: int) -> int:
+    return pid(x)
+
+
+def test_sub_interpreter_resource() -> None:
+    with pipe:
+        assert pipe(2, 3) == 35
+        assert pipe(1, 1) == 2
+
+
+@pytest.mark.skipif(SUB_INTERPRETERS_AVAILABLE, reason="sub-interpreters are available")
+def test_sub_interpreter_falls_back_to_process() -> None:
+    with pytest.warns(RuntimeWarning, match="executed in a process instead"):
+        xn(resource=Resource.sub_interpreter)(square)
+
+    with pipe_pid:
+        assert pipe_pid(1) != os.getpid()
+        # the process pool of the DAG is used
+        assert pipe_pid._process_pool._executor is not None
+        assert pipe_pid._interpreter_pool._executor is None
+
+
+@pytest.mark.skipif(not SUB_INTERPRETERS_AVAILABLE, reason="requires python 3.14+")
+def test_sub_interpreter_runs_in_the_same_process() -> None:
+    with pipe_pid:
+        assert pipe_pid(1) == os.getpid()
+        assert pipe_pid._process_pool._executor is None
+
+
+def test_sub_interpreter_local_function() -> None:
+    def local_cube(x: int) -> int:
+        return x**3
+
+    with pytest.raises(TawaziUsageError, match="defined inside another function"):
+        xn(resource=Resource.sub_interpreter)(local_cube)
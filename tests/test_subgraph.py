@@ -4,6 +4,7 @@ import pytest
 from tawazi import DAG, dag, xn
 from tawazi._dag.digraph import DiGraphEx
 from tawazi._dag.helpers import sync_execute
+from tawazi._dag.plan import ExecutionPlan
 
 subgraph_comp_str = ""
 T = 1e-3
@@ -14,7 +15,7 @@ def shortcut_execute(dag: DAG[Any, Any], graph: DiGraphEx) -> Any:
         results=dag.results,
         exec_nodes=dag.exec_nodes,
         max_concurrency=dag.max_concurrency,
-        graph=graph,
+        plan=ExecutionPlan.from_graph(graph),
     )
 
 
@@ -0,0 +1,129 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from typing import Set
+
+import pytest
+from tawazi import DAG, dag, xn
+from tawazi.errors import TawaziError
+
+thread_ids: Set[int] = set()
+
+
+@xn
+def record_thread(x: int) -> int:
+    thread_ids.add(threading.get_ident())
+    return x
+
+
+@xn
+def fail(x: int) -> int:
+    raise ValueError("failed")
+
+
+@dag(max_concurrency=2)
+def pipe(x: int) -> int:
+    return record_thread(x)
+
+
+def test_thread_pool_reused_between_calls() -> None:
+    thread_ids.clear()
+    assert pipe(1) == 1
+    pool = pipe.thread_pool
+    assert pool is not None
+    for i in range(20):
+        assert pipe(i) == i
+    assert pipe.thread_pool is pool
+    # threads are reused instead of being created for every call
+    assert len(thread_ids) <= 2
+
+
+def test_close_and_reopen() -> None:
+    @dag(max_concurrency=2)
+    def pipe_(x: int) -> int:
+        return record_thread(x)
+
+    with pipe_ as p:
+        assert p(1) == 1
+        pool = pipe_.thread_pool
+        assert pool is not None
+    assert pipe_.thread_pool is None
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
+
+    # a new pool is created after closing the DAG
+    assert pipe_(2) == 2
+    assert pipe_.thread_pool is not None
+    pipe_.close()
+
+
+def test_provided_thread_pool_is_not_shut_down() -> None:
+    @dag
+    def pipe_(x: int) -> int:
+        return record_thread(x)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        shared: DAG[[int], int] = DAG(
+            qualname=pipe_.qualname,
+            results=pipe_.results,
+            exec_nodes=pipe_.exec_nodes,
+            input_uxns=pipe_.input_uxns,
+            return_uxns=pipe_.return_uxns,
+            thread_pool=pool,
+        )
+        assert shared(3) == 3
+        assert shared.thread_pool is pool
+        shared.close()
+        assert pool.submit(lambda: 4).result() == 4
+
+
+def test_thread_pool_survives_error() -> None:
+    @dag(max_concurrency=2)
+    def failing_pipe(x: int) -> int:
+        return fail(record_thread(x))
+
+    with pytest.raises(TawaziError, match="Error occurred while executing"):
+        failing_pipe(1)
+    pool = failing_pipe.thread_pool
+    assert pool is not None
+    assert pool.submit(lambda: 1).result() == 1
+    failing_pipe.close()
+
+
+def test_max_concurrency_reconfiguration_resizes_thread_pool() -> None:
+    @dag(max_concurrency=2)
+    def pipe_(x: int) -> int:
+        return record_thread(x)
+
+    assert pipe_(1) == 1
+    pipe_.config_from_dict({"max_concurrency": 3})
+    assert pipe_.thread_pool is None
+    assert pipe_(1) == 1
+    pool = pipe_.thread_pool
+    assert pool is not None
+    assert pool._max_workers == 3
+    pipe_.close()
+
+
+def test_copy_dag_with_thread_pool() -> None:
+    assert pipe(1) == 1
+    copied = deepcopy(pipe)
+    assert copied.thread_pool is None
+    assert copied(5) == 5
+    assert copied.thread_pool is not pipe.thread_pool
+    copied.close()
+
+
+def test_dropped_dag_shuts_its_thread_pool_down() -> None:
+    @dag(max_concurrency=2)
+    def pipe_(x: int) -> int:
+        return record_thread(x)
+
+    assert pipe_(1) == 1
+    pool = pipe_.thread_pool
+    assert pool is not None
+    del pipe_
+    gc.collect()
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
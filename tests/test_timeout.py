@@ -0,0 +1,220 @@
+import asyncio
+import threading
+import time
+from typing import Generator, Optional, Tuple
+
+import pytest
+from tawazi import Resource, cfg, dag, xn
+from tawazi.errors import TawaziTimeoutError
+
+unblock = threading.Event()
+cancelled = threading.Event()
+
+
+@pytest.fixture(autouse=True)
+def release_stuck_nodes() -> Generator[None, None, None]:
+    unblock.clear()
+    cancelled.clear()
+    yield
+    unblock.set()
+
+
+def stuck(x: int) -> int:
+    unblock.wait(5)
+    return x
+
+
+@xn(timeout=0.1, fallback=-1)
+def stuck_with_fallback(x: int) -> int:
+    return stuck(x)
+
+
+@xn(timeout=0.1)
+def stuck_without_fallback(x: int) -> int:
+    return stuck(x)
+
+
+@xn(timeout=1)
+def fast(x: int) -> int:
+    return x
+
+
+stuck_xn = xn(stuck)
+
+
+@xn
+def double(x: int) -> int:
+    return 2 * x
+
+
+@xn
+def slow(x: int) -> int:
+    time.sleep(0.2)
+    return x
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_fallback(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def pipe(x: int) -> Tuple[int, int]:
+        return double(stuck_with_fallback(x)), double(fast(x))
+
+    start = time.perf_counter()
+    assert pipe(3) == (-2, 6)
+    # the successors don't wait for the stuck ExecNode
+    assert time.perf_counter() - start < 1
+    pipe.close()
+
+
+def test_fallback_result_not_overwritten() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return stuck_with_fallback(x)
+
+    executor = pipe.executor()
+    assert executor(3) == -1
+    # the stuck ExecNode finishes after the execution, its result is ignored
+    unblock.set()
+    time.sleep(0.1)
+    assert executor.results["stuck_with_fallback"] == -1
+    pipe.close()
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_timeout_without_fallback(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency)
+    def pipe(x: int) -> int:
+        return double(stuck_without_fallback(x))
+
+    start = time.perf_counter()
+    with pytest.raises(TawaziTimeoutError, match="stuck_without_fallback"):
+        pipe(3)
+    assert time.perf_counter() - start < 1
+    pipe.close()
+
+
+def test_no_timeout_when_fast_enough() -> None:
+    @xn(timeout=1, fallback=-1)
+    def in_time(x: int) -> int:
+        time.sleep(0.2)
+        return x
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return double(in_time(x))
+
+    assert pipe(3) == 6
+
+
+def test_coroutine_is_cancelled() -> None:
+    @xn(timeout=0.1, fallback=None)
+    async def waiting() -> None:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    @dag(max_concurrency=2)
+    def pipe() -> Optional[int]:
+        return waiting()  # type: ignore[return-value]
+
+    assert pipe() is None
+    assert cancelled.wait(1)
+
+
+def test_async_thread_timeout() -> None:
+    @xn(timeout=0.1, fallback=-1, resource=Resource.async_thread)
+    def stuck_async_thread(x: int) -> int:
+        return stuck(x)
+
+    @dag(max_concurrency=2, is_async=True)
+    def pipe(x: int) -> int:
+        return double(stuck_async_thread(x))
+
+    start = time.perf_counter()
+    assert asyncio.run(pipe(3)) == -2
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_dag_timeout(max_concurrency: int) -> None:
+    @dag(max_concurrency=max_concurrency, timeout=0.1)
+    def pipe(x: int) -> int:
+        return double(stuck_xn(x))
+
+    start = time.perf_counter()
+    with pytest.raises(TawaziTimeoutError, match="didn't finish in time"):
+        pipe(3)
+    assert time.perf_counter() - start < 1
+    # the thread of the pool that was running stuck_xn can't be interrupted
+    unblock.set()
+    pipe.close()
+
+
+def test_dag_timeout_cancels_coroutines() -> None:
+    @xn
+    async def waiting() -> None:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    @dag(max_concurrency=2, timeout=0.1, is_async=True)
+    def pipe() -> None:
+        waiting()  # type: ignore[unused-coroutine]
+
+    with pytest.raises(TawaziTimeoutError):
+        asyncio.run(pipe())
+    assert cancelled.wait(1)
+
+
+def test_dag_timeout_config_from_dict() -> None:
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return slow(x)
+
+    assert pipe(1) == 1
+    pipe.config_from_dict({"timeout": 0.05})
+    with pytest.raises(TawaziTimeoutError):
+        pipe(1)
+
+
+@dag
+def double_pipe(x: int) -> int:
+    return double(x)
+
+
+@pytest.mark.parametrize("timeout", [0, -1, "1", True])
+def test_invalid_timeout(timeout: float) -> None:
+    with pytest.raises(ValueError, match="timeout must be a positive number"):
+        xn(timeout=timeout)(stuck)
+
+    with pytest.raises(ValueError, match="timeout must be a positive number"):
+
+        @dag(timeout=timeout)
+        def pipe(x: int) -> int:
+            return double(x)
+
+    with pytest.raises(ValueError, match="timeout must be a positive number"):
+        double_pipe.config_from_dict({"timeout": timeout})
+    assert double_pipe.timeout is None
+
+
+def test_timeout_threads_are_bounded() -> None:
+    previous = cfg.TAWAZI_TIMED_OUT_THREADS
+    cfg.TAWAZI_TIMED_OUT_THREADS = 1
+
+    @dag(max_concurrency=2)
+    def pipe(x: int) -> int:
+        return stuck_with_fallback(x)
+
+    cfg.TAWAZI_TIMED_OUT_THREADS = previous
+    # the ExecNodes that timed out keep their threads, the next ones wait for them and time out too
+    for i in range(5):
+        assert pipe(i) == -1
+    threads = [t for t in threading.enumerate() if t.name.startswith(f"{pipe.qualname}_timeout")]
+    assert len(threads) == 3
+    assert all(t.daemon for t in threads)
+    pipe.close()